@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Synthetic church web for the benchmarks. Every response is derived from
+# (site index, path), so a corpus of any size costs no disk and is identical
+# between runs. Each church site gets its own server (robots.txt and sitemaps
+# live at the origin root); one "hub" server carries the paginated directory,
+# the church detail pages and the transcript endpoint.
+
+CHURCHES_PER_PAGE = 20
+CHANNEL_ID_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+def _ident(prefix: str, n: int, length: int) -> str:
+    digest = hashlib.blake2b(f"{prefix}{n}".encode(), digest_size=32).digest()
+    return "".join(CHANNEL_ID_CHARS[b % 64] for b in digest[:length])
+
+
+def channel_id(n: int) -> str:
+    return "UC" + _ident("channel", n, 22)
+
+
+def video_id(n: int) -> str:
+    return _ident("video", n, 11)
+
+
+@dataclass
+class Corpus:
+    # Everything scales from `pages`, the number of church-site pages in sitemaps
+    pages: int
+
+    @property
+    def sites(self) -> int:
+        return max(8, min(200, self.pages // 50))
+
+    @property
+    def pages_per_site(self) -> int:
+        return max(10, self.pages // self.sites)
+
+    @property
+    def churches(self) -> int:
+        return max(CHURCHES_PER_PAGE, min(self.pages // 5, 20_000))
+
+    @property
+    def directory_pages(self) -> int:
+        return -(-self.churches // CHURCHES_PER_PAGE)
+
+    @property
+    def channels(self) -> int:
+        return max(1, min(50, self.pages // 2000))
+
+    @property
+    def entries_per_channel(self) -> int:
+        return max(100, self.pages // self.channels)
+
+    @property
+    def videos(self) -> int:
+        return max(50, min(self.pages // 10, 5000))
+
+
+# ───── church sites ─────
+# robots.txt variants, picked by site index
+ROBOTS = [
+    "",                                                         # 404: no robots.txt
+    "User-agent: *\nAllow: /\n",
+    "User-agent: *\nDisallow: /private/\nDisallow: /*?replytocom=\n",
+    "User-agent: *\nDisallow: /\n\nUser-agent: ChurchTopicsBot\nAllow: /\nDisallow: /admin/\n",
+    "User-agent: *\nCrawl-delay: 0.001\nDisallow: /wp-admin/\nAllow: /wp-admin/admin-ajax.php\n",
+]
+SECTIONS = ["about", "events", "ministries", "blog", "tag", "author", "sermons", "media", "watch", "private"]
+SITEMAP_CHUNK = 500
+
+
+def site_kind(i: int) -> dict:
+    return {
+        "robots": ROBOTS[i % len(ROBOTS)],
+        # 0: one urlset, 1: index of gzipped parts, 2: index (declared in robots) of indexes
+        "sitemap": i % 3,
+        "js_only": i % 4 == 1,
+        # where the YouTube embed sits: a hot sermon page, a cold deep page, or nowhere
+        "embed": ("hot", "cold", None)[(i // 3) % 3],
+    }
+
+
+def site_path(i: int, k: int) -> str:
+    section = SECTIONS[k % len(SECTIONS)]
+    return f"/{section}/page-{k}"
+
+
+def embed_page(i: int, corpus: Corpus) -> int | None:
+    kind = site_kind(i)["embed"]
+    if kind == "hot":
+        return 6    # /sermons/page-6
+    if kind == "cold":
+        return corpus.pages_per_site - 1 - (corpus.pages_per_site - 1) % len(SECTIONS)  # deep /about page
+    return None
+
+
+def sitemap_doc(locs: list[str], index: bool = False) -> bytes:
+    tag, item = ("sitemapindex", "sitemap") if index else ("urlset", "url")
+    body = "".join(f"<{item}><loc>{loc}</loc><lastmod>2024-05-01</lastmod></{item}>" for loc in locs)
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<{tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</{tag}>').encode()
+
+
+def site_response(i: int, path: str, origin: str, corpus: Corpus) -> tuple[int, str, bytes]:
+    kind = site_kind(i)
+    n = corpus.pages_per_site
+    chunks = -(-n // SITEMAP_CHUNK)
+    page_urls = lambda lo, hi: [origin + site_path(i, k) for k in range(lo, min(hi, n))]
+
+    if path == "/robots.txt":
+        if not kind["robots"]:
+            return 404, "text/plain", b"not found"
+        text = kind["robots"]
+        if kind["sitemap"] == 2:
+            text += f"\nSitemap: {origin}/wp-sitemap.xml\n"
+        return 200, "text/plain", text.encode()
+
+    if kind["sitemap"] == 0 and path == "/sitemap.xml":
+        return 200, "application/xml", sitemap_doc(page_urls(0, n))
+    if kind["sitemap"] == 1:
+        if path == "/sitemap.xml":
+            return 200, "application/xml", sitemap_doc(
+                [f"{origin}/sitemaps/part-{c}.xml.gz" for c in range(chunks)], index=True)
+        if path.startswith("/sitemaps/part-"):
+            c = int(path.split("-")[1].split(".")[0])
+            lo = c * SITEMAP_CHUNK
+            return 200, "application/x-gzip", gzip.compress(sitemap_doc(page_urls(lo, lo + SITEMAP_CHUNK)))
+    if kind["sitemap"] == 2:
+        if path == "/wp-sitemap.xml":
+            return 200, "application/xml", sitemap_doc([f"{origin}/wp-sitemap-posts.xml"], index=True)
+        if path == "/wp-sitemap-posts.xml":
+            return 200, "application/xml", sitemap_doc(
+                [f"{origin}/wp-sitemap-posts-{c}.xml" for c in range(chunks)], index=True)
+        if path.startswith("/wp-sitemap-posts-"):
+            lo = int(path.rsplit("-", 1)[1].split(".")[0]) * SITEMAP_CHUNK
+            return 200, "application/xml", sitemap_doc(page_urls(lo, lo + SITEMAP_CHUNK))
+
+    if path == "/" or any(path.startswith(f"/{s}/") for s in SECTIONS):
+        k = int(path.rsplit("-", 1)[1]) if "page-" in path else 0
+        embed = f"https://www.youtube.com/embed/{video_id(i * 1000 + k)}" if embed_page(i, corpus) == k else None
+        return 200, "text/html; charset=utf-8", church_page(i, k, embed, kind["js_only"])
+    return 404, "text/plain", b"not found"
+
+
+def church_page(i: int, k: int, embed: str | None, js_only: bool) -> bytes:
+    if js_only:
+        # an app shell: the stub browser reads the links out of the data blob
+        data = json.dumps({"links": [embed] if embed else []})
+        scripts = "".join(f'<script src="/static/chunk-{c}.js"></script>' for c in range(8))
+        return (f'<!doctype html><html><head>{scripts}</head><body><div id="root"></div>'
+                f'<noscript>Enable JavaScript</noscript>'
+                f'<script id="app-data" type="application/json">{data}</script></body></html>').encode()
+    nav = "".join(f'<a href="/{s}/page-{k + j}">{s.title()}</a>' for j, s in enumerate(SECTIONS[:6]))
+    filler = "<p>" + ("Join us this Sunday for worship, fellowship and teaching. " * 12) + "</p>"
+    player = f'<iframe src="{embed}" width="560" height="315"></iframe>' if embed else ""
+    return (f"<!doctype html><html><head><title>Grace Church {i} – page {k}</title></head>"
+            f"<body><nav>{nav}</nav><main><h1>Page {k}</h1>{filler}{player}{filler}</main>"
+            f'<footer><a href="/about/page-0">About</a></footer></body></html>').encode()
+
+
+# ───── hub: directory, details, transcripts ─────
+def directory_page(page: int, corpus: Corpus) -> bytes:
+    if page > corpus.directory_pages:
+        return b'<!doctype html><html><body><p class="empty">No results found.</p></body></html>'
+    first = (page - 1) * CHURCHES_PER_PAGE
+    rows = "".join(
+        f'<li><a href="/church/{n}">Grace Church {n}</a></li>'
+        for n in range(first, min(first + CHURCHES_PER_PAGE, corpus.churches))
+    )
+    return (f'<!doctype html><html><body><a href="/">Home</a><ul class="results">{rows}</ul>'
+            f'<a href="/directory?page={page + 1}">Next</a></body></html>').encode()
+
+
+def detail_page(n: int, site_origins: list[str]) -> bytes:
+    website = site_origins[n % len(site_origins)] + "/"
+    languages = "".join(f"<li>{lang}</li>" for lang in ("English", "Spanish")[: 1 + n % 2])
+    return (f'<!doctype html><html><body><h1>Grace Church {n}</h1>'
+            f'<div class="row"><div>Website</div><div><a href="{website}">{website}</a></div></div>'
+            f'<div class="row"><div>Denomination</div><div>Southern<br>Baptist</div></div>'
+            f'<div class="row"><div>Language</div><div><ul>{languages}</ul></div></div>'
+            f'<div class="row"><div>Size</div><div>{100 * (n % 20)} - {100 * (n % 20) + 99}</div></div>'
+            f'</body></html>').encode()
+
+
+def transcript(vid: str) -> tuple[int, bytes]:
+    h = int(hashlib.md5(vid.encode()).hexdigest(), 16)
+    if h % 20 == 0:
+        return 404, b'{"error": "TranscriptsDisabled"}'
+    segments = [{"text": f"segment {s} of the sermon on hope and forgiveness", "start": s * 4.0, "duration": 4.0}
+                for s in range(200)]
+    return 200, json.dumps(segments).encode()
+
+
+# ───── servers ─────
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer the status line, headers and body into one send per response and
+    # turn off Nagle: split writes on a kept-alive connection otherwise wait on
+    # the client's delayed ACK (~40 ms) and the benchmark measures that instead
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def _respond(self, head: bool):
+        # Every 200 carries an ETag and must be revalidated, like most CMS
+        # pages, so a warm HTTP cache turns refetches into 304s
+        url = urlparse(self.path)
+        status, ctype, body = self.server.route(url.path, parse_qs(url.query))
+        etag = None
+        if status == 200:
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, route):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.route = route
+        self.origin = f"http://127.0.0.1:{self.server_port}"
+
+
+class FixtureFarm:
+    # Starts one server per church site plus the hub; use as a context manager
+    def __init__(self, corpus: Corpus):
+        self.corpus = corpus
+        self.servers: list[_Server] = []
+        self.site_origins: list[str] = []
+        self.hub = ""
+
+    def __enter__(self) -> FixtureFarm:
+        for i in range(self.corpus.sites):
+            server = _Server(None)
+            server.route = (lambda i, origin: lambda path, q: site_response(i, path, origin, self.corpus))(
+                i, server.origin)
+            self._serve(server)
+            self.site_origins.append(server.origin)
+
+        hub = _Server(self._hub_route)
+        self._serve(hub)
+        self.hub = hub.origin
+        return self
+
+    def _serve(self, server: _Server) -> None:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+
+    def _hub_route(self, path: str, query: dict) -> tuple[int, str, bytes]:
+        if path == "/directory":
+            return 200, "text/html; charset=utf-8", directory_page(int(query.get("page", ["1"])[0]), self.corpus)
+        if path.startswith("/church/"):
+            return 200, "text/html; charset=utf-8", detail_page(int(path.rsplit("/", 1)[1]), self.site_origins)
+        if path.startswith("/transcript/"):
+            status, body = transcript(path.rsplit("/", 1)[1])
+            return status, "application/json", body
+        return 404, "text/plain", b"not found"
+
+    def __exit__(self, *exc) -> None:
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from urllib.parse import urlparse
+
+# Offline benchmarks: every stage runs against local fixture sites
+# (bench/fixtures.py), a stub yt-dlp and a stand-in transcript endpoint, so
+# numbers are comparable between machines and commits without hitting the
+# network. Per stage, corpus size and HTTP cache mode it reports items,
+# items/s and p50/p99 latency per item, and --check fails when throughput or
+# p50 regress past the tolerance against bench/baseline.json. Baselines are
+# per machine, so none is committed: record one with --save-baseline first.
+#
+#   python bench/run.py --sizes 100,1000 --save-baseline
+#   python bench/run.py --sizes 100,1000 --check
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+BENCH_DIR     = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR      = os.path.dirname(BENCH_DIR)
+BASELINE      = os.path.join(BENCH_DIR, "baseline.json")
+SIZES         = (100, 1_000, 10_000, 100_000)      # church-site pages per corpus
+STAGES        = ("directory", "details", "crawl", "listing", "transcripts")
+# HTTP cache modes: off (HTTP_CACHE=0), cold (empty cache, every GET stored)
+# and warm (the same corpus again, every GET revalidated to a 304)
+HTTP_MODES    = ("off", "cold", "warm")
+TOLERANCE     = 0.20       # allowed slowdown before --check fails
+RATE          = 10_000.0   # limiter rate for the fixtures; they never throttle
+DRIVERS       = 4          # stub browsers in the pool
+MIN_P50_MS    = 1.0        # p50s below this are noise, not compared
+# ──────────────────────────────────────────────────────────── #
+
+# The stubs must shadow the real yt_dlp / youtube_transcript_api, and every
+# module reads its paths and caches from the environment at import time
+sys.path[:0] = [os.path.join(BENCH_DIR, "stubs"), REPO_DIR, BENCH_DIR]
+START_DIR = os.getcwd()     # relative --json / --baseline paths are resolved against this
+WORKDIR = tempfile.mkdtemp(prefix="churchtopics-bench-")    # removed when main() returns
+os.environ["HTTP_CACHE_DIR"] = os.path.join(WORKDIR, "http")
+os.environ["ROBOTS_CACHE_DIR"] = os.path.join(WORKDIR, "robots")
+os.chdir(WORKDIR)
+
+import findChurches  # noqa: E402
+import getWebsites  # noqa: E402
+import everylive  # noqa: E402
+import httpclient  # noqa: E402
+import transcripter  # noqa: E402
+import webcrawler  # noqa: E402
+from httpcache import HttpCache  # noqa: E402
+from ratelimit import AdaptiveRateLimiter  # noqa: E402
+
+from fixtures import Corpus, FixtureFarm  # noqa: E402
+from stubdriver import StubPool  # noqa: E402
+
+webcrawler.REQUEST_DELAY = 0
+
+
+class FixtureError(Exception):
+    # The fixtures were not scraped as designed, so the numbers mean nothing
+    pass
+
+
+class Samples:
+    # Per-item latencies for one stage; thread-safe enough for list.append
+    def __init__(self):
+        self.seconds: list[float] = []
+
+    def timed(self, fn: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds.append(time.perf_counter() - started)
+        return wrapper
+
+
+@contextlib.contextmanager
+def patched(module, name: str, samples: Samples):
+    # Times every call to module.name for the duration of a stage
+    original = getattr(module, name)
+    setattr(module, name, samples.timed(original))
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+# ───── stages ─────
+# Each takes the running fixtures and a shared dict for handing results to
+# the next stage, and returns (items, samples).
+def stage_directory(farm: FixtureFarm, carry: dict) -> tuple[int, Samples]:
+    findChurches.base_url = f"{farm.hub}/directory?page="
+    findChurches.tag_selector = "/church/"
+    findChurches.empty_tag_selector = "p.empty"
+    findChurches.limiter = AdaptiveRateLimiter(RATE, max_rate=RATE, burst=findChurches.PAGE_WORKERS)
+
+    samples = Samples()
+    probe = samples.timed(findChurches.fetch_page)
+    last, seen = findChurches.find_last_page(probe)
+    rows = {}
+    for page in findChurches.sweep(range(1, last + 1), probe, seen, findChurches.PAGE_WORKERS):
+        for name, url in page or ():
+            rows.setdefault(url, name)
+    carry["churches"] = [[name, url] for url, name in rows.items()]
+    return len(samples.seconds), samples
+
+
+def stage_details(farm: FixtureFarm, carry: dict) -> tuple[int, Samples]:
+    state = getWebsites.DetailState(os.path.join(WORKDIR, f"details-{time.time_ns()}.sqlite"))
+    samples = Samples()
+    scrape = samples.timed(lambda row: getWebsites.scrape_details(row, state))
+    websites = {}
+    try:
+        with ThreadPoolExecutor(max_workers=getWebsites.DETAIL_WORKERS) as executor:
+            results = getWebsites.ordered_map(executor, scrape, carry["churches"], getWebsites.DETAIL_WORKERS * 4)
+            for details, outcome, digest in results:
+                if digest:
+                    state.record(details[1], digest, details[2:])
+                if details[2] not in ("N/A", "Error"):
+                    websites.setdefault(details[2], None)
+    finally:
+        state.close()
+    carry["websites"] = list(websites)
+    return len(samples.seconds), samples
+
+
+def stage_crawl(farm: FixtureFarm, carry: dict) -> tuple[int, Samples]:
+    # items are pages visited; latency is per page, static or rendered
+    samples = Samples()
+    pages = 0
+    hits = []
+    sitemap_pages: dict[str, int] = {}
+    ranked = webcrawler.iter_ranked_pages
+
+    def counted(sitemaps):
+        # every fixture site has a sitemap, so a site whose sitemaps yield
+        # nothing means the reader broke, not that the site is empty
+        host = urlparse(sitemaps[0]).netloc
+        sitemap_pages.setdefault(host, 0)
+        for url in ranked(sitemaps):
+            sitemap_pages[host] += 1
+            yield url
+
+    webcrawler.iter_ranked_pages = counted
+    try:
+        with patched(webcrawler, "static_youtube_links", samples), \
+                patched(webcrawler, "rendered_youtube_links", samples):
+            with ThreadPoolExecutor(max_workers=webcrawler.SITE_WORKERS) as executor:
+                for found, stats in executor.map(lambda base: webcrawler.crawl_site(base, carry["pool"]),
+                                                 carry["websites"]):
+                    pages += stats.get("pages", 0)
+                    hits += [link for links in found.values() for link in links]
+    finally:
+        webcrawler.iter_ranked_pages = ranked
+
+    empty = [base for base in carry["websites"] if not sitemap_pages.get(urlparse(base).netloc)]
+    if empty:
+        raise FixtureError(f"{len(empty)} of {len(carry['websites'])} fixture sites yielded no sitemap pages "
+                           f"(first: {empty[0]})")
+    carry["embeds"] = hits
+    return pages, samples
+
+
+def stage_listing(farm: FixtureFarm, carry: dict) -> tuple[int, Samples]:
+    # items are listing entries read; latency is per channel tab
+    corpus = farm.corpus
+    os.environ["BENCH_YTDLP_ENTRIES"] = str(corpus.entries_per_channel)
+    channels = [f"https://www.youtube.com/@gracechurch{n}" for n in range(corpus.channels)]
+    samples = Samples()
+    run = samples.timed(everylive.run_yt_dlp)
+    video_ids = []
+    with ThreadPoolExecutor(max_workers=everylive.CHANNEL_WORKERS) as executor:
+        for entries, head in executor.map(run, channels):
+            video_ids += [e["id"] for e in entries]
+    carry["videos"] = video_ids[: corpus.videos]
+    return corpus.channels * corpus.entries_per_channel, samples
+
+
+def stage_transcripts(farm: FixtureFarm, carry: dict) -> tuple[int, Samples]:
+    os.environ["BENCH_TRANSCRIPT_URL"] = f"{farm.hub}/transcript"
+    limiter = AdaptiveRateLimiter(RATE, max_rate=RATE, burst=transcripter.WORKERS)
+    stamp = time.time_ns()
+    sink = transcripter.TranscriptSink(
+        os.path.join(WORKDIR, f"transcripts-{stamp}.csv"),
+        os.path.join(WORKDIR, f"transcripts-{stamp}.idx"),
+        os.path.join(WORKDIR, f"transcript_status-{stamp}.csv"),
+    )
+    samples = Samples()
+    fetch = samples.timed(lambda vid: (vid,) + transcripter.fetch_transcript(vid, limiter))
+    try:
+        with ThreadPoolExecutor(max_workers=transcripter.WORKERS) as executor:
+            for video_id, status, segments, error in executor.map(fetch, carry["videos"]):
+                if status == "ok":
+                    sink.add(video_id, segments)
+                else:
+                    sink.fail(video_id, status, error)
+    finally:
+        sink.close()
+    return len(samples.seconds), samples
+
+
+STAGE_FUNCS = {
+    "directory": stage_directory,
+    "details": stage_details,
+    "crawl": stage_crawl,
+    "listing": stage_listing,
+    "transcripts": stage_transcripts,
+}
+
+
+# ───── runs and reports ─────
+def summarise(items: int, samples: Samples, seconds: float) -> dict:
+    ordered = sorted(samples.seconds)
+
+    def pct(p: float) -> float | None:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+    return {
+        "items": items,
+        "seconds": round(seconds, 3),
+        "items_per_s": round(items / seconds, 1) if seconds > 0 else None,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+    }
+
+
+def use_http_cache(directory: str | None) -> None:
+    # Swap httpclient's cache between modes, as HTTP_CACHE / HTTP_CACHE_DIR would
+    httpclient.close()
+    httpclient.CACHE_ENABLED = directory is not None
+    httpclient._cache = HttpCache(directory) if directory else None
+
+
+def run_size(pages: int, stages: list[str], modes: list[str], quiet: bool = True) -> dict:
+    # → {"<pages>/<mode>": {stage: summary}}. warm reuses the cache cold
+    # filled, so cold runs (unreported) whenever warm is asked for alone.
+    corpus = Corpus(pages)
+    results = {}
+    cache_dir = os.path.join(WORKDIR, f"http-{pages}")
+    runs = [m for m in HTTP_MODES if m in modes or (m == "cold" and "warm" in modes)]
+    with FixtureFarm(corpus) as farm:
+        for mode in runs:
+            use_http_cache(None if mode == "off" else cache_dir)
+            carry: dict = {"pool": StubPool(DRIVERS)}
+            findChurches.pool = getWebsites.pool = carry["pool"]
+            # later stages need the earlier ones' output, so every stage up to
+            # the last one asked for runs; only the requested ones are reported
+            last = max(STAGES.index(s) for s in stages)
+            for name in STAGES[: last + 1]:
+                sink = open(os.devnull, "w") if quiet else sys.stdout
+                started = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(sink):
+                        items, samples = STAGE_FUNCS[name](farm, carry)
+                finally:
+                    if quiet:
+                        sink.close()
+                elapsed = time.perf_counter() - started
+                if name in stages and mode in modes:
+                    key = f"{pages}/{mode}"
+                    results.setdefault(key, {})[name] = summarise(items, samples, elapsed)
+                    print(format_row(pages, mode, name, results[key][name]), flush=True)
+    use_http_cache(None)
+    return results
+
+
+def format_row(pages: int, mode: str, stage: str, r: dict) -> str:
+    def ms(v):
+        return f"{v:10.2f}" if v is not None else f"{'-':>10}"
+    rate = f"{r['items_per_s']:12.1f}" if r["items_per_s"] is not None else f"{'-':>12}"
+    return f"{pages:>8} {mode:<5} {stage:<12} {r['items']:>9} {rate} {ms(r['p50_ms'])} {ms(r['p99_ms'])}"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    # → one line per regression: throughput down or p50 up by more than `tolerance`
+    regressions = []
+    for size, stages in results.items():
+        for stage, now in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if not before:
+                continue
+            if before.get("items_per_s") and now["items_per_s"] is not None \
+                    and now["items_per_s"] < before["items_per_s"] * (1 - tolerance):
+                regressions.append(f"{size} {stage}: {now['items_per_s']} items/s "
+                                   f"(baseline {before['items_per_s']})")
+            if (before.get("p50_ms") or 0) >= MIN_P50_MS and now["p50_ms"] is not None \
+                    and now["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+                regressions.append(f"{size} {stage}: p50 {now['p50_ms']} ms (baseline {before['p50_ms']} ms)")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every scraping stage against local fixtures.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="Comma-separated corpus sizes, in church-site pages.")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Subset of {','.join(STAGES)}.")
+    parser.add_argument("--http", default=",".join(HTTP_MODES),
+                        help=f"HTTP cache modes to run, a subset of {','.join(HTTP_MODES)}.")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline.")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on regressions against the baseline.")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the scrapers' own output.")
+    args = parser.parse_args(argv)
+    args.baseline = os.path.join(START_DIR, args.baseline)
+    if args.json:
+        args.json = os.path.join(START_DIR, args.json)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    modes = [m for m in args.http.split(",") if m]
+    unknown = set(modes) - set(HTTP_MODES)
+    if unknown or not modes:
+        parser.error(f"--http takes a subset of {','.join(HTTP_MODES)}")
+
+    try:
+        return run(args, sizes, stages, modes)
+    finally:
+        httpclient.close()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+def run(args: argparse.Namespace, sizes: list[int], stages: list[str], modes: list[str]) -> int:
+    print(f"{'pages':>8} {'http':<5} {'stage':<12} {'items':>9} {'items/s':>12} {'p50 ms':>10} {'p99 ms':>10}")
+    results = {}
+    try:
+        for pages in sizes:
+            results.update(run_size(pages, stages, modes, quiet=not args.verbose))
+    except FixtureError as e:
+        print(f"[bench] {e}")
+        return 1
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        for size, stage_results in results.items():
+            baseline.setdefault(size, {}).update(stage_results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"[bench] Baseline saved to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            # numbers only compare on the machine that recorded them
+            print(f"[bench] --check skipped: no baseline at {args.baseline}. "
+                  f"Record one on this machine with --save-baseline.")
+            return 0
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"[bench] {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"[bench] No regressions beyond {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
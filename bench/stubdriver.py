@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import urllib.request
+from contextlib import contextmanager
+from html import unescape
+from typing import Iterator
+from urllib.parse import urljoin
+
+# Edge is not available offline, so the browser fallbacks are benchmarked
+# against this stand-in: it downloads the page and answers the few
+# execute_script calls the scrapers make with what a browser would return
+# once the page's JavaScript had run (the fixture app shells keep their links
+# in a JSON blob). It measures our side of the fallback, not Edge.
+
+_ANCHOR = re.compile(r'<a\b[^>]*?href="([^"]*)"[^>]*>(.*?)</a>', re.S | re.I)
+_IFRAME = re.compile(r'<iframe\b[^>]*?src="([^"]*)"', re.I)
+_APP_DATA = re.compile(r'<script id="app-data" type="application/json">(.*?)</script>', re.S)
+_TAGS = re.compile(r"<[^>]+>")
+_FIELD = r'<div>{}</div><div>(.*?)</div></div>'
+
+
+class _Element:
+    def __init__(self, text: str = ""):
+        self.text = text
+
+
+class StubDriver:
+    def __init__(self):
+        self.url = ""
+        self.source = ""
+
+    def get(self, url: str) -> None:
+        with urllib.request.urlopen(url, timeout=10) as resp:
+            self.url = resp.geturl()
+            self.source = resp.read().decode("utf-8", errors="replace")
+
+    @property
+    def current_url(self) -> str:
+        return self.url
+
+    @property
+    def page_source(self) -> str:
+        return self.source
+
+    def _anchors(self) -> list[tuple[str, str]]:
+        found = [(_TAGS.sub("", text).strip(), urljoin(self.url, unescape(href)))
+                 for href, text in _ANCHOR.findall(self.source)]
+        blob = _APP_DATA.search(self.source)
+        if blob:
+            found += [("", link) for link in json.loads(blob.group(1)).get("links", [])]
+        return found
+
+    def find_elements(self, by, value) -> list[_Element]:
+        if value in ("a", "//a") or "href" in value:
+            return [_Element(text) for text, _ in self._anchors()]
+        if value.startswith("p.") or value.startswith("."):
+            cls = value.split(".", 1)[1]
+            return [_Element()] if f'class="{cls}"' in self.source else []
+        return [_Element()] if value in self.source else []
+
+    def find_element(self, by, value) -> _Element:
+        found = self.find_elements(by, value)
+        # a rendered app shell has anchors even when its HTML has none
+        if not found and by == "tag name":
+            return _Element()
+        if not found:
+            raise LookupError(f"no element {value!r}")
+        return found[0]
+
+    def execute_script(self, script: str, *args):
+        if "XPathResult" in script:
+            def field(label: str) -> str | None:
+                m = re.search(_FIELD.format(label), self.source, re.S)
+                return m.group(1) if m else None
+
+            website = field("Website")
+            href = _ANCHOR.search(website or "")
+            languages = re.findall(r"<li>(.*?)</li>", field("Language") or "")
+            return [
+                urljoin(self.url, href.group(1)) if href else "N/A",
+                _TAGS.sub(" ", field("Denomination") or "N/A").strip(),
+                ", ".join(languages) if languages else "N/A",
+                _TAGS.sub("", field("Size") or "N/A").strip(),
+            ]
+        if "innerText" in script:
+            return [[text, href] for text, href in self._anchors()]
+        hrefs = [href for _, href in self._anchors()]
+        return hrefs + [urljoin(self.url, unescape(src)) for src in _IFRAME.findall(self.source)]
+
+    def set_page_load_timeout(self, seconds: float) -> None:
+        pass
+
+    def set_script_timeout(self, seconds: float) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+class StubPool:
+    # Same surface as driverpool.DriverPool for the code under benchmark
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._free = [StubDriver() for _ in range(size)]
+        self._available = threading.Semaphore(size)
+        self._lock = threading.Lock()
+        self.leases = 0
+
+    @contextmanager
+    def lease(self) -> Iterator[StubDriver]:
+        self._available.acquire()
+        with self._lock:
+            driver = self._free.pop()
+            self.leases += 1
+        try:
+            yield driver
+        finally:
+            with self._lock:
+                self._free.append(driver)
+            self._available.release()
+
+    def close(self) -> None:
+        pass
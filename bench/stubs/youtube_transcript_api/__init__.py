@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+import os
+import urllib.error
+import urllib.request
+
+from . import _errors
+from ._errors import NoTranscriptFound, TooManyRequests, TranscriptsDisabled, VideoUnavailable
+
+# Stand-in for youtube-transcript-api used by bench/run.py: transcripts come
+# from the fixture hub's /transcript/<id> endpoint (BENCH_TRANSCRIPT_URL),
+# whose 404s and 429s map onto the library's exceptions.
+
+
+class YouTubeTranscriptApi:
+    @staticmethod
+    def get_transcript(video_id, languages=("en",)):
+        base = os.environ["BENCH_TRANSCRIPT_URL"].rstrip("/")
+        try:
+            with urllib.request.urlopen(f"{base}/{video_id}", timeout=10) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise TranscriptsDisabled(video_id) from None
+            if e.code == 429:
+                raise TooManyRequests(video_id) from None
+            raise
+
+
+__all__ = ["YouTubeTranscriptApi", "NoTranscriptFound", "TooManyRequests",
+           "TranscriptsDisabled", "VideoUnavailable", "_errors"]
@@ -0,0 +1,20 @@
+class CouldNotRetrieveTranscript(Exception):
+    def __init__(self, video_id):
+        self.video_id = video_id
+        super().__init__(f"Could not retrieve a transcript for the video {video_id}")
+
+
+class TranscriptsDisabled(CouldNotRetrieveTranscript):
+    pass
+
+
+class NoTranscriptFound(CouldNotRetrieveTranscript):
+    pass
+
+
+class VideoUnavailable(CouldNotRetrieveTranscript):
+    pass
+
+
+class TooManyRequests(CouldNotRetrieveTranscript):
+    pass
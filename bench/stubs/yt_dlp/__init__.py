@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+
+from .utils import DownloadError
+
+# Stand-in for yt-dlp used by bench/run.py: put bench/stubs first on sys.path
+# and everylive/channelids get channel listings without touching YouTube.
+# Handles and /c/ URLs answer with a redirect to the /channel/<id>/videos tab,
+# the way the real extractor does; tabs are generators paged like the real
+# lazy listings.
+#
+#   BENCH_YTDLP_ENTRIES     entries per channel tab (default 1000)
+#   BENCH_YTDLP_PAGE        entries per listing page (default 30)
+#   BENCH_YTDLP_PAGE_DELAY  seconds spent "fetching" each page (default 0)
+
+__version__ = "bench-stub"
+
+_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+
+
+def _ident(seed: str, length: int) -> str:
+    digest = hashlib.blake2b(seed.encode(), digest_size=32).digest()
+    return "".join(_CHARS[b % 64] for b in digest[:length])
+
+
+def _entries(channel: str, count: int, page: int, delay: float):
+    now = int(time.time())
+    for n in range(count):
+        if n % page == 0 and delay:
+            time.sleep(delay)
+        video_id = _ident(f"{channel}/{n}", 11)
+        yield {
+            "_type": "url",
+            "ie_key": "Youtube",
+            "id": video_id,
+            "url": f"https://www.youtube.com/watch?v={video_id}",
+            "title": f"Sunday service {n}",
+            # newest first; every third one is a full-length service
+            "duration": 3600 + n % 900 if n % 3 == 0 else 600 + n % 600,
+            "timestamp": now - n * 7 * 86400,
+        }
+
+
+class YoutubeDL:
+    def __init__(self, params: dict | None = None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=True, ie_key=None, process=True, **kwargs):
+        path = url.split("youtube.com", 1)[-1]
+        segments = [s for s in path.split("?")[0].split("/") if s]
+        if not segments:
+            raise DownloadError(f"ERROR: Unsupported URL: {url}")
+
+        if segments[0] == "channel" and len(segments) > 1:
+            channel = segments[1]
+            tab = segments[2] if len(segments) > 2 else "videos"
+            count = int(os.getenv("BENCH_YTDLP_ENTRIES", "1000"))
+            page = int(os.getenv("BENCH_YTDLP_PAGE", "30"))
+            delay = float(os.getenv("BENCH_YTDLP_PAGE_DELAY", "0"))
+            entries = _entries(f"{channel}/{tab}", count if tab == "videos" else count // 10, page, delay)
+            return {
+                "_type": "playlist",
+                "id": channel,
+                "channel_id": channel,
+                "title": f"{channel} - {tab.title()}",
+                "webpage_url": url,
+                "entries": entries if not process else list(entries),
+            }
+
+        if segments[0].startswith("@") or segments[0] in ("c", "user"):
+            handle = segments[-1] if segments[0] in ("c", "user") else segments[0]
+            channel = "UC" + _ident(f"channel:{handle.lower()}", 22)
+            return {"_type": "url", "ie_key": "YoutubeTab",
+                    "url": f"https://www.youtube.com/channel/{channel}/videos"}
+
+        if segments[0] in ("watch", "embed", "shorts", "live"):
+            video_id = url.split("v=", 1)[1][:11] if segments[0] == "watch" else segments[1][:11]
+            return {"id": video_id, "channel_id": "UC" + _ident(f"owner:{video_id}", 22),
+                    "title": "Sunday service", "duration": 3600}
+
+        raise DownloadError(f"ERROR: Unsupported URL: {url}")
@@ -0,0 +1,34 @@
+import json
+import sys
+
+from . import YoutubeDL
+from .utils import DownloadError
+
+# `yt-dlp -J URL` (one JSON document) or `yt-dlp -j URL` (one entry per line),
+# for checking the stub's listings by hand or from shell scripts
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    urls = [a for a in argv if not a.startswith("-")]
+    lines = "-j" in argv or "--dump-json" in argv
+    ydl = YoutubeDL()
+    try:
+        for url in urls:
+            info = ydl.extract_info(url, download=False, process=False)
+            while info.get("_type") in ("url", "url_transparent"):
+                info = ydl.extract_info(info["url"], download=False, process=False)
+            if lines:
+                for entry in info.get("entries") or [info]:
+                    sys.stdout.write(json.dumps(entry) + "\n")
+            else:
+                info["entries"] = list(info.get("entries") or [])
+                sys.stdout.write(json.dumps(info) + "\n")
+    except DownloadError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+class DownloadError(Exception):
+    pass
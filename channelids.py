@@ -0,0 +1,171 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+from yt_dlp.utils import DownloadError
+
+import metrics
+
+CACHE_PATH = "channel_ids.sqlite"
+RESOLVE_WORKERS = int(os.getenv("RESOLVE_WORKERS", "8"))  # lookups run at once per batch
+RETRY_FAILED_AFTER = 7 * 24 * 3600  # seconds before an unresolvable URL is tried again
+# yt-dlp messages that mean the URL itself is dead; any other failure (429,
+# bot check, network) is retried on the next run instead of being cached.
+# Whole phrases, since YouTube also says "temporarily unavailable" and
+# "Video unavailable. This content isn't available, try again later" when
+# it is only throttling; TRANSIENT_ERRORS overrides a permanent match.
+PERMANENT_ERRORS = ("this channel does not exist", "http error 404", "this video has been removed",
+                    "this video is no longer available", "account has been terminated",
+                    "channel has been terminated", "private video", "this video is private")
+TRANSIENT_ERRORS = ("temporarily", "try again later", "http error 429", "too many requests",
+                    "sign in to confirm")
+
+CHANNEL_ID = re.compile(r"^UC[0-9A-Za-z_-]{22}$")
+VIDEO_ID = re.compile(r"^[0-9A-Za-z_-]{11}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_ids (
+    key         TEXT PRIMARY KEY,   -- e.g. handle:@gracechurch, user:gracechurch, video:dQw4w9WgXcQ
+    channel_id  TEXT,               -- NULL while unresolvable
+    resolved_at REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _ydl():
+    ydl = getattr(_local, "ydl", None)
+    if ydl is None:
+        ydl = _local.ydl = yt_dlp.YoutubeDL({
+            "extract_flat": "in_playlist",
+            "lazy_playlist": True,
+            "skip_download": True,
+            "quiet": True,
+            "no_warnings": True,
+            "socket_timeout": 30,
+        })
+    return ydl
+
+
+def url_key(url):
+    # Every form a channel shows up in maps to one cache key, or None
+    parts = urlparse(url.strip())
+    host = (parts.hostname or "").lower()
+    segments = [s for s in parts.path.split("/") if s]
+
+    if host.endswith("youtu.be") and segments:
+        video = segments[0]
+        return f"video:{video}" if VIDEO_ID.match(video) else None
+    if not host.endswith("youtube.com") and not host.endswith("youtube-nocookie.com"):
+        return None
+    if not segments:
+        return None
+
+    head = segments[0]
+    if head == "channel" and len(segments) > 1 and CHANNEL_ID.match(segments[1]):
+        return f"channel:{segments[1]}"
+    if head.startswith("@"):
+        return f"handle:{head.lower()}"
+    if head in ("c", "user") and len(segments) > 1:
+        return f"{head}:{segments[1].lower()}"
+    if head == "watch":
+        video = parse_qs(parts.query).get("v", [""])[0]
+        return f"video:{video}" if VIDEO_ID.match(video) else None
+    if head in ("embed", "live", "shorts", "v") and len(segments) > 1 and VIDEO_ID.match(segments[1]):
+        return f"video:{segments[1]}"
+    return None
+
+
+def _key_url(key):
+    kind, ref = key.split(":", 1)
+    if kind == "handle":
+        return f"https://www.youtube.com/{ref}"
+    if kind in ("c", "user"):
+        return f"https://www.youtube.com/{kind}/{ref}"
+    return f"https://www.youtube.com/watch?v={ref}"
+
+
+def is_permanent(message):
+    message = message.lower()
+    return any(m in message for m in PERMANENT_ERRORS) and not any(m in message for m in TRANSIENT_ERRORS)
+
+
+def _probe(key):
+    # → (channel_id or None, cacheable). Never raises, so one bad key cannot
+    # abort the batch in resolve_many.
+    ydl = _ydl()
+    try:
+        with metrics.timer("ytdlp_seconds", op="resolve"):
+            info = ydl.extract_info(_key_url(key), download=False, process=False)
+            while info and info.get("_type") in ("url", "url_transparent") and not info.get("channel_id"):
+                info = ydl.extract_info(info["url"], ie_key=info.get("ie_key"),
+                                        download=False, process=False)
+    except Exception as e:
+        message = str(e).strip()
+        permanent = isinstance(e, DownloadError) and is_permanent(message)
+        print(f"⚠ Could not resolve {key}{'' if permanent else ' (will retry)'}: {message}")
+        return None, permanent
+    channel_id = (info or {}).get("channel_id")
+    return (channel_id if channel_id and CHANNEL_ID.match(channel_id) else None), True
+
+
+class ChannelIdCache:
+    def __init__(self, path=CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def resolve_many(self, urls, probe=True):
+        # → {url: channel_id or None}. Cached keys cost one query for the whole
+        # batch; the rest are looked up concurrently and stored in one commit.
+        # probe=False answers from the cache only.
+        keys = {url: url_key(url) for url in urls}
+        wanted = {k for k in keys.values() if k and not k.startswith("channel:")}
+
+        known = {}
+        now = time.time()
+        for key, channel_id, resolved_at in self._lookup(wanted):
+            if channel_id or now - resolved_at < RETRY_FAILED_AFTER:
+                known[key] = channel_id
+
+        missing = sorted(wanted - known.keys())
+        if missing and probe:
+            print(f"🔎 Resolving {len(missing)} channel URLs ({len(wanted) - len(missing)} cached)")
+            with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as pool:
+                found = dict(zip(missing, pool.map(_probe, missing)))
+            # transient failures stay out of the cache and are probed again next run
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO channel_ids (key, channel_id, resolved_at) VALUES (?, ?, ?)",
+                [(k, v, now) for k, (v, cacheable) in found.items() if cacheable],
+            )
+            self.conn.commit()
+            known.update((k, v) for k, (v, _) in found.items())
+
+        out = {}
+        for url, key in keys.items():
+            if key is None:
+                out[url] = None
+            elif key.startswith("channel:"):
+                out[url] = key.split(":", 1)[1]
+            else:
+                out[url] = known.get(key)
+        return out
+
+    def _lookup(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), 500):   # SQLite caps bound parameters
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            yield from self.conn.execute(
+                f"SELECT key, channel_id, resolved_at FROM channel_ids WHERE key IN ({marks})",
+                chunk,
+            )
+
+    def close(self):
+        self.conn.close()
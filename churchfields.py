@@ -0,0 +1,113 @@
+import html
+import re
+
+# Derived, indexable fields computed from the raw scraped Church columns.
+# Shared by migrateMongo.py (backfill), the loader and queryMongo.py (so query
+# input is normalised exactly like the stored keys).
+
+SIZE_RANGE = re.compile(r"^(\d+)-(\d+)$")
+SIZE_OPEN = re.compile(r"^(\d+)\+$")
+SIZE_EXACT = re.compile(r"^(\d+)$")
+LANGUAGE_SPLIT = re.compile(r"\s*[,;/]\s*")
+MISSING = ("", "n/a", "error", "none")
+
+# family -> phrases that place a denomination key in it (checked in order)
+DENOMINATION_FAMILIES = [
+    ("catholic", ("roman catholic", "catholic")),
+    ("orthodox", ("orthodox",)),
+    ("anglican", ("anglican", "episcopal", "church of england")),
+    ("lutheran", ("lutheran",)),
+    ("reformed", ("reformed", "presbyterian", "christian reformed", "calvinist")),
+    ("methodist", ("methodist", "wesleyan", "free methodist", "nazarene", "salvation army")),
+    ("baptist", ("baptist",)),
+    ("pentecostal", ("pentecostal", "assemblies of god", "assembly of god", "foursquare",
+                     "church of god", "apostolic")),
+    ("charismatic", ("charismatic", "vineyard", "calvary chapel")),
+    ("anabaptist", ("mennonite", "amish", "brethren", "anabaptist")),
+    ("restorationist", ("church of christ", "churches of christ", "christian church", "disciples of christ")),
+    ("adventist", ("adventist",)),
+    ("congregational", ("congregational", "united church of christ", "evangelical covenant")),
+    ("non-denominational", ("non-denominational", "nondenominational", "non denominational",
+                            "independent", "interdenominational")),
+    ("evangelical", ("evangelical", "bible church", "alliance")),
+]
+
+
+# ───── size ─────
+def parse_size(size):
+    # "1,000 - 2,000" -> (1000, 2000, None); "2000+" -> (2000, None, "open_ended")
+    if size is None:
+        return None, None, "missing"
+    clean = str(size).replace(",", "").replace(" ", "").replace("–", "-")
+    if clean.lower() in MISSING:
+        return None, None, "missing"
+    m = SIZE_RANGE.match(clean)
+    if m:
+        low, high = int(m.group(1)), int(m.group(2))
+        return min(low, high), max(low, high), None
+    m = SIZE_OPEN.match(clean)
+    if m:
+        return int(m.group(1)), None, "open_ended"
+    m = SIZE_EXACT.match(clean)
+    if m:
+        return int(m.group(1)), int(m.group(1)), None
+    return None, None, "unparseable"
+
+
+# ───── language ─────
+def normalize_languages(value):
+    # "English, Spanish" (getWebsites.py joins the <li>s with ", ") -> ["english", "spanish"]
+    if value is None:
+        return []
+    parts = value if isinstance(value, list) else LANGUAGE_SPLIT.split(str(value))
+    out = []
+    for part in parts:
+        lang = " ".join(str(part).split()).lower()
+        if lang and lang not in MISSING and lang not in out:
+            out.append(lang)
+    return out
+
+
+# ───── denomination ─────
+def denomination_key(value):
+    # Canonical lowercase form: entities decoded, <br> and punctuation runs removed
+    if value is None:
+        return None
+    text = html.unescape(re.sub(r"<[^>]+>", " ", str(value)))
+    text = re.sub(r"[^\w\s&'-]+", " ", text.lower())
+    text = " ".join(text.split()).strip("-' ")
+    return None if text in MISSING else text
+
+
+def denomination_family(key):
+    if not key:
+        return None
+    for family, phrases in DENOMINATION_FAMILIES:
+        if any(p in key for p in phrases):
+            return family
+    return "other"
+
+
+# ───── all derived fields ─────
+def derived_fields(doc):
+    # The $set/$unset update that materialises every derived field for one document.
+    # *_src copies let a rerun find documents whose raw value changed.
+    min_size, max_size, flag = parse_size(doc.get("Size"))
+    key = denomination_key(doc.get("Denomination"))
+    update = {
+        "$set": {
+            "min_size": min_size,
+            "max_size": max_size,
+            "size_src": doc.get("Size"),
+            "languages": normalize_languages(doc.get("Language")),
+            "language_src": doc.get("Language"),
+            "denomination_key": key,
+            "denomination_family": denomination_family(key),
+            "denomination_src": doc.get("Denomination"),
+        }
+    }
+    if flag:
+        update["$set"]["size_flag"] = flag
+    else:
+        update["$unset"] = {"size_flag": ""}
+    return update
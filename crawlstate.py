@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+import time
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+STATE_PATH      = "crawl_state.sqlite"
+COMMIT_EVERY    = 50        # site records per transaction
+COMMIT_INTERVAL = 5.0       # …or seconds, whichever comes first
+# ──────────────────────────────────────────────────────────── #
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    base        TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,          -- done | error
+    pages_tried INTEGER NOT NULL DEFAULT 0,
+    hits        INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hits (
+    base  TEXT NOT NULL,
+    page  TEXT NOT NULL,
+    links TEXT NOT NULL,                -- ", "-joined, same as the CSV column
+    PRIMARY KEY (base, page)
+);
+"""
+
+
+class CrawlState:
+    def __init__(
+        self,
+        path: str = STATE_PATH,
+        *,
+        commit_every: int = COMMIT_EVERY,
+        commit_interval: float = COMMIT_INTERVAL,
+    ):
+        self.conn = sqlite3.connect(path, check_same_thread=False)  # pipeline.py records from its workers
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    # ───── run control ─────
+    def reset(self) -> None:
+        self.conn.execute("DELETE FROM hits")
+        self.conn.execute("DELETE FROM sites")
+        self.conn.commit()
+
+    def completed(self) -> set[str]:
+        rows = self.conn.execute("SELECT base FROM sites WHERE status = 'done'")
+        return {base for (base,) in rows}
+
+    # ───── recording ─────
+    def record(
+        self,
+        base: str,
+        hits: dict[str, list[str]],
+        *,
+        pages_tried: int = 0,
+        error: str | None = None,
+    ) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sites (base, status, pages_tried, hits, error, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (base, "error" if error else "done", pages_tried, len(hits), error, time.time()),
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO hits (base, page, links) VALUES (?, ?, ?)",
+            [(base, page, ", ".join(links)) for page, links in hits.items()],
+        )
+        self._pending += 1
+        if (
+            self._pending >= self.commit_every
+            or time.monotonic() - self._last_commit >= self.commit_interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        self.conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    # ───── reporting ─────
+    def summary(self) -> dict[str, int]:
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM sites GROUP BY status")
+        return dict(rows.fetchall())
+
+    def export_csv(self, path: str) -> int:
+        rows = self.conn.execute("SELECT page, links FROM hits ORDER BY base, page")
+        n = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Website", "YouTube Links"])
+            for row in rows:
+                writer.writerow(row)
+                n += 1
+        return n
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
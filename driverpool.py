@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.edge.service import Service
+from selenium.webdriver.edge.options import Options
+
+import metrics
+
+try:
+    import psutil
+except ImportError:             # memory cap then relies on the V8 heap flag alone
+    psutil = None
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+EDGE_DRIVER    = os.getenv("EDGE_DRIVER_PATH")
+POOL_SIZE      = int(os.getenv("DRIVER_POOL_SIZE", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_PAGES      = int(os.getenv("DRIVER_MAX_PAGES", "200"))       # recycle after K pages
+MAX_MEMORY_MB  = int(os.getenv("DRIVER_MAX_MEMORY_MB", "1500"))  # per browser, all processes
+HEADLESS       = True
+PAGE_TIMEOUT   = 30
+# ──────────────────────────────────────────────────────────── #
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _Worker:
+    def __init__(self, driver: webdriver.Edge):
+        self.driver = driver
+        self.pages = 0
+        self.suspect = False
+
+
+class DriverPool:
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        driver_path: str | None = EDGE_DRIVER,
+        *,
+        headless: bool = HEADLESS,
+        max_pages: int = MAX_PAGES,
+        max_memory_mb: int = MAX_MEMORY_MB,
+    ):
+        if not driver_path or not os.path.exists(driver_path):
+            raise RuntimeError("EDGE_DRIVER_PATH env var not set or invalid")
+        self.size = size
+        self.driver_path = driver_path
+        self.headless = headless
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+
+        # one token per slot: None means "start a browser when leased"
+        self._slots: queue.LifoQueue[_Worker | None] = queue.LifoQueue()
+        for _ in range(size):
+            self._slots.put(None)
+        self._live: set[_Worker] = set()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.recycled = 0
+
+    # ───── browser lifecycle ─────
+    def _start(self) -> _Worker:
+        opts = Options()
+        if self.headless:
+            opts.add_argument("--headless=new")
+        opts.add_argument("--disable-gpu")
+        opts.add_argument("--window-size=1920,1080")
+        opts.add_argument("--disable-extensions")
+        opts.add_argument(f"--js-flags=--max-old-space-size={self.max_memory_mb}")
+        with metrics.timer("browser_start_seconds"):
+            driver = webdriver.Edge(service=Service(self.driver_path), options=opts)
+        driver.set_page_load_timeout(PAGE_TIMEOUT)
+
+        w = _Worker(driver)
+        with self._lock:
+            self._live.add(w)
+            self.started += 1
+        return w
+
+    def _stop(self, w: _Worker) -> None:
+        with self._lock:
+            self._live.discard(w)
+        try:
+            w.driver.quit()
+        except Exception:
+            pass
+
+    def _memory_mb(self, w: _Worker) -> float:
+        if psutil is None:
+            return 0.0
+        try:
+            root = psutil.Process(w.driver.service.process.pid)
+            procs = [root, *root.children(recursive=True)]
+            return sum(p.memory_info().rss for p in procs) / 2**20
+        except (psutil.Error, AttributeError):
+            return 0.0
+
+    def _alive(self, w: _Worker) -> bool:
+        try:
+            return w.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def _worn_out(self, w: _Worker) -> bool:
+        if w.pages >= self.max_pages:
+            return True
+        if w.suspect and not self._alive(w):
+            return True
+        return self._memory_mb(w) > self.max_memory_mb
+
+    # ───── leasing ─────
+    @contextmanager
+    def lease(self, timeout: float | None = None) -> Iterator[webdriver.Edge]:
+        waited = time.perf_counter()
+        try:
+            w = self._slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("no browser free in the driver pool") from None
+        metrics.observe("browser_lease_wait_seconds", time.perf_counter() - waited)
+        try:
+            if w is not None and not self._alive(w):
+                self._stop(w)
+                self.recycled += 1
+                w = None
+            if w is None:
+                w = self._start()
+        except BaseException:
+            self._slots.put(None)
+            raise
+
+        try:
+            yield w.driver
+        except WebDriverException:
+            w.suspect = True
+            raise
+        finally:
+            w.pages += 1
+            if self._worn_out(w):
+                self._stop(w)
+                self.recycled += 1
+                self._slots.put(None)
+            else:
+                w.suspect = False
+                self._slots.put(w)
+
+    def map(self, fn: Callable[[webdriver.Edge, T], R], items: Iterable[T]) -> Iterator[R]:
+        # Ordered like Executor.map, but only keeps ~2×size items in flight so
+        # a 10k-row input never turns into 10k pending futures.
+        def run(item: T) -> R:
+            with self.lease() as driver:
+                return fn(driver, item)
+
+        with ThreadPoolExecutor(max_workers=self.size) as pool:
+            pending: deque = deque()
+            for item in items:
+                pending.append(pool.submit(run, item))
+                if len(pending) >= self.size * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def close(self) -> None:
+        with self._lock:
+            live = list(self._live)
+        for w in live:
+            self._stop(w)
+
+    def __enter__(self) -> DriverPool:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
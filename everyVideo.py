@@ -1,64 +1,106 @@
-import time
+import re
 import csv
 import os
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
+from urllib.parse import urlparse, parse_qs
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from dotenv import load_dotenv
 
-class EveryVideo:
-    @staticmethod
-    def GetIds(channel_url):
-        # Set up Edge WebDriver
-        edge_driver_path = os.getenv('EDGE_DRIVER_PATH')
-        service = Service(executable_path=edge_driver_path)
-        driver = webdriver.Edge(service=service)
+from driverpool import DriverPool
 
-        # Open YouTube channel videos page
-        driver.get(channel_url)
+MAX_IDS = int(os.getenv('MAX_VIDEO_IDS', '100'))  # Default cap on IDs per channel
+GROWTH_TIMEOUT = 5  # Seconds to wait for more videos before calling the list finished
+OUTPUT_FILE = 'ID_HoldingCell.csv'
 
-        # Wait for the page to load and for the video links to appear
-        wait = WebDriverWait(driver, 10)  # Explicit wait, up to 10 seconds
-        wait.until(EC.presence_of_element_located((By.XPATH, '//a[contains(@href, "/watch")]')))  # Wait for video links
+VIDEO_ID = re.compile(r"^[0-9A-Za-z_-]{11}$")
 
-        # Scroll down to load more videos (if necessary)
-        scroll_pause_time = 2
-        last_height = driver.execute_script("return document.documentElement.scrollHeight")
+# One round trip per pass: hand back the anchors not seen yet (marking them),
+# scroll, and if nothing new was waiting, let a MutationObserver wait for the
+# page to grow. Returns [hrefs, timed_out].
+HARVEST_JS = """
+const timeoutMs = arguments[0], done = arguments[arguments.length - 1];
+const NEW = 'a[href*="/watch"]:not([data-harvested])';
+const take = () => Array.from(document.querySelectorAll(NEW), a => {
+    a.setAttribute('data-harvested', '');
+    return a.href;
+});
+const fresh = take();
+window.scrollTo(0, document.documentElement.scrollHeight);
+if (fresh.length) { done([fresh, false]); return; }
 
-        video_ids = set()
-        while len(video_ids) < 100:  # Limit to 100 video IDs
-            # Scroll to the bottom of the page
-            driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+let finished = false, timer = null;
+const observer = new MutationObserver(() => { if (document.querySelector(NEW)) finish(false); });
+function finish(timedOut) {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done([take(), timedOut]);
+}
+observer.observe(document.body, {childList: true, subtree: true, attributes: true, attributeFilter: ['href']});
+timer = setTimeout(() => finish(true), timeoutMs);
+"""
 
-            # Wait for new videos to load
-            time.sleep(scroll_pause_time)
 
-            # Find all video elements by XPath and extract URLs
-            video_elements = driver.find_elements(By.XPATH, '//a[contains(@href, "/watch")]')
+def parse_video_id(href):
+    # "https://www.youtube.com/watch?v=abcdefghijk&t=30s" -> "abcdefghijk"
+    parts = urlparse(href or "")
+    if parts.path == "/watch":
+        video_id = parse_qs(parts.query).get("v", [""])[0]
+    elif parts.path.startswith("/shorts/"):
+        video_id = parts.path.split("/")[2]
+    else:
+        return None
+    return video_id if VIDEO_ID.match(video_id) else None
 
-            # Add video IDs to the set
-            for element in video_elements:
-                if len(video_ids) >= 100:  # Stop if we already have 100 IDs
-                    break
-                video_id = element.get_attribute('href').split('=')[-1]
-                video_ids.add(video_id)
 
-            # Check if we've reached the bottom of the page
-            new_height = driver.execute_script("return document.documentElement.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
+class EveryVideo:
+    @staticmethod
+    def GetIds(channel_url, pool=None, limit=MAX_IDS, output_file=OUTPUT_FILE):
+        # Borrow a browser from the shared pool (or a one-off pool of one)
+        own_pool = pool is None
+        if own_pool:
+            pool = DriverPool(1, os.getenv('EDGE_DRIVER_PATH'))
+        try:
+            with pool.lease() as driver:
+                video_ids = EveryVideo._harvest(driver, channel_url, limit)
+        finally:
+            if own_pool:
+                pool.close()
 
-        # Write the first 100 unique video IDs to a CSV file
-        with open('ID_HoldingCell.csv', mode='w', newline='', encoding='utf-8') as file:
+        # Write every harvested video ID to the CSV file, in page order
+        with open(output_file, mode='w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
-            for video_id in list(video_ids)[:1]:  # Ensure only the first 100 are written
+            for video_id in video_ids:
                 writer.writerow([video_id])  # Write each unique video ID on a new line
 
         # Confirm completion
-        print(f"Extracted {len(video_ids)} unique video IDs (up to 100) and saved to ID_HoldingCell.csv")
+        print(f"Extracted {len(video_ids)} unique video IDs (cap {limit}) and saved to {output_file}")
+        return video_ids
+
+    @staticmethod
+    def _harvest(driver, channel_url, limit=MAX_IDS):
+        # Open YouTube channel videos page
+        driver.get(channel_url)
+
+        # Wait for the page to load and for the video links to appear
+        wait = WebDriverWait(driver, 10)  # Explicit wait, up to 10 seconds
+        wait.until(EC.presence_of_element_located((By.XPATH, '//a[contains(@href, "/watch")]')))  # Wait for video links
+
+        driver.set_script_timeout(GROWTH_TIMEOUT + 10)
+
+        # dict keeps the order the videos appear in; each anchor is read only once
+        video_ids = {}
+        while len(video_ids) < limit:
+            hrefs, timed_out = driver.execute_async_script(HARVEST_JS, GROWTH_TIMEOUT * 1000)
+            for href in hrefs:
+                video_id = parse_video_id(href)
+                if video_id:
+                    video_ids.setdefault(video_id, None)
+
+            # Nothing new within GROWTH_TIMEOUT: the end of the list
+            if timed_out and not hrefs:
+                break
 
-        # Close the WebDriver
-        driver.quit()
+        return list(video_ids)[:limit]
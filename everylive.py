@@ -1,104 +1,290 @@
 import os
+import argparse
 import json
-import subprocess
 import csv
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import yt_dlp
+from yt_dlp.utils import DownloadError
+
+import metrics
+from channelids import ChannelIdCache
 
 INPUT_CSV = "youtube_links_output.csv"
 OUTPUT_DIR = "dumps"
 MIN_DURATION = 1800  # 30 minutes
+CHANNEL_WORKERS = int(os.getenv("CHANNEL_WORKERS", "8"))  # channels enumerated at once
+ENTRY_DEADLINE = 60  # seconds allowed between two entries before a tab is abandoned
+HWM_DIR = os.path.join(OUTPUT_DIR, ".hwm")  # per-channel high-water marks for --refresh
+HWM_KEEP = 20  # newest IDs remembered per channel
+STOP_AFTER_KNOWN = 3  # known IDs met before a refresh stops listing a tab
+
+YDL_OPTS = {
+    "extract_flat": "in_playlist",
+    "lazy_playlist": True,
+    "skip_download": True,
+    "quiet": True,
+    "no_warnings": True,
+    "socket_timeout": 30,
+}
+
+os.makedirs(HWM_DIR, exist_ok=True)
+
+# One YoutubeDL per worker thread: it keeps its extractor instances (and their
+# warmed-up sessions/cookies) alive between channels instead of re-creating them.
+_local = threading.local()
+
+
+def _ydl():
+    ydl = getattr(_local, "ydl", None)
+    if ydl is None:
+        ydl = _local.ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+    return ydl
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def get_channel_info(url):
+    # raw handle / channel reference the way dump files used to be named
     if "/channel/" in url:
         return "channel", url.split("/channel/")[-1].split("/")[0]
     if "/@" in url:
         return "handle", url.split("/@")[-1].split("/")[0]
     return None, None
 
-def run_yt_dlp(url):
+
+def iter_entries(url, deadline=ENTRY_DEADLINE):
+    ydl = _ydl()
+    with metrics.timer("ytdlp_seconds", op="extract"):
+        info = ydl.extract_info(url, download=False, process=False)
+        # channel URLs can resolve to a redirect before the actual tab playlist
+        while info and info.get("_type") in ("url", "url_transparent"):
+            info = ydl.extract_info(info["url"], ie_key=info.get("ie_key"),
+                                    download=False, process=False)
+
+    # The lazy entries generator fetches the next listing page inside next(),
+    # so it runs on its own thread and the deadline is a wait on the queue: a
+    # stalled page is abandoned after `deadline` seconds, not after it returns.
+    entries = queue.Queue(maxsize=100)
+    stop = threading.Event()
+    finished = threading.Event()   # the producer no longer touches the YoutubeDL
+    done = object()
+
+    def put(item):
+        # False once the consumer has gone away (early break or deadline)
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for entry in (info or {}).get("entries") or []:
+                if entry and not put(entry):
+                    return
+        except Exception as e:   # re-raised on the consumer side
+            finished.set()
+            put(e)
+            return
+        finished.set()
+        put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
     try:
-        result = subprocess.run(
-            ["yt-dlp", "--flat-playlist", "--dump-json", url],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=60
-        )
-        if result.returncode != 0:
-            print(f"⚠ yt-dlp error:\n{result.stderr.strip()}")
-            return []
-
-        entries = []
-        for line in result.stdout.splitlines():
+        while True:
             try:
-                entry = json.loads(line)
-            except json.JSONDecodeError:
+                item = entries.get(timeout=deadline)
+            except queue.Empty:
+                print(f"⚠ yt-dlp stalled for {deadline:.0f}s, keeping entries so far.")
+                return
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Left early (stall, STOP_AFTER_KNOWN, an error): the producer may still
+        # be inside next() on this YoutubeDL, so the next channel gets a new one
+        if not finished.is_set():
+            _local.ydl = None
+
+
+def run_yt_dlp(url, known=None):
+    # Entries stream in page by page, so the duration filter runs as they arrive.
+    # With `known` (IDs from earlier runs) the listing, which is newest-first,
+    # stops once it reaches STOP_AFTER_KNOWN of them.
+    known = known or set()
+    entries, head = [], []
+    hits = 0
+    started = time.perf_counter()
+    try:
+        for entry in iter_entries(url):
+            metrics.inc("ytdlp_entries")
+            video_id = entry.get("id")
+            if video_id in known:
+                hits += 1
+                if hits >= STOP_AFTER_KNOWN:
+                    break
                 continue
+            if len(head) < HWM_KEEP:
+                head.append(video_id)
             duration = entry.get("duration") or 0
             if duration >= MIN_DURATION:
                 entries.append({
-                    "id": entry.get("id"),
+                    "id": video_id,
                     "title": entry.get("title"),
                     "duration": duration,
-                    "url": f"https://youtube.com/watch?v={entry.get('id')}",
+                    "url": f"https://youtube.com/watch?v={video_id}",
+                    "timestamp": entry.get("timestamp") or entry.get("release_timestamp"),
                 })
-        return entries
+    except DownloadError as e:
+        metrics.inc("ytdlp_errors", error=type(e).__name__, op="list")
+        print(f"⚠ yt-dlp error:\n{str(e).strip()}")
+    # the whole tab listing, entries pages included
+    metrics.observe("ytdlp_seconds", time.perf_counter() - started, op="list")
+    return entries, head
+
+
+# ───── high-water marks ─────
+def _hwm_path(channel_ref):
+    return os.path.join(HWM_DIR, f"{channel_ref}.json")
+
+
+def load_hwm(channel_ref):
+    try:
+        with open(_hwm_path(channel_ref), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hwm(channel_ref, tab, head, entries, previous):
+    newest = max((e["timestamp"] for e in entries if e.get("timestamp")),
+                 default=previous.get("newest_timestamp"))
+    _write_json(_hwm_path(channel_ref), {
+        "tab": tab,
+        # newest IDs first, topped up with the previous mark so a deleted
+        # video at the head never makes us re-list the whole channel
+        "ids": list(dict.fromkeys(head + previous.get("ids", [])))[:HWM_KEEP],
+        "newest_timestamp": newest,
+        "updated_at": int(time.time()),
+    })
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _tab_url(channel_id, tab):
+    return f"https://www.youtube.com/channel/{channel_id}/{tab}"
+
+
+def scrape_channel(idx, channel_ref, refresh=False):
+    outfile = os.path.join(OUTPUT_DIR, f"{channel_ref}.json")
+    existing = []
+    if os.path.exists(outfile):
+        if not refresh:
+            print(f"[{idx}] ✅ Already scraped file: {outfile}")
+            return
+        with open(outfile, encoding="utf-8") as f:
+            existing = json.load(f)
+
+    hwm = load_hwm(channel_ref) if refresh else {}
+    # IDs already in the dump work as a stop marker for dumps made before HWMs
+    known = set(hwm.get("ids", [])) | {e.get("id") for e in existing}
+
+    # First try the /streams tab (or whichever tab the dump came from)
+    tab = hwm.get("tab", "streams")
+    data, head = run_yt_dlp(_tab_url(channel_ref, tab), known)
+
+    # Fallback to /videos if no qualifying streams
+    if not data and not existing and tab == "streams":
+        print(f"[{idx}] ⚠ No qualifying livestreams, falling back to videos tab.")
+        tab = "videos"
+        data, head = run_yt_dlp(_tab_url(channel_ref, tab), known)
+
+    if head:
+        save_hwm(channel_ref, tab, head, data, hwm)
+
+    if data:
+        # new entries go on top; everything already in the dump is kept as is
+        seen_ids = {e.get("id") for e in existing}
+        merged = [e for e in data if e["id"] not in seen_ids] + existing
+        _write_json(outfile, merged)
+        print(f"[{idx}] 💾 Saved {len(merged) - len(existing)} new entries to {outfile}")
+    elif existing:
+        print(f"[{idx}] ✅ No new videos since last run.")
+    else:
+        print(f"[{idx}] ❌ No qualifying videos found.")
+
+
+def adopt_legacy_dump(legacy_ref, channel_id):
+    # Dumps used to be named after the raw @handle; move them to the channel ID
+    for folder in (OUTPUT_DIR, HWM_DIR):
+        old = os.path.join(folder, f"{legacy_ref}.json")
+        new = os.path.join(folder, f"{channel_id}.json")
+        if legacy_ref != channel_id and os.path.exists(old) and not os.path.exists(new):
+            os.replace(old, new)
+            print(f"📦 Renamed {old} → {new}")
 
-    except subprocess.TimeoutExpired:
-        print("⚠ yt-dlp timed out.")
-        return []
 
 def main():
+    parser = argparse.ArgumentParser(description="Dump long videos for every channel in the crawl output.")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-list channels that already have a dump, stopping at known videos")
+    args = parser.parse_args()
+    metrics.start()   # exports only when METRICS_DIR is set
+
     print(f"📄 Reading {INPUT_CSV}")
     seen = set()
 
-    # Read second column (index 1), skip header
+    # Read second column (index 1), skip header; a cell may hold several ", "-joined links
     with open(INPUT_CSV, newline='', encoding='utf-8') as csvfile:
         reader = csv.reader(csvfile)
         next(reader, None)  # skip header row
-        urls = [row[1].strip() for row in reader if len(row) > 1 and row[1].startswith("http")]
+        urls = [u.strip() for row in reader if len(row) > 1
+                for u in row[1].split(",") if u.strip().startswith("http")]
+
+    # Handles, /c/, /user/ and video URLs all map to one canonical channel ID
+    cache = ChannelIdCache()
+    resolved = cache.resolve_many(sorted(set(urls)))
+    cache.close()
 
+    channels = []
     for idx, url in enumerate(sorted(set(urls))):
-        print(f"[{idx}] 🔍 Resolving: {url}")
-        channel_type, channel_ref = get_channel_info(url)
-        if not channel_ref:
-            print(f"[{idx}] ⚠ Skipped (invalid format): {url}")
+        channel_id = resolved.get(url)
+        if not channel_id:
+            print(f"[{idx}] ⚠ Skipped (unresolvable): {url}")
             continue
 
-        if channel_ref in seen:
-            print(f"[{idx}] ✅ Already processed: {channel_ref}")
+        if channel_id in seen:
+            print(f"[{idx}] ✅ Already processed: {channel_id} ({url})")
             continue
-        seen.add(channel_ref)
+        seen.add(channel_id)
 
-        outfile = os.path.join(OUTPUT_DIR, f"{channel_ref}.json")
-        if os.path.exists(outfile):
-            print(f"[{idx}] ✅ Already scraped file: {outfile}")
-            continue
+        _, legacy_ref = get_channel_info(url)
+        if legacy_ref:
+            adopt_legacy_dump(legacy_ref, channel_id)
+        print(f"[{idx}] 🔍 {url} → {channel_id}")
+        channels.append((idx, channel_id))
 
-        # First try the /streams tab
-        if channel_type == "handle":
-            target = f"https://www.youtube.com/@{channel_ref}/streams"
-        else:
-            target = f"https://www.youtube.com/channel/{channel_ref}/streams"
-
-        data = run_yt_dlp(target)
-
-        # Fallback to /videos if no qualifying streams
-        if not data:
-            print(f"[{idx}] ⚠ No qualifying livestreams, falling back to videos tab.")
-            if channel_type == "handle":
-                target = f"https://www.youtube.com/@{channel_ref}/videos"
-            else:
-                target = f"https://www.youtube.com/channel/{channel_ref}/videos"
-            data = run_yt_dlp(target)
-
-        if data:
-            with open(outfile, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-            print(f"[{idx}] 💾 Saved {len(data)} entries to {outfile}")
-        else:
-            print(f"[{idx}] ❌ No qualifying videos found.")
+    # Enumerate a bounded number of channels at a time
+    with ThreadPoolExecutor(max_workers=CHANNEL_WORKERS) as pool:
+        futures = {pool.submit(scrape_channel, *ch, args.refresh): ch for ch in channels}
+        for fut in as_completed(futures):
+            idx, channel_id = futures[fut]
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[{idx}] ❌ {channel_id} failed: {e}")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,30 @@
-import pandas as pd
+import csv
+import os
 
-def count_rows_in_csv(file_path):
-    df = pd.read_csv(file_path)  # Read the CSV file
-    return len(df)  # Return the number of rows
+try:
+    import transcriptstore
+except ImportError:  # pyarrow not installed: only the CSV can be counted
+    transcriptstore = None
+
+def count_rows_in_csv(file_path, skip=frozenset()):
+    # Stream the file instead of loading it into a DataFrame
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip the header row
+        return sum(1 for row in reader if row and row[0] not in skip)  # Return the number of rows
 
 # Example usage
+store_path = 'transcripts'  # Parquet transcript store written by transcripter.py
 csv_file_path = 'transcripts.csv'  # Replace with your CSV file path
-row_count = count_rows_in_csv(csv_file_path)
-print(f'The CSV file has {row_count} rows.')
+
+if transcriptstore is not None and os.path.isdir(store_path):
+    # Row counts come from the Parquet footers; no transcript data is read
+    row_count = transcriptstore.count_rows(store_path)
+    print(f'The transcript store has {row_count} rows.')
+    if os.path.exists(csv_file_path):
+        # transcripts fetched before the store existed are still only in the CSV
+        csv_only = count_rows_in_csv(csv_file_path, transcriptstore.video_ids(store_path))
+        print(f'The CSV file has {csv_only} more ({row_count + csv_only} in total).')
+else:
+    row_count = count_rows_in_csv(csv_file_path)
+    print(f'The CSV file has {row_count} rows.')
@@ -1,62 +1,225 @@
 import os
 import time
 import csv
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urldefrag
+from bs4 import BeautifulSoup, FeatureNotFound
 from selenium.webdriver.common.by import By
 from dotenv import load_dotenv
 
+import httpclient
+import metrics
+from driverpool import DriverPool, POOL_SIZE
+from ratelimit import AdaptiveRateLimiter, backoff_delay
+
 # Load environment variables from a .env file
 load_dotenv()
 
-# Set up the Edge WebDriver (provide the path to your msedgedriver executable)
+# Shared pool of headless Edge browsers (provide the path to your msedgedriver executable),
+# only started if the directory turns out to need JavaScript
 edge_driver_path = os.getenv('EDGE_DRIVER_PATH')  # Path to msedgedriver executable
-service = Service(executable_path=edge_driver_path)
-driver = webdriver.Edge(service=service)
+pool = None  # created by get_pool(); pipeline.py assigns its own shared pool
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # The Edge driver path is only needed once a page actually needs the browser
+    global pool
+    with _pool_lock:
+        if pool is None:
+            pool = DriverPool(POOL_SIZE, edge_driver_path)
+        return pool
+
 
 # Base URL and tag to navigate through pages
 base_url = os.getenv('BASE_URL')  # Base URL from .env file
 empty_tag_selector = os.getenv('EMPTY_TAG_SELECTOR', 'p.empty')  # Default to 'p.empty' if not set
 tag_selector = os.getenv('TAG_SELECTOR')
 
-# Start from the first page
-page_number = 1
+PAGE_WORKERS = int(os.getenv('PAGE_WORKERS', '8'))  # Directory pages fetched at once
+PAGE_RATE = float(os.getenv('PAGE_RATE', '4'))  # Politeness cap, requests per second
+MAX_ATTEMPTS = 4  # Tries per page on throttling or server errors
 
 # CSV file setup
 output_file = 'churches.csv'
-with open(output_file, mode='w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Church Name", "URL"])  # Write headers
 
-    while True:
-        # Construct the URL for the current page
-        url = f"{base_url}{page_number}"
-        driver.get(url)
+limiter = AdaptiveRateLimiter(PAGE_RATE, max_rate=PAGE_RATE, burst=PAGE_WORKERS)
+
+
+def _html_soup(markup):
+    try:
+        return BeautifulSoup(markup, "lxml")
+    except FeatureNotFound:
+        return BeautifulSoup(markup, "html.parser")
+
+
+def parse_page(markup, page_url):
+    # One parse per page: None for the "No results" page, else (name, url) rows
+    # ([] when the page has no listing in its HTML at all)
+    soup = _html_soup(markup)
+    if soup.select_one(empty_tag_selector):
+        return None
+    rows = []
+    for a in soup.select('a[href]'):
+        href = urljoin(page_url, a['href'])
+        if tag_selector in href:
+            rows.append((a.get_text(' ', strip=True), href))
+    return rows
+
+
+def fetch_page(page_number):
+    # Plain HTTP; the limiter spreads requests out and backs off on 429s
+    url = f"{base_url}{page_number}"
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.acquire()
+        try:
+            page = httpclient.fetch(url)
+        except Exception as e:
+            print(f"Error fetching page {page_number}: {e}")
+            if attempt < MAX_ATTEMPTS - 1:  # no point waiting before giving up
+                time.sleep(backoff_delay(attempt))
+            continue
+        if page.status == 429 or page.status >= 500:
+            limiter.on_throttle()
+            if attempt < MAX_ATTEMPTS - 1:
+                time.sleep(backoff_delay(attempt))
+            continue
+        limiter.on_success(page.elapsed)
+        if page.status == 404:
+            return None  # past the end on directories that 404 instead of showing the marker
+        return parse_page(page.content, page.final_url)
+    raise RuntimeError(f"Giving up on page {page_number} after {MAX_ATTEMPTS} attempts")
+
+
+def render_page(driver, page_number):
+    # Selenium fallback for directories that only render their listing with JavaScript
+    url = f"{base_url}{page_number}"
+    driver.get(url)
+
+    # Wait for the page to fully load
+    time.sleep(1)
+
+    # Check if the page displays the "No results" message
+    if driver.find_elements(By.CSS_SELECTOR, empty_tag_selector):
+        return None
+
+    # Pull every link's text and href in one round trip instead of one per <a>
+    links = driver.execute_script(
+        "return Array.from(document.querySelectorAll('a[href]'), a => [a.innerText, a.href]);"
+    )
+    return [(text.strip(), href) for text, href in links if href and tag_selector in href]
+
 
-        # Wait for the page to fully load
-        time.sleep(1)
+def find_last_page(probe, seen=None):
+    # Exponential search for an empty page, then binary search for the boundary.
+    # Probed pages are kept so the sweep does not fetch them twice.
+    seen = {} if seen is None else seen
 
-        # Check if the page displays the "No results" message
+    def empty(n):
+        if n not in seen:
+            seen[n] = probe(n)
+        return seen[n] is None
+
+    if empty(1):
+        return 0, seen
+    low, high = 1, 2
+    while not empty(high):
+        low, high = high, high * 2
+    # invariant: page `low` has results, page `high` is empty
+    while high - low > 1:
+        mid = (low + high) // 2
+        if empty(mid):
+            high = mid
+        else:
+            low = mid
+    return low, seen
+
+
+def sweep(pages, probe, known, workers, failed=None):
+    # Pages in order, fetched `workers` at a time; probes from the search are reused.
+    # A page that still fails after MAX_ATTEMPTS yields no rows and its number
+    # goes to `failed`, so one bad page cannot abort the run.
+    def get(n):
+        if n in known:
+            return known[n]
         try:
-            no_results_element = driver.find_element(By.CSS_SELECTOR, empty_tag_selector)
-            print("No more results found. Stopping navigation.")
-            break  # Exit the loop if no results are found
-        except:
-            # If the element is not found, continue scraping
-            pass
-
-        # Find all <a> tags on the page
-        all_links = driver.find_elements(By.TAG_NAME, 'a')
-
-        # Extract relevant links and church names
-        for link in all_links:
-            href = link.get_attribute('href')
-            if href and tag_selector in href:
-                church_name = link.text.strip()
-                writer.writerow([church_name, href])  # Write church name and URL to CSV
-
-        # Increment the page number to navigate to the next page
-        page_number += 1
-
-# Close the WebDriver
-driver.quit()
+            return probe(n)
+        except Exception as e:
+            print(f"Skipping page {n}: {e}")
+            if failed is not None:
+                failed.append(n)
+            return []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(get, pages)
+
+
+def main():
+    metrics.start()   # exports only when METRICS_DIR is set
+
+    # Static HTML is tried first; a first page with neither results nor the
+    # empty marker means the listing is drawn by JavaScript
+    first = fetch_page(1)
+    if first is None:
+        print("Directory is empty (no results on page 1); nothing to write.")
+        probe, workers, known = fetch_page, PAGE_WORKERS, {1: None}
+    elif first:
+        probe, workers, known = fetch_page, PAGE_WORKERS, {1: first}
+    else:
+        print("Directory does not list churches in plain HTML, using the browser pool.")
+
+        def probe(n):
+            with get_pool().lease() as driver, metrics.timer("browser_render_seconds", host=metrics.host_of(base_url)):
+                return render_page(driver, n)
+        workers, known = get_pool().size, {}
+
+    started = time.monotonic()
+    last_page, known = find_last_page(probe, known)
+    print(f"Directory has {last_page} pages (found with {len(known)} probes in {time.monotonic() - started:.1f}s)")
+
+    seen = set()
+    written = duplicates = 0
+    failed = []
+    with open(output_file, mode='w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Church Name", "URL"])  # Write headers
+
+        def write(rows):
+            nonlocal written, duplicates
+            for name, url in rows or []:
+                url = urldefrag(url)[0]
+                if url in seen:
+                    duplicates += 1
+                    continue
+                seen.add(url)
+                writer.writerow([name, url])  # Write church names and URLs to CSV
+                written += 1
+
+        try:
+            for page_number, rows in enumerate(sweep(range(1, last_page + 1), probe, known, workers, failed), 1):
+                write(rows)
+                if page_number % 50 == 0:
+                    csvfile.flush()
+                    print(f"Page {page_number}/{last_page}: {written} churches")
+
+            # One more pass over the pages that failed, once the rest is written
+            if failed:
+                print(f"Retrying {len(failed)} failed pages")
+                retry, failed = sorted(failed), []
+                for rows in sweep(retry, probe, {}, workers, failed):
+                    write(rows)
+                if failed:
+                    print(f"Gave up on {len(failed)} pages, their churches are missing: {sorted(failed)}")
+        finally:
+            # Close the browsers
+            if pool is not None:
+                pool.close()
+            httpclient.close()
+
+    print(f"Wrote {written} churches to {output_file} ({duplicates} duplicates skipped) "
+          f"in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,233 @@
 import os
 import time
 import csv
-from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.common.by import By
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from lxml import etree, html as lxml_html
 from dotenv import load_dotenv
 
+import httpclient
+import metrics
+from driverpool import DriverPool, POOL_SIZE
+
 # Load environment variables from a .env file
 load_dotenv()
 
-# Set up the Edge WebDriver (provide the path to your msedgedriver executable)
+# Shared pool of headless Edge browsers (provide the path to your msedgedriver executable),
+# only started for detail pages that do not carry their details in the HTML
 edge_driver_path = os.getenv('EDGE_DRIVER_PATH')  # Path to msedgedriver executable
-service = Service(executable_path=edge_driver_path)
-driver = webdriver.Edge(service=service)
+pool = None  # created by get_pool(); pipeline.py assigns its own shared pool
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # The Edge driver path is only needed once a page actually needs the browser
+    global pool
+    with _pool_lock:
+        if pool is None:
+            pool = DriverPool(POOL_SIZE, edge_driver_path)
+        return pool
+
 
 # Input CSV containing the URLs to scrape
 input_file = 'churches.csv'  # CSV with URLs scraped earlier
 output_file = 'detailed_churches.csv'  # CSV for detailed information
+state_file = 'details_state.sqlite'  # Content hash and row per detail page, for reruns
+
+# Detail pages fetched at once. They all come from one host, so no more than
+# httpclient keeps sockets for it: extra workers would open and drop a new
+# connection per request (raise HTTP_POOL_PER_HOST to go higher)
+DETAIL_WORKERS = int(os.getenv('DETAIL_WORKERS', str(httpclient.POOL_PER_HOST)))
+FLUSH_EVERY = 100  # Rows between CSV flushes / state commits
+
+# All four fields come from one parsed document; compiled once, reused by every worker
+LABELS = etree.XPath('//div[text()="Website" or text()="Denomination" or text()="Language" or text()="Size"]')
+WEBSITE = etree.XPath('//div[text()="Website"]/following-sibling::div/a/@href')
+DENOMINATION = etree.XPath('//div[text()="Denomination"]/following-sibling::div')
+LANGUAGE = etree.XPath('//div[text()="Language"]/following-sibling::div//li')
+SIZE = etree.XPath('//div[text()="Size"]/following-sibling::div')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    url        TEXT PRIMARY KEY,
+    hash       TEXT NOT NULL,    -- blake2b of the detail page body
+    row        TEXT NOT NULL,    -- JSON list, as written to the CSV
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _text(element):
+    # itertext keeps "A<br>B" apart, like the old innerHTML .replace('<br>', ' ')
+    return " ".join(" ".join(element.itertext()).split())
+
+
+def extract_details(markup, page_url):
+    # → [website, denomination, language, size], or None when the page has none
+    # of the labels (details drawn by JavaScript: needs the browser)
+    doc = lxml_html.fromstring(markup)
+    if not LABELS(doc):
+        return None
+    website = WEBSITE(doc)
+    denomination = DENOMINATION(doc)
+    languages = LANGUAGE(doc)
+    size = SIZE(doc)
+    return [
+        urljoin(page_url, website[0].strip()) if website else "N/A",
+        _text(denomination[0]) if denomination else "N/A",
+        ", ".join(_text(li) for li in languages) if languages else "N/A",
+        _text(size[0]) if size else "N/A",
+    ]
+
+
+def render_details(driver, url):
+    # Selenium fallback: one execute_script reads all four fields
+    driver.get(url)
+
+    # Wait for the page to load
+    time.sleep(1)
+
+    return driver.execute_script("""
+        const field = label => document.evaluate(
+            `//div[text()="${label}"]/following-sibling::div`, document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        const website = field("Website"), denomination = field("Denomination"),
+              language = field("Language"), size = field("Size");
+        const link = website && website.querySelector("a");
+        return [
+            link ? link.href : "N/A",
+            denomination ? denomination.innerHTML.replace(/<br\\s*\\/?>/g, " ").trim() : "N/A",
+            language ? Array.from(language.querySelectorAll("li"), li => li.innerText).join(", ") : "N/A",
+            size ? size.innerText.trim() : "N/A",
+        ];
+    """)
+
+
+class DetailState:
+    # Last seen body hash and extracted row per detail URL; safe to share
+    # between threads (pipeline.py records from its workers)
+    def __init__(self, path=state_file):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.known = {url: (h, json.loads(row)) for url, h, row in
+                      self.conn.execute("SELECT url, hash, row FROM details")}
+
+    def record(self, url, digest, row):
+        with self.lock:
+            self.known[url] = (digest, row)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO details (url, hash, row, updated_at) VALUES (?, ?, ?, ?)",
+                (url, digest, json.dumps(row), time.time()),
+            )
 
-# Open the output CSV and prepare to write
-with open(output_file, mode='w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Church Name", "URL", "Website", "Denomination", "Language", "Size"])  # Headers for detailed data
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
 
-    # Read URLs from the input CSV
-    with open(input_file, mode='r', newline='', encoding='utf-8') as infile:
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def scrape_details(row, state):
+    # → (csv row, outcome, digest); outcome is "unchanged", "http", "browser" or "error"
+    church_name, url = row[0], row[1]
+
+    try:
+        # httpclient sends If-None-Match/If-Modified-Since from the on-disk cache;
+        # on a 304 the body below is the cached copy and nothing is downloaded.
+        # A server without validators (or HTTP_CACHE=0) still sends the whole
+        # page, and the digest then only saves the parse.
+        page = httpclient.fetch(url)
+        if page.ok:
+            digest = hashlib.blake2b(page.content, digest_size=16).hexdigest()
+            previous = state.known.get(url)
+            if previous and previous[0] == digest:
+                return [church_name, url] + previous[1], "unchanged", None
+
+            details = extract_details(page.content, page.final_url)
+            if details is not None:
+                print(f"Scraped details for: {church_name}")
+                return [church_name, url] + details, "http", digest
+
+        # Not in the static HTML (or the request failed): render it
+        with get_pool().lease() as driver, metrics.timer("browser_render_seconds", host=metrics.host_of(url)):
+            details = render_details(driver, url)
+        print(f"Scraped details for: {church_name} (browser)")
+        return [church_name, url] + details, "browser", None
+
+    except Exception as e:
+        print(f"Error processing {url}: {e}")
+        return [church_name, url, "Error", "Error", "Error", "Error"], "error", None
+
+
+def read_rows(path):
+    # Read URLs from the input CSV, lazily
+    with open(path, mode='r', newline='', encoding='utf-8') as infile:
         reader = csv.reader(infile)
         next(reader)  # Skip the header row
-
         for row in reader:
-            church_name, url = row[0], row[1]
-
-            try:
-                # Navigate to the URL
-                driver.get(url)
-
-                # Wait for the page to load
-                time.sleep(1)
-
-                # Scrape the website
-                try:
-                    website_element = driver.find_element(By.XPATH, '//div[text()="Website"]/following-sibling::div/a')
-                    website = website_element.get_attribute('href')
-                except:
-                    website = "N/A"
-
-                # Scrape the denomination
-                try:
-                    denomination_element = driver.find_element(By.XPATH, '//div[text()="Denomination"]/following-sibling::div')
-                    denomination = denomination_element.get_attribute('innerHTML').replace('<br>', ' ').strip()
-                except:
-                    denomination = "N/A"
-
-                # Scrape the language
-                try:
-                    language_elements = driver.find_elements(By.XPATH, '//div[text()="Language"]/following-sibling::div//li')
-                    language = ", ".join([element.text for element in language_elements])
-                except:
-                    language = "N/A"
-
-                # Scrape the size
-                try:
-                    size_element = driver.find_element(By.XPATH, '//div[text()="Size"]/following-sibling::div')
-                    size = size_element.text.strip()
-                except:
-                    size = "N/A"
-
-                # Write the details to the output CSV
-                writer.writerow([church_name, url, website, denomination, language, size])
-                print(f"Scraped details for: {church_name}")
+            if len(row) > 1:
+                yield row
+
+
+def ordered_map(executor, fn, items, window):
+    # Like executor.map, but only `window` items are read ahead of the writer
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def main():
+    metrics.start()   # exports only when METRICS_DIR is set
+    state = DetailState()
+    counts = {"unchanged": 0, "http": 0, "browser": 0, "error": 0}
+    started = time.monotonic()
+
+    # Open the output CSV and prepare to write
+    with open(output_file, mode='w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Church Name", "URL", "Website", "Denomination", "Language", "Size"])  # Headers for detailed data
+
+        try:
+            # Detail pages are fetched in parallel; rows come back in input order
+            with ThreadPoolExecutor(max_workers=DETAIL_WORKERS) as executor:
+                results = ordered_map(executor, lambda row: scrape_details(row, state),
+                                      read_rows(input_file), DETAIL_WORKERS * 4)
+                for n, (details, outcome, digest) in enumerate(results, 1):
+                    # Write the details to the output CSV
+                    writer.writerow(details)
+                    counts[outcome] += 1
+                    if digest:
+                        state.record(details[1], digest, details[2:])
+                    if n % FLUSH_EVERY == 0:
+                        csvfile.flush()
+                        state.commit()
+        finally:
+            # Close the browsers
+            if pool is not None:
+                pool.close()
+            httpclient.close()
+            state.close()
+
+    elapsed = time.monotonic() - started
+    total = sum(counts.values())
+    print(f"Wrote {total} churches to {output_file} in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.1f}/s): {counts['http']} parsed, "
+          f"{counts['unchanged']} unchanged, {counts['browser']} rendered, {counts['error']} errors")
 
-            except Exception as e:
-                print(f"Error processing {url}: {e}")
-                writer.writerow([church_name, url, "Error", "Error", "Error", "Error"])
 
-# Close the WebDriver
-driver.quit()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import argparse
+import email.utils
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from typing import BinaryIO
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+CACHE_DIR      = os.getenv("HTTP_CACHE_DIR", os.path.join(".cache", "http"))
+MAX_BYTES      = int(os.getenv("HTTP_CACHE_MAX_MB", "2048")) * 2**20   # compressed bodies on disk
+HEURISTIC_CAP  = 24 * 3600     # longest freshness guessed from Last-Modified alone
+KEPT_HEADERS   = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Expires")
+# ──────────────────────────────────────────────────────────── #
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url           TEXT PRIMARY KEY,
+    body          TEXT NOT NULL,        -- file name under bodies/
+    status        INTEGER NOT NULL,
+    final_url     TEXT NOT NULL,
+    headers       TEXT NOT NULL,        -- JSON, KEPT_HEADERS only
+    etag          TEXT,
+    last_modified TEXT,
+    expires       REAL NOT NULL,        -- fresh until (epoch seconds)
+    size          INTEGER NOT NULL,     -- compressed bytes on disk
+    raw_size      INTEGER NOT NULL,
+    last_used     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+CREATE TABLE IF NOT EXISTS stats (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+_MAX_AGE = re.compile(r"(?:s-maxage|max-age)\s*=\s*(\d+)")
+
+
+def _kept(headers) -> dict[str, str]:
+    # HTTP/2 servers send lowercase names; store them under one spelling
+    canon = {h.lower(): h for h in KEPT_HEADERS}
+    return {canon[k.lower()]: v for k, v in headers.items() if k.lower() in canon}
+
+
+class Entry:
+    __slots__ = ("url", "body", "status", "final_url", "headers", "etag",
+                 "last_modified", "expires", "size", "raw_size")
+
+    def __init__(self, row: sqlite3.Row):
+        for k in self.__slots__:
+            setattr(self, k, row[k])
+        self.headers = json.loads(self.headers)
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def validators(self) -> dict[str, str]:
+        h = {}
+        if self.etag:
+            h["If-None-Match"] = self.etag
+        if self.last_modified:
+            h["If-Modified-Since"] = self.last_modified
+        return h
+
+
+def _freshness(headers: dict[str, str], now: float) -> float | None:
+    # → seconds the response may be reused without asking, None = do not store
+    cc = headers.get("Cache-Control", "").lower()
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return 0.0
+    m = _MAX_AGE.search(cc)
+    if m:
+        return float(m.group(1))
+    if headers.get("Expires"):
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(headers["Expires"]).timestamp() - now)
+        except (TypeError, ValueError):
+            return 0.0
+    if headers.get("Last-Modified"):
+        try:
+            age = now - email.utils.parsedate_to_datetime(headers["Last-Modified"]).timestamp()
+            return min(max(0.0, age * 0.1), HEURISTIC_CAP)
+        except (TypeError, ValueError):
+            pass
+    return 0.0
+
+
+class HttpCache:
+    def __init__(self, directory: str = CACHE_DIR, *, max_bytes: int = MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite"),
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _body_path(self, name: str) -> str:
+        return os.path.join(self.directory, "bodies", name)
+
+    def _bump(self, name: str, by: int = 1) -> None:
+        self.conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, by),
+        )
+
+    # ───── lookups ─────
+    def lookup(self, url: str) -> Entry | None:
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None or not os.path.exists(self._body_path(row["body"])):
+            return None
+        return Entry(row)
+
+    def open(self, entry: Entry) -> BinaryIO:
+        return gzip.open(self._body_path(entry.body), "rb")
+
+    def read(self, entry: Entry) -> bytes:
+        with self.open(entry) as f:
+            return f.read()
+
+    def hit(self, entry: Entry) -> None:
+        with self._lock:
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE url = ?",
+                              (time.time(), entry.url))
+            self._bump("hits")
+            self._bump("bytes_saved", entry.raw_size)
+            self.conn.commit()
+
+    def revalidated(self, entry: Entry, headers: dict[str, str]) -> None:
+        now = time.time()
+        merged = {**entry.headers, **_kept(headers)}
+        ttl = _freshness(merged, now) or 0.0
+        with self._lock:
+            self.conn.execute(
+                "UPDATE entries SET expires = ?, last_used = ?, headers = ? WHERE url = ?",
+                (now + ttl, now, json.dumps(merged), entry.url),
+            )
+            self._bump("revalidated")
+            self._bump("bytes_saved", entry.raw_size)
+            self.conn.commit()
+        entry.headers, entry.expires = merged, now + ttl
+
+    def miss(self) -> None:
+        with self._lock:
+            self._bump("misses")
+            self.conn.commit()
+
+    # ───── storing ─────
+    def cacheable(self, status: int, headers: dict[str, str]) -> bool:
+        headers = _kept(headers)
+        if status != 200 or _freshness(headers, time.time()) is None:
+            return False
+        # nothing to revalidate with and no lifetime → storing only costs disk
+        return bool(headers.get("ETag") or headers.get("Last-Modified")
+                    or _freshness(headers, time.time()))
+
+    def store(self, url: str, final_url: str, status: int,
+              headers: dict[str, str], chunks) -> Entry | None:
+        name = hashlib.sha1(url.encode()).hexdigest() + ".gz"
+        path = self._body_path(name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        raw_size = 0
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            for chunk in chunks:
+                raw_size += len(chunk)
+                f.write(chunk)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+
+        now = time.time()
+        kept = _kept(headers)
+        ttl = _freshness(kept, now) or 0.0
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+            self._total += size - (old[0] if old else 0)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, name, status, final_url, json.dumps(kept), kept.get("ETag"),
+                 kept.get("Last-Modified"), now + ttl, size, raw_size, now),
+            )
+            self._bump("stored")
+            self._evict(keep=url)
+            self.conn.commit()
+        return self.lookup(url)
+
+    def _evict(self, keep: str | None = None) -> None:
+        # caller holds the lock; trim to 90% so we are not evicting on every store
+        if self._total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT url, body, size FROM entries ORDER BY last_used")
+        doomed = []
+        for url, body, size in rows:
+            if self._total <= target:
+                break
+            if url == keep:
+                continue
+            doomed.append((url, body))
+            self._total -= size
+        for url, body in doomed:
+            self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            try:
+                os.remove(self._body_path(body))
+            except OSError:
+                pass
+        self._bump("evicted", len(doomed))
+
+    # ───── reporting ─────
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            out = dict(self.conn.execute("SELECT name, value FROM stats").fetchall())
+            n, size, raw = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM entries"
+            ).fetchone()
+        out.update(entries=n, disk_bytes=size, raw_bytes=raw)
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("DELETE FROM stats")
+            self.conn.commit()
+            self._total = 0
+        shutil.rmtree(os.path.join(self.directory, "bodies"), ignore_errors=True)
+        os.makedirs(os.path.join(self.directory, "bodies"), exist_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+# ───── CLI ─────
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Inspect the crawler's on-disk HTTP cache.")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--dir", default=CACHE_DIR, help="cache directory")
+    args = parser.parse_args(argv)
+
+    cache = HttpCache(args.dir)
+    if args.command == "clear":
+        cache.clear()
+        print(f"Cleared {args.dir}")
+    else:
+        s = cache.stats()
+        lookups = s.get("hits", 0) + s.get("revalidated", 0) + s.get("misses", 0)
+        print(f"entries      {s['entries']}")
+        print(f"disk         {s['disk_bytes'] / 2**20:.1f} MiB ({s['raw_bytes'] / 2**20:.1f} MiB uncompressed)")
+        print(f"hits         {s.get('hits', 0)}")
+        print(f"revalidated  {s.get('revalidated', 0)}")
+        print(f"misses       {s.get('misses', 0)}")
+        print(f"evicted      {s.get('evicted', 0)}")
+        print(f"bytes saved  {s.get('bytes_saved', 0) / 2**20:.1f} MiB")
+        if lookups:
+            served = s.get("hits", 0) + s.get("revalidated", 0)
+            print(f"served from cache  {served / lookups:.1%}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+import metrics
+from httpcache import Entry, HttpCache
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+USER_AGENT     = os.getenv("CRAWLER_USER_AGENT", "ChurchTopicsBot/1.0")
+TIMEOUT        = float(os.getenv("HTTP_TIMEOUT", "10"))
+RETRIES        = int(os.getenv("HTTP_RETRIES", "2"))
+BACKOFF        = 0.5                 # seconds, doubled per retry
+POOL_HOSTS     = 200                 # host pools kept alive at once
+POOL_PER_HOST  = int(os.getenv("HTTP_POOL_PER_HOST", "10"))   # keep-alive sockets per host
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CACHE_ENABLED  = os.getenv("HTTP_CACHE", "1") != "0"   # conditional on-disk cache for GETs
+# ──────────────────────────────────────────────────────────── #
+
+
+@dataclass
+class Fetched:
+    url: str                    # URL that was asked for
+    final_url: str              # URL after redirects
+    status: int
+    content_type: str
+    size: int                   # bytes of body received
+    elapsed: float              # seconds until headers arrived
+    headers: dict[str, str] = field(default_factory=dict)
+    content: bytes = b""
+    encoding: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+# ───── shared session ─────
+_session: requests.Session | None = None
+_cache: HttpCache | None = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_PER_HOST,
+        max_retries=retry,
+        pool_block=False,
+    )
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers.update({"User-Agent": USER_AGENT, "Connection": "keep-alive"})
+    return s
+
+
+def get_session() -> requests.Session:
+    # One session for the whole process: urllib3 keeps a keep-alive pool per
+    # host, so repeat requests to a site skip the TCP+TLS handshake.
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_cache() -> HttpCache | None:
+    global _cache
+    if _cache is None and CACHE_ENABLED:
+        with _session_lock:
+            if _cache is None:
+                _cache = HttpCache()
+    return _cache
+
+
+def close() -> None:
+    global _session, _cache
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+
+
+# ───── fetch helpers ─────
+def _to_fetched(url: str, resp: requests.Response, content: bytes) -> Fetched:
+    return Fetched(
+        url=url,
+        final_url=resp.url,
+        status=resp.status_code,
+        content_type=resp.headers.get("Content-Type", "").split(";")[0].strip().lower(),
+        size=len(content),
+        elapsed=resp.elapsed.total_seconds(),
+        headers=dict(resp.headers),
+        content=content,
+        encoding=resp.encoding,
+    )
+
+
+def _from_cache(url: str, entry: Entry, cache: HttpCache, *, body: bool) -> Fetched:
+    content = cache.read(entry) if body else b""
+    return Fetched(
+        url=url,
+        final_url=entry.final_url,
+        status=entry.status,
+        content_type=entry.headers.get("Content-Type", "").split(";")[0].strip().lower(),
+        size=entry.raw_size,
+        elapsed=0.0,
+        headers=dict(entry.headers),
+        content=content,
+        encoding=requests.utils.get_encoding_from_headers(CaseInsensitiveDict(entry.headers)),
+    )
+
+
+def fetch(
+    url: str,
+    *,
+    method: str = "GET",
+    timeout: float | None = None,
+    headers: dict[str, str] | None = None,
+    allow_redirects: bool = True,
+    cache: bool = True,
+) -> Fetched:
+    c = get_cache() if cache and allow_redirects else None
+    entry = c.lookup(url) if c else None
+    host = metrics.host_of(url)
+    if entry is not None and entry.fresh:
+        c.hit(entry)
+        metrics.inc("http_cache", result="hit")
+        return _from_cache(url, entry, c, body=method != "HEAD")
+
+    if method == "GET" and entry is not None:
+        headers = {**(headers or {}), **entry.validators()}
+    with metrics.timer("http_request_seconds", host=host, method=method):
+        resp = get_session().request(
+            method,
+            url,
+            timeout=timeout or TIMEOUT,
+            headers=headers,
+            allow_redirects=allow_redirects,
+        )
+        # reading the body (even an empty one) hands the socket back to the pool
+        content = resp.content if method != "HEAD" and resp.status_code != 304 else b""
+    metrics.inc("http_responses", host=host, status=f"{resp.status_code // 100}xx")
+    metrics.inc("http_bytes", len(content), host=host)
+    if resp.status_code == 304 and entry is not None:
+        resp.close()
+        c.revalidated(entry, resp.headers)
+        metrics.inc("http_cache", result="revalidated")
+        return _from_cache(url, entry, c, body=True)
+
+    if c is not None and method == "GET":
+        c.miss()
+        metrics.inc("http_cache", result="miss")
+        if c.cacheable(resp.status_code, resp.headers):
+            c.store(url, resp.url, resp.status_code, resp.headers, [content])
+    return _to_fetched(url, resp, content)
+
+
+@contextmanager
+def stream(
+    url: str,
+    *,
+    timeout: float | None = None,
+    headers: dict[str, str] | None = None,
+) -> Iterator[requests.Response]:
+    resp = get_session().get(
+        url, timeout=timeout or TIMEOUT, headers=headers, stream=True
+    )
+    try:
+        yield resp
+    finally:
+        resp.close()
+
+
+class _ChunkReader(io.RawIOBase):
+    # File object over resp.iter_content(): decoded like .content, and unlike
+    # resp.raw it is not closed by urllib3 at EOF, so a reader that asks again
+    # after the last byte gets b"" instead of "read of closed file"
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf:
+            self._buf = next(self._chunks, None)
+            if self._buf is None:
+                self._buf = b""
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+@contextmanager
+def open_body(
+    url: str,
+    *,
+    timeout: float | None = None,
+    cache: bool = True,
+) -> Iterator[tuple[int, BinaryIO]]:
+    # Like stream(), but goes through the on-disk cache: a fresh or revalidated
+    # body is read back from disk, a new cacheable one is spooled there first.
+    c = get_cache() if cache else None
+    entry = c.lookup(url) if c else None
+    if entry is not None and entry.fresh:
+        c.hit(entry)
+        with c.open(entry) as f:
+            yield entry.status, f
+        return
+
+    with stream(url, timeout=timeout,
+                headers=entry.validators() if entry is not None else None) as r:
+        if r.status_code == 304 and entry is not None:
+            c.revalidated(entry, r.headers)
+        elif c is not None and c.cacheable(r.status_code, r.headers):
+            c.miss()
+            entry = c.store(url, r.url, r.status_code, r.headers, r.iter_content(64 * 1024))
+        else:
+            if c is not None:
+                c.miss()
+            with io.BufferedReader(_ChunkReader(r.iter_content(64 * 1024))) as body:
+                yield r.status_code, body
+            return
+
+    with c.open(entry) as f:
+        yield entry.status, f
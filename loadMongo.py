@@ -0,0 +1,357 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from itertools import chain, islice
+from urllib.parse import urlparse
+
+from pymongo import ASCENDING, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError, OperationFailure
+
+import metrics
+from churchfields import derived_fields
+from queryMongo import get_client
+from serveMongo import notify_ingest
+
+try:
+    import transcriptstore
+except ImportError:  # pyarrow not installed: transcripts come from the CSV
+    transcriptstore = None
+
+# Loads every scraper artifact into the Sermons database. Each record is an
+# upsert on a natural key (church directory URL, channel ID, video ID), so a
+# rerun rewrites the same documents instead of adding new ones.
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+DB_NAME         = "Sermons"
+CHURCHES_CSV    = "detailed_churches.csv"     # getWebsites.py
+LINKS_CSV       = "youtube_links_output.csv"  # webcrawler.py
+DUMPS_DIR       = "dumps"                     # everylive.py
+TRANSCRIPTS_CSV = "transcripts.csv"           # transcripter.py --format csv
+TRANSCRIPT_DIR  = "transcripts"               # transcripter.py --format parquet
+BATCH_SIZE      = 1000     # operations per bulk_write
+WRITERS         = 4        # bulk_writes in flight at once
+# ──────────────────────────────────────────────────────────── #
+
+# Secondary indexes the upserts and cross-collection links look up by
+INDEXES = {
+    "Churches": [([("URL", ASCENDING)], "url_unique", True),
+                 ([("website_host", ASCENDING)], "website_host", False)],
+    "Videos": [([("channel_id", ASCENDING), ("published", ASCENDING)], "channel_published", False)],
+    "Transcripts": [([("channel_id", ASCENDING)], "channel", False)],
+}
+
+CHURCH_COLUMNS = ["Church Name", "URL", "Website", "Denomination", "Language", "Size"]
+
+
+def website_host(url):
+    # "https://www.Grace.org/about" -> "grace.org"; joins crawl pages to churches
+    host = (urlparse(url.strip()).hostname or "").lower() if url else ""
+    return host[4:] if host.startswith("www.") else host or None
+
+
+def _timestamp(ts):
+    return datetime.fromtimestamp(ts, timezone.utc) if ts else None
+
+
+class BulkWriter:
+    # Buffers operations and sends them as unordered bulk_writes, with up to
+    # `writers` batches in flight so the next batch is built while the server works
+    def __init__(self, collection, batch_size=BATCH_SIZE, writers=WRITERS):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.writers = writers
+        self.pool = ThreadPoolExecutor(max_workers=writers)
+        self.pending = set()
+        self.ops = []
+        self.totals = Counter()
+
+    def add(self, op):
+        self.ops.append(op)
+        if len(self.ops) >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        if not self.ops:
+            return
+        batch, self.ops = self.ops, []
+        if len(self.pending) >= self.writers:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                self._tally(fut.result())
+        self.pending.add(self.pool.submit(self._write, batch))
+
+    def _write(self, batch):
+        try:
+            with metrics.timer("mongo_bulk_write_seconds", collection=self.collection.name):
+                result = self.collection.bulk_write(batch, ordered=False)
+            metrics.inc("mongo_write_ops", len(batch), collection=self.collection.name)
+            return len(batch), result.bulk_api_result, 0
+        except BulkWriteError as e:
+            # unordered: everything but the failed operations was applied
+            errors = e.details.get("writeErrors", [])
+            for err in errors[:3]:
+                print(f"[load] {self.collection.name}: {err.get('errmsg')}")
+            return len(batch), e.details, len(errors)
+
+    def _tally(self, outcome):
+        count, result, errors = outcome
+        self.totals["ops"] += count
+        self.totals["errors"] += errors
+        self.totals["upserted"] += result.get("nUpserted", 0)
+        self.totals["modified"] += result.get("nModified", 0)
+        self.totals["matched"] += result.get("nMatched", 0)
+
+    def close(self):
+        self._submit()
+        for fut in self.pending:
+            self._tally(fut.result())
+        self.pending = set()
+        self.pool.shutdown()
+        return self.totals
+
+
+# ───── sources: each yields write operations and counts what it skipped ─────
+def church_ops(path, skipped):
+    seen = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            url = (row.get("URL") or "").strip()
+            name = (row.get("Church Name") or "").strip()
+            if not url.startswith("http") or not name:
+                skipped["invalid"] += 1
+                continue
+            if url in seen:
+                skipped["duplicate"] += 1
+                continue
+            seen.add(url)
+
+            doc = {"ChurchName": name, "URL": url}
+            details = {col: (row.get(col) or "").strip() for col in CHURCH_COLUMNS[2:]}
+            if all(v == "Error" for v in details.values()):
+                # the detail page failed to load: keep whatever an earlier run stored
+                skipped["detail_errors"] += 1
+                update = {"$set": doc}
+            else:
+                doc.update(details)
+                doc["website_host"] = website_host(details["Website"]) if details["Website"] != "N/A" else None
+                update = derived_fields(doc)
+                update["$set"] = dict(doc, **update["$set"])
+            yield UpdateOne({"URL": url}, update, upsert=True)
+
+
+def _read_links(path):
+    # page -> links, as exported by CrawlState (links are ", "-joined)
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) > 1:
+                yield row[0].strip(), [u.strip() for u in row[1].split(",") if u.strip().startswith("http")]
+
+
+def link_ops(path, skipped, batch_size=BATCH_SIZE):
+    # Channels keyed by channel ID; the church that linked to it gets the ID too.
+    # Only cached resolutions are used, so loading never waits on YouTube.
+    # Pages are read and resolved a batch at a time, never the whole file.
+    from channelids import ChannelIdCache
+
+    cache = ChannelIdCache()
+    try:
+        rows = _read_links(path)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            resolved = cache.resolve_many(sorted({u for _, links in batch for u in links}), probe=False)
+            yield from _link_batch_ops(batch, resolved, skipped)
+    finally:
+        cache.close()
+
+
+def _link_batch_ops(batch, resolved, skipped):
+    for page, links in batch:
+        ids = sorted({resolved[u] for u in links if resolved.get(u)})
+        if not ids:
+            skipped["unresolved"] += 1
+            continue
+        host = website_host(page)
+        for channel_id in ids:
+            found = {"pages": page, "links": {"$each": [u for u in links if resolved.get(u) == channel_id]}}
+            if host:
+                found["website_hosts"] = host
+            yield UpdateOne(
+                {"_id": channel_id},
+                {"$set": {"url": f"https://www.youtube.com/channel/{channel_id}"}, "$addToSet": found},
+                upsert=True,
+            )
+        if host:
+            yield UpdateMany({"website_host": host}, {"$addToSet": {"channel_ids": {"$each": ids}}})
+
+
+def video_ops(dumps_dir, skipped):
+    for path in glob.glob(os.path.join(dumps_dir, "*.json")):
+        channel_id = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            skipped["unreadable_dump"] += 1
+            continue
+        for e in entries:
+            if not e.get("id"):
+                skipped["invalid"] += 1
+                continue
+            yield UpdateOne(
+                {"_id": e["id"]},
+                {"$set": {"channel_id": channel_id,
+                          "title": e.get("title"),
+                          "duration": e.get("duration"),
+                          "url": e.get("url"),
+                          "published": _timestamp(e.get("timestamp"))}},
+                upsert=True,
+            )
+
+
+def _csv_transcripts(csv_path, skip):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if len(row) > 1 and row[0] not in skip:
+                yield {"video_id": row[0], "text": row[1], "channel": None}
+
+
+def transcript_ops(skipped, store_dir=TRANSCRIPT_DIR, csv_path=TRANSCRIPTS_CSV):
+    # The Parquet store plus the transcripts.csv rows it lacks: videos fetched
+    # before the store existed are only in the CSV
+    sources, in_store = [], set()
+    if transcriptstore is not None and os.path.isdir(store_dir):
+        in_store = transcriptstore.video_ids(store_dir)
+        sources.append(row
+                       for batch in transcriptstore.iter_batches(store_dir, columns=["video_id", "text", "channel"])
+                       for row in batch.to_pylist())
+    if os.path.exists(csv_path):
+        sources.append(_csv_transcripts(csv_path, in_store))
+
+    for row in chain.from_iterable(sources):
+        text = row["text"] or ""
+        # transcripts.csv written before the status file existed holds errors inline
+        if not row["video_id"] or not text or text.startswith("Error: "):
+            skipped["invalid"] += 1
+            continue
+        update = {"text": text}
+        if row["channel"] and row["channel"] != "unknown":
+            update["channel_id"] = row["channel"]
+        yield UpdateOne({"_id": row["video_id"]}, {"$set": update}, upsert=True)
+
+
+def sources():
+    # name -> (collection, op factory, input exists)
+    return {
+        "churches": ("Churches", lambda s: church_ops(CHURCHES_CSV, s), os.path.exists(CHURCHES_CSV)),
+        "links": ("Channels", lambda s: link_ops(LINKS_CSV, s), os.path.exists(LINKS_CSV)),
+        "videos": ("Videos", lambda s: video_ops(DUMPS_DIR, s), os.path.isdir(DUMPS_DIR)),
+        "transcripts": ("Transcripts", lambda s: transcript_ops(s),
+                        os.path.isdir(TRANSCRIPT_DIR) or os.path.exists(TRANSCRIPTS_CSV)),
+    }
+
+
+def _duplicates(collection, field, limit=5):
+    # values of `field` held by more than one document (first `limit`)
+    pipeline = [
+        {"$match": {field: {"$type": "string"}}},
+        {"$group": {"_id": f"${field}", "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return [d["_id"] for d in collection.aggregate(pipeline, allowDiskUse=True)]
+
+
+def ensure_indexes(db):
+    for name, indexes in INDEXES.items():
+        for keys, index_name, unique in indexes:
+            collection = db[name]
+            if not unique:
+                collection.create_index(keys, name=index_name)
+                continue
+            if index_name in collection.index_information():
+                continue
+            # A collection loaded by hand may repeat or lack the key: documents
+            # without it are left out of the index (partial), and repeats are
+            # reported instead of failing the whole load
+            field = keys[0][0]
+            dupes = _duplicates(collection, field)
+            if dupes:
+                print(f"[load] {name}.{field} repeats on several documents (e.g. {', '.join(dupes)}); "
+                      f"merge them to get the unique index {index_name}. Using a plain index for now.")
+                collection.create_index(keys, name=f"{index_name}_pending")
+                continue
+            try:
+                collection.create_index(keys, name=index_name, unique=True,
+                                        partialFilterExpression={field: {"$type": "string"}})
+            except OperationFailure as e:
+                print(f"[load] {name}: could not create {index_name}: {e}")
+
+
+def load(db, name, collection_name, make_ops, batch_size=BATCH_SIZE, writers=WRITERS):
+    skipped = Counter()
+    started = time.monotonic()
+    # Channel links update Churches as well, so those ops go to the right collection
+    writers_by_coll = {}
+    for op in make_ops(skipped):
+        target = "Churches" if isinstance(op, UpdateMany) else collection_name
+        if target not in writers_by_coll:
+            writers_by_coll[target] = BulkWriter(db[target], batch_size, writers)
+        writers_by_coll[target].add(op)
+
+    totals = Counter()
+    for writer in writers_by_coll.values():
+        totals.update(writer.close())
+    elapsed = time.monotonic() - started
+    rate = totals["ops"] / elapsed if elapsed else 0
+    print(f"[load] {name:<12} {totals['ops']:>8} ops in {elapsed:6.1f}s ({rate:,.0f}/s): "
+          f"{totals['upserted']} new, {totals['modified']} changed, {totals['errors']} errors"
+          + (f"; skipped {dict(skipped)}" if skipped else ""))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load the scraper outputs into MongoDB (safe to rerun).")
+    # no choices=: argparse checks the empty default against them and rejects a bare run
+    parser.add_argument("only", nargs="*", metavar="source",
+                        help="Sources to load: churches, links, videos, transcripts "
+                             "(default: all that exist). Load churches before links.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Operations per bulk_write.")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="bulk_writes in flight at once.")
+    args = parser.parse_args()
+    unknown = sorted(set(args.only) - set(sources()))
+    if unknown:
+        parser.error(f"unknown source(s): {', '.join(unknown)} (choose from {', '.join(sources())})")
+    metrics.start()   # exports only when METRICS_DIR is set
+
+    db = get_client()[DB_NAME]
+    ensure_indexes(db)
+
+    started = time.monotonic()
+    total = 0
+    for name, (collection_name, make_ops, present) in sources().items():
+        if args.only and name not in args.only:
+            continue
+        if not present:
+            print(f"[load] {name:<12} skipped (no input)")
+            continue
+        total += load(db, name, collection_name, make_ops, args.batch_size, args.writers)["ops"]
+
+    print(f"[load] Done: {total} operations in {time.monotonic() - started:.1f}s")
+    if total:
+        notify_ingest()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import atexit
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import urlparse
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+METRICS_DIR      = os.getenv("METRICS_DIR")              # set to export; unset = in-memory only
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "30"))   # seconds between exports
+METRICS_PROFILE  = os.getenv("METRICS_PROFILE")          # cprofile | pyinstrument
+PREFIX           = "churchtopics_"
+BUCKETS          = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RESERVOIR        = 2048      # recent samples per series for p50/p99
+TOP_HOSTS        = 20        # hosts listed in the JSON summary
+# ──────────────────────────────────────────────────────────── #
+
+# Counters, latency histograms and timers for the hot paths:
+#   with metrics.timer("http_request_seconds", host=metrics.host_of(url)): ...
+#   metrics.inc("pages_total", stage="crawl")
+# Everything is kept in memory; start() exports a Prometheus textfile
+# (metrics.prom) and a JSON summary (metrics.json) every METRICS_INTERVAL.
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "n", "recent")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.recent: deque[float] = deque(maxlen=RESERVOIR)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.n += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters: dict[str, dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: dict[str, dict[Labels, _Histogram]] = defaultdict(dict)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self.lock:
+            self.counters[name][key] += value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self.lock:
+            series = self.histograms[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram()
+            hist.observe(value)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    # ───── exports ─────
+    def prometheus(self) -> str:
+        def fmt(labels: Labels, extra: tuple = ()) -> str:
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            esc = (lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                metric = PREFIX + (name if name.endswith("_total") else name + "_total")
+                lines.append(f"# TYPE {metric} counter")
+                lines += [f"{metric}{fmt(k)} {v:g}" for k, v in sorted(series.items())]
+            for name, series in sorted(self.histograms.items()):
+                metric = PREFIX + name
+                lines.append(f"# TYPE {metric} histogram")
+                for k, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float("inf"),), h.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{metric}_bucket{fmt(k, (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_sum{fmt(k)} {h.total:.6f}")
+                    lines.append(f"{metric}_count{fmt(k)} {h.n}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        # Rates, p50/p99 per series, error classes and the hosts that took longest
+        now = time.time()
+        uptime = max(now - self.started, 1e-9)
+        out: dict = {"uptime_s": round(uptime, 1), "counters": {}, "timers": {}, "errors": {}, "hosts": {}}
+        host_seconds: dict[str, float] = defaultdict(float)
+        with self.lock:
+            for name, series in self.counters.items():
+                for k, v in series.items():
+                    labels = dict(k)
+                    if "error" in labels:
+                        where = labels.get("host") or labels.get("stage") or name
+                        classes = out["errors"].setdefault(where, {})
+                        classes[labels["error"]] = classes.get(labels["error"], 0) + v
+                        continue
+                    out["counters"][_series_name(name, k)] = {"total": v, "per_s": round(v / uptime, 3)}
+            for name, series in self.histograms.items():
+                for k, h in series.items():
+                    p50, p99 = h.quantile(0.5), h.quantile(0.99)
+                    out["timers"][_series_name(name, k)] = {
+                        "count": h.n,
+                        "per_s": round(h.n / uptime, 3),
+                        "total_s": round(h.total, 3),
+                        "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                        "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+                    }
+                    host = dict(k).get("host")
+                    if host:
+                        host_seconds[host] += h.total
+        top = sorted(host_seconds.items(), key=lambda kv: kv[1], reverse=True)[:TOP_HOSTS]
+        out["hosts"] = {h: round(s, 3) for h, s in top}
+        return out
+
+
+def _series_name(name: str, labels: Labels) -> str:
+    return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+
+REGISTRY = Registry()
+
+
+# ───── recording ─────
+def inc(name: str, value: float = 1, **labels) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    REGISTRY.observe(name, seconds, **labels)
+
+
+@contextmanager
+def timer(name: str, **labels) -> Iterator[None]:
+    # Records the duration either way; failures also count in <name>_errors by class
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        REGISTRY.inc(name.removesuffix("_seconds") + "_errors", error=type(e).__name__, **labels)
+        raise
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - started, **labels)
+
+
+def host_of(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+# ───── export ─────
+def _atomic_write(path: str, text: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)   # textfile collectors must never see a half-written file
+
+
+def export(directory: str | None = None) -> None:
+    directory = directory or METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _atomic_write(os.path.join(directory, "metrics.prom"), REGISTRY.prometheus())
+    _atomic_write(os.path.join(directory, "metrics.json"), json.dumps(REGISTRY.summary(), indent=2))
+
+
+_reporter: threading.Thread | None = None
+_reporter_lock = threading.Lock()
+
+
+def start(directory: str | None = None, interval: float = METRICS_INTERVAL, profile: str | None = None) -> bool:
+    # Periodic export in a daemon thread plus a final one at exit.
+    # → False (and nothing exported) when no directory is configured.
+    global _reporter, METRICS_DIR
+    if profile:
+        enable_profiling(profile)
+    directory = directory or METRICS_DIR
+    if not directory:
+        return False
+    with _reporter_lock:
+        if _reporter is not None:
+            return True
+        METRICS_DIR = directory
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    export(directory)
+                except OSError as e:
+                    print(f"[metrics] export failed: {e}")
+
+        _reporter = threading.Thread(target=loop, name="metrics-export", daemon=True)
+        _reporter.start()
+        atexit.register(export, directory)
+        atexit.register(dump_profiles, directory)
+    return True
+
+
+# ───── optional profiling ─────
+_profile_mode: str | None = None
+_profiles: dict[str, list] = defaultdict(list)
+_profile_local = threading.local()
+# Python 3.12+ runs cProfile on sys.monitoring, which allows one active profiler
+# per process, so there a single profiler covers every thread and stage
+_process_profiler = None
+PROCESS_STAGE = "process"
+
+
+def enable_profiling(mode: str) -> None:
+    global _profile_mode, _process_profiler
+    if mode not in ("cprofile", "pyinstrument"):
+        raise ValueError("profile mode must be cprofile or pyinstrument")
+    if mode == "pyinstrument":
+        import pyinstrument  # noqa: F401  (fail now, not inside a worker)
+    if mode == "cprofile" and sys.version_info >= (3, 12) and _process_profiler is None:
+        import cProfile
+        _process_profiler = cProfile.Profile()
+        _process_profiler.enable()
+        with REGISTRY.lock:
+            _profiles[PROCESS_STAGE].append(_process_profiler)
+    _profile_mode = mode
+
+
+@contextmanager
+def profiled(stage: str) -> Iterator[None]:
+    # Profiles the block when profiling is on; one profiler per (thread, stage),
+    # merged per stage by dump_profiles(). With the process-wide profiler
+    # (cProfile on 3.12+) everything is already being recorded.
+    if _profile_mode is None or (_profile_mode == "cprofile" and _process_profiler is not None):
+        yield
+        return
+    cache = getattr(_profile_local, "profilers", None)
+    if cache is None:
+        cache = _profile_local.profilers = {}
+    prof = cache.get(stage)
+    if prof is None:
+        if _profile_mode == "cprofile":
+            import cProfile
+            prof = cProfile.Profile()
+        else:
+            from pyinstrument import Profiler
+            prof = Profiler()
+        cache[stage] = prof
+        with REGISTRY.lock:
+            _profiles[stage].append(prof)
+    if _profile_mode == "cprofile":
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+    else:
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+
+
+def dump_profiles(directory: str | None = None) -> list[str]:
+    # <dir>/profile-<stage>.pstats (cProfile) or .html (pyinstrument);
+    # profile-process.pstats for the process-wide profiler on 3.12+
+    directory = directory or METRICS_DIR or "."
+    written = []
+    with REGISTRY.lock:
+        profiles = {stage: list(profs) for stage, profs in _profiles.items()}
+    for stage, profs in profiles.items():
+        if not profs:
+            continue
+        os.makedirs(directory, exist_ok=True)
+        if _profile_mode == "cprofile":
+            import pstats
+            stats = pstats.Stats(profs[0])
+            for p in profs[1:]:
+                stats.add(p)
+            path = os.path.join(directory, f"profile-{stage}.pstats")
+            stats.dump_stats(path)
+        else:
+            from pyinstrument.session import Session
+            session = None
+            for p in profs:
+                if p.last_session is not None:
+                    session = p.last_session if session is None else Session.combine(session, p.last_session)
+            if session is None:
+                continue
+            from pyinstrument.renderers import HTMLRenderer
+            path = os.path.join(directory, f"profile-{stage}.html")
+            _atomic_write(path, HTMLRenderer().render(session))
+        written.append(path)
+    return written
+
+
+if METRICS_PROFILE:
+    enable_profiling(METRICS_PROFILE)
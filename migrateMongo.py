@@ -0,0 +1,95 @@
+import argparse
+import time
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.collation import Collation
+
+from churchfields import derived_fields
+from queryMongo import connect_to_db, CASE_INSENSITIVE
+from serveMongo import notify_ingest
+
+BATCH_SIZE = 1000  # Documents per bulk_write
+
+# Raw columns and the copy each derived field was computed from
+SOURCES = [("Size", "size_src"), ("Language", "language_src"), ("Denomination", "denomination_src")]
+
+# Compound indexes the church queries are planned against: (keys, name, collation)
+INDEXES = [
+    ([("min_size", ASCENDING), ("max_size", ASCENDING)], "size_range", None),
+    # multikey: one entry per language in the array
+    ([("languages", ASCENDING), ("min_size", ASCENDING), ("max_size", ASCENDING)], "languages_size", None),
+    # exact matches, case-insensitive through the collation
+    ([("denomination_key", ASCENDING), ("min_size", ASCENDING), ("max_size", ASCENDING)],
+     "denomination_ci_size", CASE_INSENSITIVE),
+    ([("denomination_family", ASCENDING), ("min_size", ASCENDING), ("max_size", ASCENDING)],
+     "family_ci_size", CASE_INSENSITIVE),
+    # anchored prefix regexes on the lowercase key need a binary-ordered index
+    ([("denomination_key", ASCENDING), ("min_size", ASCENDING), ("max_size", ASCENDING)],
+     "denomination_prefix_size", None),
+]
+
+
+def ensure_indexes(collection):
+    for keys, name, collation in INDEXES:
+        if collation is None:
+            collection.create_index(keys, name=name)
+        else:
+            collection.create_index(keys, name=name, collation=Collation(**collation))
+
+
+def migrate(collection, batch_size=BATCH_SIZE, everything=False):
+    # Only documents whose raw fields changed since the last run (or never parsed).
+    # $ifNull folds a missing raw field into the null its *_src copy was stored
+    # as; otherwise missing != null and those documents are rewritten every run.
+    changed = [{"$expr": {"$ne": [{"$ifNull": [f"${src}", None]}, {"$ifNull": [f"${raw}", None]}]}}
+               for raw, src in SOURCES]
+    changed += [{src: {"$exists": False}} for _, src in SOURCES]
+    query = {} if everything else {"$or": changed}
+    fields = {raw: 1 for raw, _ in SOURCES}
+    cursor = collection.find(query, fields, batch_size=batch_size)
+
+    ops, done, flagged = [], 0, 0
+    for doc in cursor:
+        update = derived_fields(doc)
+        flagged += "size_flag" in update["$set"]
+        ops.append(UpdateOne({"_id": doc["_id"]}, update))
+        if len(ops) >= batch_size:
+            collection.bulk_write(ops, ordered=False)
+            done += len(ops)
+            ops = []
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+        done += len(ops)
+    return done, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Materialise indexed query fields on the Churches collection.")
+    parser.add_argument("--all", action="store_true", help="Re-derive every document, not just changed ones.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    collection = connect_to_db()
+
+    started = time.monotonic()
+    done, flagged = migrate(collection, args.batch_size, args.all)
+    print(f"Updated {done} documents ({flagged} sizes flagged as missing/open-ended/unparseable) "
+          f"in {time.monotonic() - started:.1f}s")
+
+    ensure_indexes(collection)
+    print(f"Indexes: {', '.join(name for _, name, _ in INDEXES)}")
+
+    # The old Denomination/Language-prefixed size indexes are superseded
+    existing = collection.index_information()
+    for stale in ("denomination_size", "language_size"):
+        if stale in existing:
+            collection.drop_index(stale)
+            print(f"Dropped index {stale}")
+
+    # Derived fields changed under any running query server
+    if done:
+        notify_ingest()
+
+
+if __name__ == "__main__":
+    main()
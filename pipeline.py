@@ -0,0 +1,701 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from dotenv import load_dotenv
+
+import everylive
+import findChurches
+import getWebsites
+import httpclient
+import metrics
+import transcripter
+import webcrawler
+from channelids import ChannelIdCache
+from crawlstate import CrawlState
+from driverpool import DriverPool
+from ratelimit import AdaptiveRateLimiter
+
+# Runs findChurches → getWebsites → webcrawler → everylive → transcripter as
+# one streaming DAG. Each stage has its own worker threads and an input queue;
+# every queued item is written to SQLite first (the spill and the resume
+# point) and up to `buffer` of them are kept in memory for the workers.
+# Producers block once a stage has `backlog` items waiting, so a slow stage
+# throttles the ones feeding it instead of growing without bound.
+# A run leaves the same files the scripts would (detailed_churches.csv,
+# youtube_links_output.csv, dumps/, transcripts), so loadMongo reads it as is.
+
+load_dotenv()
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+STATE_PATH       = "pipeline.sqlite"
+MAX_ATTEMPTS     = 3          # tries per item before it is marked failed
+PROGRESS_EVERY   = 10.0       # seconds between progress lines
+POOL_SIZE        = int(os.getenv("DRIVER_POOL_SIZE", "2"))   # Edge instances shared by all stages
+CHANNEL_BATCH    = 100        # channel URLs per ChannelIdCache.resolve_many call
+
+# stage -> (workers, in-memory buffer, backlog before producers block)
+STAGES = {
+    "directory":   (4, 16, 10_000),
+    "details":     (httpclient.POOL_PER_HOST, 256, 5_000),   # one host: one worker per socket
+    "crawl":       (16, 128, 2_000),
+    "channels":    (4, 256, 5_000),
+    "dumps":       (8, 64, 2_000),
+    "transcripts": (8, 512, 50_000),
+}
+# ──────────────────────────────────────────────────────────── #
+
+ORDER = list(STAGES)
+UPSTREAM = {name: ORDER[i - 1] if i else None for i, name in enumerate(ORDER)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id     TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status     TEXT NOT NULL             -- running | done | interrupted
+);
+CREATE TABLE IF NOT EXISTS items (
+    run_id     TEXT NOT NULL,
+    stage      TEXT NOT NULL,
+    key        TEXT NOT NULL,            -- church URL, site, channel ID, video ID…
+    payload    TEXT NOT NULL,            -- JSON
+    status     TEXT NOT NULL,            -- queued | buffered | running | done | failed
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    error      TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, stage, key)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (run_id, stage, status);
+"""
+
+
+# One browser pool for every stage that renders, started by the first page
+# that needs it; a run served by plain HTTP never launches Edge
+pool: DriverPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> DriverPool:
+    global pool
+    with _pool_lock:
+        if pool is None:
+            pool = DriverPool(POOL_SIZE, webcrawler.EDGE_DRIVER, headless=webcrawler.HEADLESS)
+        return pool
+
+
+# ───── durable state ─────
+class RunStore:
+    # One connection shared by every stage; writes are serialised by a lock.
+    # (stage, key) is unique per run, so an item reached twice is queued once.
+    def __init__(self, path: str, run_id: str):
+        self.run_id = run_id
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def start(self) -> bool:
+        # → True for a new run. A resumed run puts in-flight items back on disk.
+        now = time.time()
+        with self.lock:
+            new = self.conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, started_at, updated_at, status) VALUES (?, ?, ?, ?)",
+                (self.run_id, now, now, "running"),
+            ).rowcount == 1
+            self.conn.execute(
+                "UPDATE items SET status = 'queued' WHERE run_id = ? AND status IN ('buffered', 'running')",
+                (self.run_id,),
+            )
+            self.conn.execute("UPDATE runs SET status = 'running', updated_at = ? WHERE run_id = ?",
+                              (now, self.run_id))
+            self.conn.commit()
+        return new
+
+    def finish(self, status: str) -> None:
+        with self.lock:
+            self.conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                              (status, time.time(), self.run_id))
+            self.conn.commit()
+
+    def _insert(self, outputs: Iterable[tuple[str, str, Any]]) -> dict[str, int]:
+        added: dict[str, int] = {}
+        now = time.time()
+        for stage, key, payload in outputs:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO items (run_id, stage, key, payload, status, updated_at)"
+                " VALUES (?, ?, ?, ?, 'queued', ?)",
+                (self.run_id, stage, key, json.dumps(payload), now),
+            )
+            added[stage] = added.get(stage, 0) + cur.rowcount
+        return added
+
+    def seed(self, outputs: Iterable[tuple[str, str, Any]]) -> dict[str, int]:
+        with self.lock:
+            added = self._insert(outputs)
+            self.conn.commit()
+        return added
+
+    def mark_done(self, stage: str, keys: list[str]) -> None:
+        # For items whose output only counts once it is durable elsewhere
+        # (transcripts: at sink checkpoints), done after the worker finished
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE items SET status = 'done', updated_at = ? WHERE run_id = ? AND stage = ? AND key = ?",
+                [(now, self.run_id, stage, key) for key in keys],
+            )
+            self.conn.commit()
+
+    def complete(self, stage: str, key: str, outputs: list[tuple[str, str, Any]]) -> dict[str, int]:
+        # The item's outputs and its "done" mark land in one transaction, so a
+        # crash either redoes the item or has already queued what it produced
+        with self.lock:
+            added = self._insert(outputs)
+            self.conn.execute(
+                "UPDATE items SET status = 'done', updated_at = ? WHERE run_id = ? AND stage = ? AND key = ?",
+                (time.time(), self.run_id, stage, key),
+            )
+            self.conn.commit()
+        return added
+
+    def retry_or_fail(self, stage: str, key: str, error: str) -> bool:
+        # → True if the item went back on the queue
+        with self.lock:
+            (attempts,) = self.conn.execute(
+                "SELECT attempts FROM items WHERE run_id = ? AND stage = ? AND key = ?",
+                (self.run_id, stage, key),
+            ).fetchone()
+            status = "queued" if attempts + 1 < MAX_ATTEMPTS else "failed"
+            self.conn.execute(
+                "UPDATE items SET status = ?, attempts = attempts + 1, error = ?, updated_at = ?"
+                " WHERE run_id = ? AND stage = ? AND key = ?",
+                (status, error, time.time(), self.run_id, stage, key),
+            )
+            self.conn.commit()
+        return status == "queued"
+
+    def claim(self, stage: str, limit: int) -> list[tuple[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, payload FROM items WHERE run_id = ? AND stage = ? AND status = 'queued'"
+                " ORDER BY rowid LIMIT ?",
+                (self.run_id, stage, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE items SET status = 'buffered' WHERE run_id = ? AND stage = ? AND key = ?",
+                [(self.run_id, stage, key) for key, _ in rows],
+            )
+            self.conn.commit()
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def mark_running(self, stage: str, key: str) -> None:
+        with self.lock:
+            self.conn.execute(
+                "UPDATE items SET status = 'running' WHERE run_id = ? AND stage = ? AND key = ?",
+                (self.run_id, stage, key),
+            )
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT stage, status, COUNT(*) FROM items WHERE run_id = ? GROUP BY stage, status",
+                (self.run_id,),
+            ).fetchall()
+        out: dict[str, dict[str, int]] = {name: {} for name in ORDER}
+        for stage, status, n in rows:
+            out.setdefault(stage, {})[status] = n
+        return out
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+class SpillQueue:
+    # Input of one stage: items live on disk until claimed into the in-memory
+    # buffer. `waiting` counts items not yet picked up by a worker.
+    def __init__(self, store: RunStore, stage: str, buffer: int, backlog: int, waiting: int):
+        self.store = store
+        self.stage = stage
+        self.buffer = buffer
+        self.backlog = backlog
+        self.memory: queue.Queue = queue.Queue()
+        self.cond = threading.Condition()
+        self.waiting = waiting
+        self.running = 0
+        self.refill_lock = threading.Lock()
+
+    def wait_for_room(self, stop: threading.Event) -> None:
+        # Backpressure: producers stall while this stage is too far behind
+        with self.cond:
+            while self.waiting >= self.backlog and not stop.is_set():
+                self.cond.wait(1.0)
+
+    def added(self, n: int) -> None:
+        if n:
+            with self.cond:
+                self.waiting += n
+                self.cond.notify_all()
+
+    def get(self, timeout: float = 0.5) -> tuple[str, Any] | None:
+        try:
+            item = self.memory.get_nowait()
+        except queue.Empty:
+            with self.refill_lock:
+                if self.memory.empty():
+                    for entry in self.store.claim(self.stage, self.buffer):
+                        self.memory.put(entry)
+            try:
+                item = self.memory.get(timeout=timeout)
+            except queue.Empty:
+                return None
+        with self.cond:
+            self.waiting -= 1
+            self.running += 1
+            self.cond.notify_all()
+        return item
+
+    def release(self, requeued: bool = False) -> None:
+        with self.cond:
+            self.running -= 1
+            if requeued:
+                self.waiting += 1
+            self.cond.notify_all()
+
+    def idle(self) -> bool:
+        with self.cond:
+            return self.waiting == 0 and self.running == 0
+
+
+class CsvAppender:
+    # The CSV a standalone script would have written, so loadMongo and the
+    # next scripts read a pipeline run the same way. Rows are flushed as
+    # written: the item is marked done right after.
+    def __init__(self, path: str, header: list[str], fresh: bool):
+        new_file = fresh or not os.path.exists(path)
+        self.file = open(path, "w" if fresh else "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.lock = threading.Lock()
+        if new_file:
+            self.writer.writerow(header)
+
+    def write(self, row: list[str]) -> None:
+        with self.lock:
+            self.writer.writerow(row)
+            self.file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+# ───── stages ─────
+@dataclass
+class Context:
+    store: RunStore
+    detail_state: getWebsites.DetailState
+    details_csv: CsvAppender               # getWebsites.output_file, read by loadMongo
+    crawl_state: CrawlState                # exported to webcrawler.OUTPUT_CSV at the end
+    sink: transcripter.TranscriptSink
+    limiter: AdaptiveRateLimiter
+    transcribed: set[str]
+    refresh: bool = False
+    directory_probe: Callable[[int], list | None] | None = None
+    unflushed: list[str] = field(default_factory=list)    # transcript items not checkpointed yet
+    sink_lock: threading.Lock = field(default_factory=threading.Lock)
+    crawl_lock: threading.Lock = field(default_factory=threading.Lock)
+    local: threading.local = field(default_factory=threading.local)
+
+
+Output = list[tuple[str, str, Any]]
+
+
+def _directory_probe() -> Callable[[int], list | None]:
+    # Plain HTTP unless page 1 has neither results nor the empty marker
+    # (the listing needs the browser), as in findChurches.main; an empty
+    # directory (None) stays on plain HTTP
+    def render(page: int):
+        with get_pool().lease() as driver:
+            return findChurches.render_page(driver, page)
+    return render if findChurches.fetch_page(1) == [] else findChurches.fetch_page
+
+
+def directory_stage(ctx: Context, page: int) -> Output:
+    # Every page up to the last is seeded up front, so a page that fails for
+    # good costs only its own churches
+    rows = ctx.directory_probe(page)
+    return [("details", url, {"name": name, "url": url}) for name, url in rows or []]
+
+
+def _site(website: str) -> str | None:
+    website = (website or "").strip()
+    if website in ("", "N/A", "Error"):
+        return None
+    return website if website.startswith(("http://", "https://")) else f"https://{website}"
+
+
+def details_stage(ctx: Context, church: dict) -> Output:
+    row, outcome, digest = getWebsites.scrape_details([church["name"], church["url"]], ctx.detail_state)
+    if outcome == "error":
+        raise RuntimeError(f"detail page failed: {church['url']}")
+    if digest:
+        ctx.detail_state.record(church["url"], digest, row[2:])
+    ctx.details_csv.write(row)
+    site = _site(row[2])
+    return [("crawl", site, {"church": church["url"], "website": site})] if site else []
+
+
+def crawl_stage(ctx: Context, site: dict) -> Output:
+    hits, stats = webcrawler.crawl_site(site["website"])
+    with ctx.crawl_lock:
+        ctx.crawl_state.record(site["website"], hits, pages_tried=stats.get("pages", 0))
+    links = {u for found in hits.values() for u in found}
+    return [("channels", url, url) for url in sorted(links)]
+
+
+def channels_stage(ctx: Context, urls: list[str]) -> list[Output]:
+    # Batched (see BATCHED): one resolve_many per batch answers the cached URLs
+    # in one query and probes the rest concurrently.
+    # ChannelIdCache holds a SQLite connection, so one per worker thread
+    cache = getattr(ctx.local, "channel_cache", None)
+    if cache is None:
+        cache = ctx.local.channel_cache = ChannelIdCache()
+    resolved = cache.resolve_many(urls)
+    return [[("dumps", cid, cid)] if (cid := resolved.get(url)) else [] for url in urls]
+
+
+def dumps_stage(ctx: Context, channel_id: str) -> Output:
+    everylive.scrape_channel(channel_id, channel_id, refresh=ctx.refresh)
+    path = os.path.join(everylive.OUTPUT_DIR, f"{channel_id}.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return [("transcripts", e["id"], e["id"]) for e in entries
+            if e.get("id") and e["id"] not in ctx.transcribed]
+
+
+def transcripts_stage(ctx: Context, video_id: str) -> Output:
+    # Rows sit in the sink's buffer until its next checkpoint, so items are
+    # only marked done then (see DEFERRED); a crash refetches the rest
+    status, data, error = transcripter.fetch_transcript(video_id, ctx.limiter)
+    with ctx.sink_lock:
+        if status == "ok":
+            ctx.sink.add(video_id, data)
+        else:
+            ctx.sink.fail(video_id, status, error)
+        ctx.transcribed.add(video_id)
+        ctx.unflushed.append(video_id)
+        if status == "ok" and not ctx.sink.pending:   # this add ran a checkpoint
+            checkpoint_transcripts(ctx, flush=False)
+    return []
+
+
+def checkpoint_transcripts(ctx: Context, flush: bool = True) -> None:
+    # Caller holds sink_lock
+    if flush:
+        ctx.sink.checkpoint()
+    if ctx.unflushed:
+        ctx.store.mark_done("transcripts", ctx.unflushed)
+        ctx.unflushed = []
+
+
+# Stages that mark their own items done once the output is durable
+DEFERRED = {"transcripts"}
+
+# stage -> most items per call; these handlers take a list of payloads and
+# return one Output per payload
+BATCHED = {"channels": CHANNEL_BATCH}
+
+HANDLERS: dict[str, Callable[[Context, Any], Any]] = {
+    "directory": directory_stage,
+    "details": details_stage,
+    "crawl": crawl_stage,
+    "channels": channels_stage,
+    "dumps": dumps_stage,
+    "transcripts": transcripts_stage,
+}
+
+
+# ───── seeds for starting part-way, from the files the scripts hand over ─────
+def _csv_rows(path: str) -> Iterable[list[str]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        yield from reader
+
+
+def seeds(stage: str, path: str | None, probe: Callable[[int], Any] | None = None) -> Iterable[tuple[str, str, Any]]:
+    if stage == "directory":
+        last, probed = findChurches.find_last_page(probe)
+        print(f"[pipeline] Directory has {last} pages ({len(probed)} probes)")
+        return (("directory", str(n), n) for n in range(1, last + 1))
+    if stage == "details":
+        rows = _csv_rows(path or findChurches.output_file)
+        return (("details", r[1], {"name": r[0], "url": r[1]}) for r in rows if len(r) > 1)
+    if stage == "crawl":
+        rows = _csv_rows(path or getWebsites.output_file)
+        return (("crawl", s, {"church": r[1], "website": s})
+                for r in rows if len(r) > 2 for s in [_site(r[2])] if s)
+    if stage == "channels":
+        rows = _csv_rows(path or everylive.INPUT_CSV)
+        return (("channels", u.strip(), u.strip())
+                for r in rows if len(r) > 1 for u in r[1].split(",") if u.strip().startswith("http"))
+    if stage == "dumps":
+        names = os.listdir(everylive.OUTPUT_DIR) if os.path.isdir(everylive.OUTPUT_DIR) else []
+        return (("dumps", n[:-5], n[:-5]) for n in names if n.endswith(".json"))
+    rows = _csv_rows(path or transcripter.input_file)
+    return (("transcripts", r[0], r[0]) for r in rows if r)
+
+
+# ───── orchestration ─────
+class Pipeline:
+    def __init__(self, store: RunStore, ctx: Context, workers: dict[str, int], first: str):
+        self.store = store
+        self.ctx = ctx
+        self.workers = workers
+        self.first = ORDER.index(first)
+        counts = store.counts()
+        self.queues = {
+            name: SpillQueue(store, name, STAGES[name][1], STAGES[name][2],
+                             counts[name].get("queued", 0))
+            for name in ORDER
+        }
+        self.closed = {name: False for name in ORDER}
+        self.stop = threading.Event()
+        self.stats = {name: {"done": 0, "failed": 0, "seconds": 0.0} for name in ORDER}
+        self.stats_lock = threading.Lock()
+        self.threads: list[threading.Thread] = []
+
+    def _take(self, name: str) -> list[tuple[str, Any]]:
+        # One item, or for a BATCHED stage whatever is already buffered up to
+        # its batch size; never waits to fill a batch
+        q = self.queues[name]
+        item = q.get()
+        if item is None:
+            return []
+        items = [item]
+        while len(items) < BATCHED.get(name, 1):
+            item = q.get(timeout=0)
+            if item is None:
+                break
+            items.append(item)
+        return items
+
+    def _worker(self, name: str) -> None:
+        q = self.queues[name]
+        handler = HANDLERS[name]
+        while not self.stop.is_set():
+            items = self._take(name)
+            if not items:
+                if self.closed[name]:
+                    return
+                continue
+            for key, _ in items:
+                self.store.mark_running(name, key)
+            started = time.monotonic()
+            try:
+                with metrics.profiled(name), metrics.timer("stage_seconds", stage=name):
+                    if name in BATCHED:
+                        results = handler(self.ctx, [payload for _, payload in items])
+                    else:
+                        results = [handler(self.ctx, items[0][1])]
+            except Exception as e:
+                for key, _ in items:
+                    requeued = self.store.retry_or_fail(name, key, f"{type(e).__name__}: {e}")
+                    if not requeued:
+                        print(f"[pipeline] {name} ✗ {key}: {e}")
+                        with self.stats_lock:
+                            self.stats[name]["failed"] += 1
+                    q.release(requeued)
+                continue
+
+            seconds = (time.monotonic() - started) / len(items)
+            for (key, _), outputs in zip(items, results):
+                self._complete(name, key, outputs, seconds)
+                q.release()
+
+    def _complete(self, name: str, key: str, outputs: Output, seconds: float) -> None:
+        for target in {stage for stage, _, _ in outputs}:
+            if target != name:  # a stage feeding itself must not wait on itself
+                self.queues[target].wait_for_room(self.stop)
+        if name in DEFERRED:
+            added = {}
+        else:
+            added = self.store.complete(name, key, outputs)
+        for target, n in added.items():
+            self.queues[target].added(n)
+        metrics.inc("stage_items", stage=name)
+        for target, n in added.items():
+            metrics.inc("stage_emitted", n, stage=target)
+        with self.stats_lock:
+            self.stats[name]["done"] += 1
+            self.stats[name]["seconds"] += seconds
+
+    def _progress(self) -> str:
+        parts = []
+        with self.stats_lock:
+            for name in ORDER[self.first:]:
+                s, q = self.stats[name], self.queues[name]
+                avg = s["seconds"] / s["done"] if s["done"] else 0
+                parts.append(f"{name} {s['done']}✓ {s['failed']}✗ {q.waiting}q {q.running}r {avg:.1f}s")
+        return " | ".join(parts)
+
+    def run(self) -> None:
+        for name in ORDER[self.first:]:
+            for i in range(self.workers[name]):
+                t = threading.Thread(target=self._worker, args=(name,), name=f"{name}-{i}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+        # A stage is finished once everything upstream is and its queue has drained
+        last_report = time.monotonic()
+        while not all(self.closed[name] for name in ORDER[self.first:]):
+            time.sleep(0.5)
+            for name in ORDER[self.first:]:
+                up = UPSTREAM[name]
+                upstream_done = up is None or ORDER.index(up) < self.first or self.closed[up]
+                if not self.closed[name] and upstream_done and self.queues[name].idle():
+                    self.closed[name] = True
+                    print(f"[pipeline] {name} finished")
+            if time.monotonic() - last_report >= PROGRESS_EVERY:
+                print(f"[pipeline] {self._progress()}")
+                last_report = time.monotonic()
+
+        self.join()
+
+    def join(self) -> None:
+        # Workers check `stop` between items, so this waits out the ones in flight
+        for t in self.threads:
+            t.join()
+
+
+def parse_workers(specs: list[str]) -> dict[str, int]:
+    workers = {name: cfg[0] for name, cfg in STAGES.items()}
+    for spec in specs:
+        name, _, n = spec.partition("=")
+        if name not in STAGES or not n.isdigit() or int(n) < 1:
+            raise SystemExit(f"--workers takes stage=N with stage one of: {', '.join(ORDER)}")
+        workers[name] = int(n)
+    return workers
+
+
+def print_status(store: RunStore, run_id: str | None) -> None:
+    if run_id is None:
+        with store.lock:
+            runs = store.conn.execute(
+                "SELECT run_id, status, started_at, updated_at FROM runs ORDER BY started_at").fetchall()
+        for rid, status, started, updated in runs:
+            print(f"{rid:<28}{status:<12}{time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}"
+                  f"  {updated - started:8.0f}s")
+        return
+    for name, counts in store.counts().items():
+        print(f"{name:<12}" + "  ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run the scrape-to-transcript pipeline as streaming stages.")
+    parser.add_argument("--run-id", help="Resume this run (default: start a new one).")
+    parser.add_argument("--start-at", choices=ORDER, default="directory",
+                        help="First stage to run; earlier stages are skipped and it is seeded from its input file.")
+    parser.add_argument("--seed", help="Input file for --start-at (default: the file that stage's script reads).")
+    parser.add_argument("--workers", action="append", default=[], metavar="STAGE=N",
+                        help="Worker threads for a stage, e.g. --workers details=32 (repeatable).")
+    parser.add_argument("--refresh", action="store_true", help="Re-list channels that already have a dump.")
+    parser.add_argument("--status", action="store_true",
+                        help="Print item counts for --run-id (or list runs without it) and exit.")
+    parser.add_argument("--metrics-dir", default=metrics.METRICS_DIR,
+                        help="Write metrics.prom / metrics.json here every METRICS_INTERVAL seconds.")
+    parser.add_argument("--profile", choices=["cprofile", "pyinstrument"],
+                        help="Profile each stage; results go to --metrics-dir (or the current directory).")
+    args = parser.parse_args(argv)
+
+    run_id = args.run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    store = RunStore(STATE_PATH, run_id)
+    if args.status:
+        print_status(store, args.run_id)
+        store.close()
+        return
+
+    workers = parse_workers(args.workers)
+    metrics.start(args.metrics_dir, profile=args.profile)
+
+    # The scripts' own get_pool() hands out the shared pool too
+    findChurches.get_pool = getWebsites.get_pool = webcrawler.get_pool = get_pool
+    first = ORDER.index(args.start_at)
+    probe = _directory_probe() if args.start_at == "directory" else None
+
+    new_run = store.start()
+    if new_run:
+        added = store.seed(seeds(args.start_at, args.seed, probe))
+        print(f"[pipeline] Run {run_id}: seeded {sum(added.values())} {args.start_at} items")
+    else:
+        print(f"[pipeline] Resuming run {run_id}")
+
+    # A new run rewrites the outputs of the stages it runs; a resumed one appends
+    crawl_state = CrawlState(commit_every=1)
+    if new_run and first <= ORDER.index("crawl"):
+        crawl_state.reset()
+    transcribed = transcripter.load_done_ids()
+    store_writer = transcripter.TranscriptWriter() if transcripter.TranscriptWriter else None
+    ctx = Context(
+        store=store,
+        detail_state=getWebsites.DetailState(),
+        details_csv=CsvAppender(getWebsites.output_file,
+                                ["Church Name", "URL", "Website", "Denomination", "Language", "Size"],
+                                fresh=new_run and first <= ORDER.index("details")),
+        crawl_state=crawl_state,
+        sink=transcripter.TranscriptSink(store=store_writer),
+        limiter=AdaptiveRateLimiter(transcripter.START_RATE, burst=workers["transcripts"], target_latency=5.0),
+        transcribed=transcribed,
+        refresh=args.refresh,
+        directory_probe=probe,
+    )
+
+    pipeline = Pipeline(store, ctx, workers, args.start_at)
+    started = time.monotonic()
+    status = "interrupted"
+    try:
+        pipeline.run()
+        status = "done"
+    except KeyboardInterrupt:
+        print(f"\n[pipeline] Stopping after the items in flight; resume with --run-id {run_id}")
+        pipeline.stop.set()
+        pipeline.join()
+    finally:
+        with ctx.sink_lock:
+            ctx.sink.close()
+            checkpoint_transcripts(ctx, flush=False)   # close() ran the last checkpoint
+        store.finish(status)
+        ctx.details_csv.close()
+        ctx.detail_state.close()
+        rows = crawl_state.export_csv(webcrawler.OUTPUT_CSV)
+        crawl_state.close()
+        if pool is not None:
+            pool.close()
+        httpclient.close()
+        print(f"[pipeline] {rows} crawl hits in {webcrawler.OUTPUT_CSV}")
+        print(f"[pipeline] {pipeline._progress()}")
+        print(f"[pipeline] Run {run_id} {status} after {time.monotonic() - started:.0f}s")
+        store.close()
+        metrics.export(args.metrics_dir)
+        if args.profile:
+            for path in metrics.dump_profiles(args.metrics_dir):
+                print(f"[pipeline] Profile written to {path}")
+
+
+if __name__ == "__main__":
+    main()
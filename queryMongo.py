@@ -1,206 +1,306 @@
 from pymongo import MongoClient
 import os
+import re
+import sys
+import csv
+import json
 from dotenv import load_dotenv
 import argparse
 
+import metrics
+from churchfields import normalize_languages, denomination_key
+
 # Load environment variables from a .env file
 load_dotenv()
 
+_client = None
+
+# One pooled client per process; MongoClient is thread-safe and keeps its own connection pool
+def get_client():
+    global _client
+    if _client is None:
+        _client = MongoClient(os.getenv("MONGO_DB"), maxPoolSize=int(os.getenv("MONGO_POOL_SIZE", "50")))
+    return _client
+
 # Function to connect to the database
 def connect_to_db():
-    client = MongoClient(os.getenv("MONGO_DB"))
-    db = client["Sermons"]  # Replace with your database name
+    db = get_client()["Sermons"]  # Replace with your database name
     return db["Churches"]  # Replace with your collection name
 
-def query_churches(collection, language=None, denomination=None, range_value=None):
-    pipeline = []
+# Fields every query returns
+PROJECTION = {"_id": 1, "ChurchName": 1, "Language": 1, "Denomination": 1, "Size": 1, "Website": 1}
+
+# --returns name -> document field
+FIELD_MAP = {
+    "name": "ChurchName",
+    "language": "Language",
+    "denomination": "Denomination",
+    "size": "Size",
+    "url": "Website"
+}
+
+BATCH_SIZE = 500  # Documents per cursor round trip
+FORMATS = ("text", "jsonl", "ndjson", "csv")
+
+
+# Collation of the *_ci indexes; exact string matches must use it to hit them
+CASE_INSENSITIVE = {"locale": "en", "strength": 2}
 
-    # Stage 1: Match on language and denomination if they're provided
+MATCH_MODES = ("exact", "prefix", "regex")
+# regex keeps the original case-insensitive substring match ("baptist" finds
+# "Southern Baptist"); exact and prefix are the faster indexed modes, opt-in
+MATCH_DEFAULT = "regex"
+
+
+def _prefix(value):
+    # Anchored, case-sensitive regex on an already-lowercase field: index-bounded
+    return {"$regex": "^" + re.escape(value)}
+
+
+def build_filter(language=None, denomination=None, range_value=None, family=None, match=MATCH_DEFAULT):
+    # Returns (filter, collation). exact/prefix use the normalised fields from
+    # migrateMongo.py; regex is the old unanchored scan over the raw columns.
+    if match not in MATCH_MODES:
+        raise ValueError(f"Match mode must be one of: {', '.join(MATCH_MODES)}.")
     match_stage = {}
-    if language:
-        match_stage["Language"] = {"$regex": language, "$options": "i"}
-    if denomination:
-        match_stage["Denomination"] = {"$regex": denomination, "$options": "i"}
+    collation = None
+
+    if match == "regex":
+        if language:
+            match_stage["Language"] = {"$regex": language, "$options": "i"}
+        if denomination:
+            match_stage["Denomination"] = {"$regex": denomination, "$options": "i"}
+    else:
+        langs = normalize_languages(language)
+        key = denomination_key(denomination)
+        if match == "exact":
+            if langs:
+                match_stage["languages"] = langs[0] if len(langs) == 1 else {"$all": langs}
+            if key:
+                match_stage["denomination_key"] = key
+                collation = CASE_INSENSITIVE
+        else:
+            if langs:
+                # every requested language, each as an anchored prefix
+                match_stage["languages"] = _prefix(langs[0]) if len(langs) == 1 else \
+                    {"$all": [{"$elemMatch": _prefix(lang)} for lang in langs]}
+            if key:
+                match_stage["denomination_key"] = _prefix(key)
 
-    # Only add a $match if there's something to match on
-    if match_stage:
-        pipeline.append({"$match": match_stage})
+    if family:
+        match_stage["denomination_family"] = family.strip().lower()
+        if match != "prefix":
+            collation = CASE_INSENSITIVE
 
-    # Stage 2: If range_value is provided, add all the "size" parsing steps
+    # min_size/max_size are materialised by migrateMongo.py, so the size test
+    # is a plain range predicate that the compound size indexes can answer
     if range_value is not None:
         try:
             range_int = int(range_value)
         except ValueError:
             raise ValueError("Range value must be an integer.")
+        match_stage["min_size"] = {"$lte": range_int}
+        match_stage["max_size"] = {"$gte": range_int}
 
-        pipeline.extend([
-            # Clean up the 'Size' field
-            {
-                "$addFields": {
-                    "clean_size": {
-                        "$replaceAll": {
-                            "input": {"$replaceAll": {"input": "$Size", "find": ",", "replacement": ""}},
-                            "find": " ",
-                            "replacement": ""
-                        }
-                    }
-                }
-            },
-            # Project intermediate steps for debug or clarity
-            {
-                "$project": {
-                    "_id": 1,
-                    "ChurchName": 1,
-                    "Language": 1,
-                    "Denomination": 1,
-                    "Website": 1,
-                    "Size": 1,
-                    "clean_size": 1,
-                    "split_size": {"$split": ["$clean_size", "-"]}
-                }
-            },
-            # Keep docs that have exactly two elements in split_size
-            {
-                "$match": {
-                    "$expr": {"$eq": [{"$size": "$split_size"}, 2]}
-                }
-            },
-            # Convert the parts into min_size, max_size (integers)
-            {
-                "$addFields": {
-                    "min_size": {
-                        "$convert": {
-                            "input": {"$arrayElemAt": ["$split_size", 0]},
-                            "to": "int",
-                            "onError": None
-                        }
-                    },
-                    "max_size": {
-                        "$convert": {
-                            "input": {"$arrayElemAt": ["$split_size", 1]},
-                            "to": "int",
-                            "onError": None
-                        }
-                    }
-                }
-            },
-            # Filter out where conversion failed
-            {
-                "$match": {
-                    "$and": [
-                        {"min_size": {"$ne": None}},
-                        {"max_size": {"$ne": None}}
-                    ]
-                }
-            },
-            # Keep only those where min <= range_int <= max
-            {
-                "$match": {
-                    "$expr": {
-                        "$and": [
-                            {"$lte": ["$min_size", range_int]},
-                            {"$gte": ["$max_size", range_int]}
-                        ]
-                    }
-                }
-            },
-            # Final project
-            {
-                "$project": {
-                    "_id": 1,
-                    "ChurchName": 1,
-                    "Language": 1,
-                    "Denomination": 1,
-                    "Size": 1,
-                    "Website": 1
-                }
-            }
-        ])
-
-    # Finally, run the pipeline if range is provided, or do a simpler find if not
-    if range_value is not None:
-        results = collection.aggregate(pipeline)
-    else:
+    return match_stage, collation
+
+
+def query_churches(collection, language=None, denomination=None, range_value=None, family=None,
+                   match=MATCH_DEFAULT):
+    match_stage, collation = build_filter(language, denomination, range_value, family, match)
+    with metrics.timer("mongo_query_seconds", op="find"):
+        return list(collection.find(match_stage, PROJECTION, collation=collation))
+
+
+def projection_for(returns):
+    # Server-side projection for the --returns names; _id is never printed
+    projection = {"_id": 0}
+    for name in returns:
+        if name not in FIELD_MAP:
+            raise ValueError(f"Invalid field '{name}'. Valid options are: {', '.join(FIELD_MAP)}")
+        projection[FIELD_MAP[name]] = 1
+    return projection
 
-        if pipeline:
-            results = collection.aggregate(pipeline)
-        else:
-            # If no language/denomination or range is provided, there's no pipeline, so just return everything
-            results = collection.find()
 
-    return list(results)
+def iter_churches(collection, match_stage, collation=None, projection=PROJECTION, limit=0, batch_size=BATCH_SIZE):
+    # Lazy cursor: documents arrive batch_size at a time instead of all at once
+    return collection.find(match_stage, projection, collation=collation, limit=limit, batch_size=batch_size)
+
+
+def count_churches(collection, match_stage, collation=None, limit=0):
+    options = {"collation": collation} if collation else {}
+    if limit:
+        options["limit"] = limit
+    with metrics.timer("mongo_query_seconds", op="count"):
+        return collection.count_documents(match_stage, **options)
+
+
+def write_results(cursor, returns, fmt="text", out=sys.stdout):
+    # Streams rows keyed by the --returns names; returns how many were written
+    fields = [FIELD_MAP[name] for name in returns]
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(returns)
+    written = 0
+    for doc in cursor:
+        if fmt == "text" and written == 0:
+            print("Matching churches:", file=out)
+        values = [doc.get(field) for field in fields]
+        if writer is not None:
+            writer.writerow(["" if v is None else v for v in values])
+        elif fmt == "text":
+            print(dict(zip(returns, values)), file=out)
+        else:  # jsonl / ndjson: one compact object per line
+            out.write(json.dumps(dict(zip(returns, values)), ensure_ascii=False, default=str) + "\n")
+        written += 1
+    if fmt == "text" and written == 0:
+        print("No matching churches found.", file=out)
+    return written
+
+
+def _plan_stages(plan):
+    # Flatten a winning plan into (stage, index name) pairs, outermost first
+    stages = []
+    plan = plan.get("queryPlan", plan)  # slot-based engine nests it one level down
+    while plan:
+        stages.append((plan.get("stage"), plan.get("indexName")))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return stages
+
+
+def explain_query(collection, match_stage, projection=PROJECTION, collation=None):
+    # Index use and coverage for one filter, straight from the server's explain
+    explain = collection.find(match_stage, projection, collation=collation).explain()
+    plan = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    stats = explain.get("executionStats", {})
+    stages = [stage for stage, _ in plan]
+    indexes = [name for _, name in plan if name]
+    return {
+        "stages": stages,
+        "index": indexes[0] if indexes else None,
+        "collection_scan": "COLLSCAN" in stages,
+        # covered = answered from the index alone, no document fetched
+        "covered": "IXSCAN" in stages and stats.get("totalDocsExamined", 1) == 0,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+    }
 
 
 # Main function
 def main():
-    
-    field_map = {
-        "name": "ChurchName",
-        "language": "Language",
-        "denomination": "Denomination",
-        "size": "Size",
-        "url": "Website"
-    }
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Query MongoDB collection for churches.")
     parser.add_argument(
         "--language",
         type=str,
-        help="Search for churches with a specific language (regex supported)."
+        help="Search for churches with a specific language (see --match)."
     )
     parser.add_argument(
         "--denomination",
         type=str,
-        help="Search for churches with a specific denomination (regex supported)."
+        help="Search for churches with a specific denomination (see --match)."
+    )
+    parser.add_argument(
+        "--family",
+        type=str,
+        help="Search for churches in a denomination family, e.g. baptist, pentecostal, reformed."
+    )
+    parser.add_argument(
+        "--match",
+        choices=MATCH_MODES,
+        default=MATCH_DEFAULT,
+        help="How --language/--denomination match. regex (default) is the original case-insensitive "
+             "substring match, a scan on large collections; exact and prefix use the indexed "
+             "normalised fields from migrateMongo.py (case-insensitive) and are much faster."
     )
     parser.add_argument(
         "--size",
         type=str,
         help="Search for churches where the size range contains the given number."
     )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Show the query plan (index used, covered or not) instead of the results."
+    )
+    parser.add_argument(
+        "--count",
+        action="store_true",
+        help="Print only the number of matching churches."
+    )
     parser.add_argument(
         "--returns",
         type=str,
         default=["name"],
         nargs="+",
-        help=f"Define what sections to return. Valid options are: {', '.join(field_map.keys())}. Note, can have multiple in the format \"--returns <arg> <arg>\""
+        help=f"Define what sections to return. Valid options are: {', '.join(FIELD_MAP.keys())}. Note, can have multiple in the format \"--returns <arg> <arg>\""
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="Output format on stdout: text (readable), jsonl/ndjson (one JSON object per line) or csv."
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=0,
+        help="Stop after this many churches (0 = no limit)."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BATCH_SIZE,
+        help="Documents fetched per cursor round trip."
     )
     
     args = parser.parse_args()
-    
- 
+
+    # Check for invalid fields before touching the database
+    invalid_fields = [field for field in args.returns if field not in FIELD_MAP]
+    if invalid_fields:
+        print(f"Error: Invalid fields in --returns: {', '.join(invalid_fields)}")
+        print(f"Valid options are: {', '.join(FIELD_MAP.keys())}")
+        return
 
     # Connect to the database
     collection = connect_to_db()
 
     # Query the database
     try:
-        churches = query_churches(
-            collection,
-            language=args.language,
-            denomination=args.denomination,
-            range_value=args.size
+        match_stage, collation = build_filter(
+            args.language, args.denomination, args.size, args.family, args.match
         )
-        # Handle the case where `args.returns` is a list of fields
-        returns = [field_map.get(field, None) for field in args.returns]
-
-        # Check for invalid fields
-        if None in returns:
-            invalid_fields = [field for field, mapped in zip(args.returns, returns) if mapped is None]
-            print(f"Error: Invalid fields in --returns: {', '.join(invalid_fields)}")
-            print(f"Valid options are: {', '.join(field_map.keys())}")
+        if args.explain:
+            for projection in (projection_for(args.returns), {"_id": 0, "min_size": 1, "max_size": 1}):
+                report = explain_query(collection, match_stage, projection, collation)
+                print(f"Projection {sorted(projection)}:")
+                for key, value in report.items():
+                    print(f"  {key}: {value}")
             return
 
-        if returns is None:
-            print(f"Error: Invalid --returns value '{args.returns}'. Valid options are: {', '.join(field_map.keys())}")
+        if args.count:
+            print(count_churches(collection, match_stage, collation, args.limit))
             return
-        # Print the results
-        if churches:
-            print("Matching churches:")
-            for church in churches:
-                print({field: church.get(field_map.get(field, "Field not found")) for field in args.returns})
-        else:
-            print("No matching churches found.")
+
+        # Only the requested fields leave the server, and rows are written as they arrive
+        cursor = iter_churches(
+            collection,
+            match_stage,
+            collation,
+            projection=projection_for(args.returns),
+            limit=args.limit,
+            batch_size=args.batch_size
+        )
+        try:
+            # cursor batches are fetched lazily, so this times the query and the output together
+            with metrics.timer("mongo_query_seconds", op="stream"):
+                written = write_results(cursor, args.returns, args.format)
+            metrics.inc("mongo_documents", written, op="stream")
+        finally:
+            cursor.close()
     except ValueError as e:
         print(f"Error: {e}")
 
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+
+# ───── adaptive token bucket ─────
+class AdaptiveRateLimiter:
+    # Token bucket whose refill rate follows AIMD: every success nudges the
+    # rate up by `increase` req/s, every throttle signal (429, block page)
+    # multiplies it by `decrease`. Responses slower than `target_latency`
+    # count as a soft signal and trim the rate a little.
+    def __init__(
+        self,
+        rate: float = 1.0,
+        *,
+        min_rate: float = 0.05,
+        max_rate: float = 20.0,
+        burst: float | None = None,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        target_latency: float | None = None,
+        cooldown: float = 5.0,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._last_cut = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self, latency: float | None = None) -> None:
+        with self._lock:
+            if (self.target_latency is not None and latency is not None
+                    and latency > self.target_latency):
+                self.rate = max(self.min_rate, self.rate * 0.9)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            # concurrent workers all see the same 429 burst; cut once per window
+            if now - self._last_cut < self.cooldown:
+                return
+            self._last_cut = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = 0.0
+
+
+# ───── retry backoff ─────
+def backoff_delay(attempt: int, *, base: float = 1.0, cap: float = 60.0) -> float:
+    # exponential with full jitter, so retrying workers do not stampede together
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse, urljoin
+
+import httpclient
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+ROBOTS_AGENT   = httpclient.USER_AGENT.split("/")[0].lower()   # product token we match groups on
+CACHE_DIR      = os.getenv("ROBOTS_CACHE_DIR", os.path.join(".cache", "robots"))
+CACHE_TTL      = 24 * 3600       # seconds a fetched robots.txt stays valid on disk
+ERROR_TTL      = 10 * 60         # 5xx / unreachable: disallow everything for this long
+MAX_CRAWL_DELAY = 30.0           # clamp silly values like "Crawl-delay: 3600"
+# ──────────────────────────────────────────────────────────── #
+
+
+# ───── compiled matcher ─────
+class _Trie:
+    # Plain prefixes share one character trie; walking a path once finds the
+    # deepest (= longest) rule on it, independent of how many rules exist.
+    __slots__ = ("root",)
+
+    def __init__(self):
+        self.root: dict = {}
+
+    def add(self, prefix: str, allow: bool) -> None:
+        node = self.root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        # Allow beats Disallow on an identical pattern
+        node[None] = allow or node.get(None, False)
+
+    def longest(self, path: str) -> tuple[int, bool] | None:
+        node, best = self.root, None
+        for i, ch in enumerate(path):
+            node = node.get(ch)
+            if node is None:
+                break
+            if None in node:
+                best = (i + 1, node[None])
+        return best
+
+
+def _wildcard_regex(pattern: str) -> str:
+    anchored = pattern.endswith("$")
+    body = pattern[:-1] if anchored else pattern
+    return ".*".join(re.escape(part) for part in body.split("*")) + ("$" if anchored else "")
+
+
+class RobotsRules:
+    def __init__(
+        self,
+        rules: list[tuple[str, bool]] | None = None,
+        *,
+        crawl_delay: float | None = None,
+        sitemaps: list[str] | None = None,
+        unreachable: bool = False,
+    ):
+        self.crawl_delay = crawl_delay
+        self.sitemaps = sitemaps or []
+        self.unreachable = unreachable        # robots.txt failed with a 5xx or no response
+        self.rule_count = 0
+        self._trie = _Trie()
+
+        wild: list[tuple[str, bool]] = []
+        for pattern, allow in rules or []:
+            if not pattern:
+                continue                      # empty Disallow allows everything
+            self.rule_count += 1
+            if "*" in pattern or pattern.endswith("$"):
+                wild.append((pattern, allow))
+            else:
+                self._trie.add(pattern, allow)
+
+        # All wildcard rules in one regex. Alternatives are ordered longest
+        # pattern first (Allow first on ties), so the alternative that matches
+        # is the winning rule and m.lastgroup says which one it was.
+        wild.sort(key=lambda r: (-len(r[0]), not r[1]))
+        self._wild = wild
+        self._wild_re = re.compile(
+            "|".join(f"(?P<r{i}>{_wildcard_regex(p)})" for i, (p, _) in enumerate(wild))
+        ) if wild else None
+
+    def allowed(self, url: str) -> bool:
+        parts = urlparse(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        if path == "/robots.txt":
+            return True
+
+        best = self._trie.longest(path)
+        if self._wild_re is not None:
+            m = self._wild_re.match(path)
+            if m:
+                pattern, allow = self._wild[int(m.lastgroup[1:])]
+                if best is None or (len(pattern), allow) > best:
+                    best = (len(pattern), allow)
+        return best is None or best[1]
+
+
+# ───── parser ─────
+_TOKEN = re.compile(r"[a-z_-]+")
+
+
+def parse(text: str, agent: str = ROBOTS_AGENT) -> RobotsRules:
+    groups: dict[str, dict] = {}
+    current: list[str] = []
+    in_agents = False
+    sitemaps: list[str] = []
+
+    for raw in text.splitlines():
+        line = raw.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        field, value = (x.strip() for x in line.split(":", 1))
+        field = field.lower()
+
+        if field == "user-agent":
+            if not in_agents:              # a new group starts
+                current = []
+            in_agents = True
+            # RFC 9309: the line names a product token (letters, "_", "-"); any
+            # version or comment after it, as in "Bot/1.0", is not part of it
+            token = _TOKEN.match(value.lower())
+            name = token.group(0) if token else value.lower()
+            current.append(name)
+            groups.setdefault(name, {"rules": [], "delay": None})
+            continue
+        if field == "sitemap":
+            if value:
+                sitemaps.append(value)
+            continue
+
+        in_agents = False
+        for name in current:
+            group = groups[name]
+            if field in ("allow", "disallow"):
+                group["rules"].append((value, field == "allow"))
+            elif field == "crawl-delay":
+                try:
+                    group["delay"] = float(value)
+                except ValueError:
+                    pass
+
+    # the group whose product token equals ours (case-insensitive), else "*"
+    chosen = groups.get(agent.lower()) or groups.get("*")
+    if chosen is None:
+        return RobotsRules(sitemaps=sitemaps)
+
+    delay = chosen["delay"]
+    if delay is not None:
+        delay = min(max(delay, 0.0), MAX_CRAWL_DELAY)
+    return RobotsRules(chosen["rules"], crawl_delay=delay, sitemaps=sitemaps)
+
+
+# ───── per-host cache ─────
+# RFC 9309: a 4xx means there are no rules (allow all, cached like a real
+# file); a 5xx or no response means the site is unreachable for now, which
+# counts as a full disallow and is only remembered for ERROR_TTL
+UNREACHABLE = None                       # _fetch_text's marker for that case
+
+_memory: dict[str, tuple[RobotsRules, float]] = {}    # origin -> (rules, expires at)
+_memory_lock = threading.Lock()
+
+
+def _cache_path(origin: str) -> str:
+    return os.path.join(CACHE_DIR, hashlib.sha1(origin.encode()).hexdigest() + ".json")
+
+
+def _load_cached(origin: str) -> tuple[str | None, float] | None:
+    # → (text or UNREACHABLE, expires at), or None when missing or expired
+    try:
+        with open(_cache_path(origin), encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    expires = entry.get("fetched_at", 0) + entry.get("ttl", CACHE_TTL)
+    if time.time() > expires:
+        return None
+    return entry.get("text", ""), expires
+
+
+def _store_cached(origin: str, text: str | None, ttl: float) -> float:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{_cache_path(origin)}.{os.getpid()}.{threading.get_ident()}.tmp"   # one per writer
+    now = time.time()
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"origin": origin, "fetched_at": now, "ttl": ttl, "text": text}, f)
+    os.replace(tmp, _cache_path(origin))
+    return now + ttl
+
+
+def _fetch_text(origin: str) -> tuple[str | None, float]:
+    robots_url = urljoin(origin + "/", "robots.txt")
+    try:
+        resp = httpclient.fetch(robots_url)
+    except Exception as e:
+        print(f"[robots] error {robots_url} – {e}")
+        return UNREACHABLE, _store_cached(origin, UNREACHABLE, ERROR_TTL)
+    if resp.status >= 500:
+        print(f"[robots] unreachable @ {robots_url} ({resp.status})")
+        return UNREACHABLE, _store_cached(origin, UNREACHABLE, ERROR_TTL)
+    if resp.status != 200:
+        print(f"[robots] none @ {robots_url} ({resp.status})")
+        text = ""
+    else:
+        text = resp.text
+    return text, _store_cached(origin, text, CACHE_TTL)
+
+
+def rules_for(url: str) -> RobotsRules:
+    parts = urlparse(url if "://" in url else f"https://{url}")
+    origin = f"{parts.scheme}://{parts.netloc}".lower()
+
+    with _memory_lock:
+        cached = _memory.get(origin)
+    if cached is not None and time.time() <= cached[1]:
+        return cached[0]
+
+    text, expires = _load_cached(origin) or _fetch_text(origin)
+    if text is UNREACHABLE:
+        rules = RobotsRules([("/", False)], unreachable=True)
+    else:
+        rules = parse(text)
+    with _memory_lock:
+        _memory[origin] = (rules, expires)
+    return rules
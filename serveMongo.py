@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import metrics
+
+from queryMongo import (
+    FIELD_MAP,
+    MATCH_DEFAULT,
+    BATCH_SIZE,
+    build_filter,
+    connect_to_db,
+    count_churches,
+    iter_churches,
+    projection_for,
+)
+
+# Long-running query service: one pooled MongoClient (queryMongo.get_client)
+# shared by every request, and an LRU+TTL cache of results in front of it.
+#
+#   GET  /churches?language=english&family=baptist&size=100&returns=name,url&limit=50
+#   GET  /count?denomination=southern%20baptist
+#   GET  /stats       per-route latency and cache hit rate
+#   POST /invalidate  drop cached results (the loaders call this after an ingest)
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+HOST          = os.getenv("QUERY_SERVER_HOST", "127.0.0.1")
+PORT          = int(os.getenv("QUERY_SERVER_PORT", "8765"))
+CACHE_SIZE    = int(os.getenv("QUERY_CACHE_SIZE", "2048"))     # cached result sets
+CACHE_TTL     = float(os.getenv("QUERY_CACHE_TTL", "300"))     # seconds
+MAX_LIMIT     = 5000           # largest result set a single request may ask for
+LATENCY_KEEP  = 2000           # recent samples per route for percentiles
+SERVER_URL    = os.getenv("QUERY_SERVER_URL")   # set to let ingest jobs invalidate the cache
+# ──────────────────────────────────────────────────────────── #
+
+FILTER_ARGS = ("language", "denomination", "family", "size", "match")
+
+
+class ResultCache:
+    # LRU with a per-entry TTL; keys are the normalised filter, so "English" and
+    # " english" share an entry
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            dropped = len(self._data)
+            self._data.clear()
+            self.invalidations += 1
+            return dropped
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+class LatencyStats:
+    # Recent latencies per route, summarised on demand for /stats
+    def __init__(self, keep=LATENCY_KEEP):
+        self._samples = defaultdict(lambda: deque(maxlen=keep))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds):
+        with self._lock:
+            self._samples[route].append(seconds)
+            self._counts[route] += 1
+
+    def summary(self):
+        with self._lock:
+            snapshot = {route: sorted(s) for route, s in self._samples.items()}
+            counts = dict(self._counts)
+        out = {}
+        for route, samples in snapshot.items():
+            def pct(p):
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+            out[route] = {
+                "requests": counts[route],
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+                "p50_ms": pct(0.50),
+                "p95_ms": pct(0.95),
+                "p99_ms": pct(0.99),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return out
+
+
+def _one(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def parse_query(params):
+    # Query-string parameters -> (filter, collation, returns, limit)
+    args = {name: _one(params, name) for name in FILTER_ARGS}
+    match_stage, collation = build_filter(
+        args["language"], args["denomination"], args["size"], args["family"], args["match"] or MATCH_DEFAULT
+    )
+    returns = [r for r in _one(params, "returns", "name").split(",") if r]
+    projection_for(returns)  # raises ValueError on unknown names
+    try:
+        limit = int(_one(params, "limit", "0"))
+    except ValueError:
+        raise ValueError("limit must be an integer.")
+    if limit <= 0 or limit > MAX_LIMIT:
+        limit = MAX_LIMIT
+    return match_stage, collation, returns, limit
+
+
+def cache_key(route, match_stage, collation, returns=(), limit=0):
+    return json.dumps([route, match_stage, collation, sorted(returns), limit], sort_keys=True)
+
+
+def run_query(collection, match_stage, collation, returns, limit):
+    fields = [FIELD_MAP[name] for name in returns]
+    cursor = iter_churches(
+        collection, match_stage, collation, projection=projection_for(returns),
+        limit=limit, batch_size=min(limit, BATCH_SIZE)
+    )
+    try:
+        with metrics.timer("mongo_query_seconds", op="find"):
+            return [{name: doc.get(field) for name, field in zip(returns, fields)} for doc in cursor]
+    finally:
+        cursor.close()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # collection, cache and latency are attached to the server in serve()
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients reuse their connection too
+
+    def _send(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        url = urlparse(self.path)
+        route = url.path.rstrip("/") or "/"
+        server = self.server
+        try:
+            if route == "/stats":
+                return self._send(200, {"cache": server.cache.stats(), "latency": server.latency.summary()})
+            if route == "/health":
+                return self._send(200, {"ok": True})
+            if route not in ("/churches", "/count"):
+                return self._send(404, {"error": f"Unknown path {url.path}"})
+
+            match_stage, collation, returns, limit = parse_query(parse_qs(url.query))
+            if route == "/count":
+                key = cache_key(route, match_stage, collation)
+            else:
+                key = cache_key(route, match_stage, collation, returns, limit)
+            result = server.cache.get(key)
+            cached = result is not None
+            if not cached:
+                if route == "/count":
+                    result = {"count": count_churches(server.collection, match_stage, collation)}
+                else:
+                    churches = run_query(server.collection, match_stage, collation, returns, limit)
+                    result = {"count": len(churches), "churches": churches}
+                server.cache.put(key, result)
+            self._send(200, dict(result, cached=cached))
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            elapsed = time.perf_counter() - started
+            server.latency.record(route, elapsed)
+            metrics.observe("serve_request_seconds", elapsed, route=route)
+
+    def do_POST(self):
+        route = urlparse(self.path).path.rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)  # body is ignored, but must be drained for keep-alive
+        if route != "/invalidate":
+            return self._send(404, {"error": f"Unknown path {self.path}"})
+        self._send(200, {"dropped": self.server.cache.clear()})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def notify_ingest(server_url=SERVER_URL, timeout=2.0):
+    # Called by loaders after writing to Churches; a no-op when no server is configured
+    if not server_url:
+        return False
+    try:
+        req = urllib.request.Request(server_url.rstrip("/") + "/invalidate", data=b"", method="POST")
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status == 200
+    except OSError as e:
+        print(f"[serve] Could not invalidate query cache at {server_url}: {e}")
+        return False
+
+
+def serve(host=HOST, port=PORT, cache_size=CACHE_SIZE, ttl=CACHE_TTL, verbose=False):
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.collection = connect_to_db()
+    server.cache = ResultCache(cache_size, ttl)
+    server.latency = LatencyStats()
+    server.verbose = verbose
+    metrics.start()   # exports only when METRICS_DIR is set
+
+    # Pay connection setup and server selection once, before the first request
+    server.collection.database.client.admin.command("ping")
+    print(f"[serve] Listening on http://{host}:{port} (cache {cache_size} entries, ttl {ttl:.0f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.collection.database.client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve church queries over HTTP/JSON with a pooled client and result cache.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Result sets kept in the LRU cache.")
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL, help="Seconds a cached result stays valid.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.cache_size, args.ttl, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import gzip
+import heapq
+import io
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+from urllib.parse import urlparse
+
+import httpclient
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+MAX_PAGES      = 2000      # best-ranked page URLs kept per site
+MAX_SITEMAPS   = 50        # sitemap files fetched per site (index children included)
+MAX_DEPTH      = 3         # nested sitemap-index levels followed
+HOT_SEGMENTS   = {
+    "sermon": 10, "sermons": 10, "watch": 8, "live": 8, "livestream": 8,
+    "stream": 6, "streaming": 6, "video": 6, "videos": 6, "media": 6,
+    "messages": 6, "message": 5, "podcast": 3, "worship": 2, "online": 2,
+}
+COLD_SEGMENTS  = {"tag": -3, "category": -2, "author": -3, "feed": -4, "attachment": -4}
+ASSET_SUFFIX   = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp3", ".doc", ".docx", ".zip")
+RECENCY_BONUS  = 3.0       # added for a page modified today, halved every RECENCY_HALFLIFE days
+RECENCY_HALFLIFE = 180
+# ──────────────────────────────────────────────────────────── #
+
+_SPLIT = re.compile(r"[/\-_.]+")
+
+
+# ───── ranking ─────
+def _parse_lastmod(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    value = value.strip().replace("Z", "+00:00")
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            dt = datetime.strptime(value[:10], "%Y-%m-%d")
+        except ValueError:
+            return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def is_asset(url: str) -> bool:
+    return urlparse(url).path.lower().endswith(ASSET_SUFFIX)
+
+
+def score_url(url: str, lastmod: str | None = None, now: datetime | None = None) -> float:
+    path = urlparse(url).path.lower()
+    words = set(_SPLIT.split(path))
+    score = sum(HOT_SEGMENTS.get(w, 0) + COLD_SEGMENTS.get(w, 0) for w in words)
+
+    modified = _parse_lastmod(lastmod)
+    if modified:
+        age_days = max(0.0, ((now or datetime.now(timezone.utc)) - modified).days)
+        score += RECENCY_BONUS * 0.5 ** (age_days / RECENCY_HALFLIFE)
+    return score
+
+
+# ───── streaming reader ─────
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _open_body(raw):
+    body = raw if hasattr(raw, "peek") else io.BufferedReader(raw)
+    if body.peek(2)[:2] == b"\x1f\x8b":        # .xml.gz served as a file, not Content-Encoding
+        # mode given explicitly: GzipFile otherwise copies body.mode, which is
+        # an int when the body is the cache's own gzip reader
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    return body
+
+
+def read_sitemap(url: str) -> Iterator[tuple[str, str, str | None]]:
+    # → ("url" | "sitemap", loc, lastmod). Elements are cleared as soon as they
+    # close, so memory stays flat however many <url> entries the file has.
+    with httpclient.open_body(url) as (status, raw):
+        if status != 200:
+            print(f"[sitemap] {url} – HTTP {status}")
+            return
+        root = None
+        loc = lastmod = None
+        depth = 0
+        for event, elem in ET.iterparse(_open_body(raw), events=("start", "end")):
+            if root is None:
+                root = elem
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            name = _local(elem.tag)
+            # Only direct children of <url>/<sitemap> (depth 2) count: extension
+            # tags such as <image:image><image:loc> are nested one level deeper
+            if depth == 2 and name == "loc":
+                loc = (elem.text or "").strip()
+            elif depth == 2 and name == "lastmod":
+                lastmod = (elem.text or "").strip()
+            elif depth == 1 and name in ("url", "sitemap"):
+                if loc:
+                    yield name, loc, lastmod
+                loc = lastmod = None
+                root.clear()
+
+
+def iter_ranked_pages(
+    sitemap_urls: Iterable[str],
+    *,
+    limit: int = MAX_PAGES,
+    max_sitemaps: int = MAX_SITEMAPS,
+) -> Iterator[str]:
+    now = datetime.now(timezone.utc)
+    # sitemap files are visited best-first too, so video/sermon sitemaps in an
+    # index are read before tag or author sitemaps
+    frontier: list[tuple[float, int, str, int]] = []
+    seen_maps: set[str] = set()
+    for i, sm in enumerate(sitemap_urls):
+        heapq.heappush(frontier, (-score_url(sm), i, sm, 0))
+
+    best: list[tuple[float, int, str]] = []    # min-heap of the top `limit` pages
+    kept: set[str] = set()
+    seq = 0
+    fetched = 0
+
+    while frontier and fetched < max_sitemaps:
+        _, _, sm, depth = heapq.heappop(frontier)
+        if sm in seen_maps:
+            continue
+        seen_maps.add(sm)
+        fetched += 1
+        try:
+            for kind, loc, lastmod in read_sitemap(sm):
+                seq += 1
+                if kind == "sitemap":
+                    if depth < MAX_DEPTH and loc not in seen_maps:
+                        heapq.heappush(frontier, (-score_url(loc, lastmod, now), seq, loc, depth + 1))
+                    continue
+                if loc in kept or is_asset(loc):
+                    continue
+                item = (score_url(loc, lastmod, now), -seq, loc)
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                    kept.add(loc)
+                elif item > best[0]:
+                    kept.discard(heapq.heapreplace(best, item)[2])
+                    kept.add(loc)
+        except Exception as e:
+            print(f"[sitemap] error {sm} – {e}")
+
+    # highest score first; ties keep sitemap file order
+    for _, _, loc in sorted(best, reverse=True):
+        yield loc
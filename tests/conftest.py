@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The scripts are flat top-level modules run from the repo root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        route = self.server.routes.get(self.path)
+        if route is None:
+            status, headers, body = 404, {}, b"not found"
+        else:
+            status, headers, body = route(self.headers) if callable(route) else route
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer(ThreadingHTTPServer):
+    # routes: path -> (status, headers, body), or a callable(request headers) returning one
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.routes: dict = {}
+        self.requests: list[tuple[str, dict]] = []
+        self.origin = f"http://127.0.0.1:{self.server_port}"
+
+    def url(self, path: str) -> str:
+        return self.origin + path
+
+
+@pytest.fixture
+def server():
+    srv = LocalServer()
+    threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def http_cache(tmp_path, monkeypatch):
+    # httpclient with a fresh on-disk cache under tmp_path
+    import httpclient
+    from httpcache import HttpCache
+
+    cache = HttpCache(str(tmp_path / "http"))
+    monkeypatch.setattr(httpclient, "CACHE_ENABLED", True)
+    monkeypatch.setattr(httpclient, "_cache", cache)
+    yield cache
+    httpclient.close()
+
+
+@pytest.fixture
+def no_http_cache(monkeypatch):
+    # httpclient as run with HTTP_CACHE=0
+    import httpclient
+
+    monkeypatch.setattr(httpclient, "CACHE_ENABLED", False)
+    monkeypatch.setattr(httpclient, "_cache", None)
+    yield
+    httpclient.close()
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("yt_dlp")
+import channelids  # noqa: E402
+
+
+@pytest.mark.parametrize("message, permanent", [
+    ("ERROR: [youtube:tab] @gone: This channel does not exist.", True),
+    ("ERROR: [youtube] abcdefghijk: Private video. Sign in if you've been granted access", True),
+    ("ERROR: [youtube] abcdefghijk: This video has been removed by the uploader", True),
+    ("ERROR: [youtube:tab] @x: HTTP Error 404: Not Found", True),
+    ("ERROR: [youtube] abcdefghijk: This video is temporarily unavailable", False),
+    ("ERROR: [youtube] abcdefghijk: Video unavailable. This content isn't available, try again later.", False),
+    ("ERROR: [youtube] abcdefghijk: Sign in to confirm you're not a bot", False),
+    ("ERROR: [youtube:tab] @x: HTTP Error 429: Too Many Requests", False),
+    ("ERROR: Unable to download webpage: <urlopen error timed out>", False),
+])
+def test_only_dead_urls_are_permanent(message, permanent):
+    assert channelids.is_permanent(message) is permanent
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import pytest
+
+import churchfields
+from queryMongo import build_filter
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1,000 - 2,000", (1000, 2000, None)),
+    ("2000+", (2000, None, "open_ended")),
+    ("500–100", (100, 500, None)),          # en dash, reversed bounds
+    ("75", (75, 75, None)),
+    ("N/A", (None, None, "missing")),
+    (None, (None, None, "missing")),
+    ("about 50", (None, None, "unparseable")),
+])
+def test_parse_size(raw, expected):
+    assert churchfields.parse_size(raw) == expected
+
+
+def test_normalize_languages():
+    assert churchfields.normalize_languages("English, Spanish;  Korean /english") == ["english", "spanish", "korean"]
+    assert churchfields.normalize_languages(["English", "n/a", ""]) == ["english"]
+    assert churchfields.normalize_languages(None) == []
+
+
+def test_denomination_key_and_family():
+    key = churchfields.denomination_key("Southern&nbsp;Baptist<br>Convention!!")
+    assert key == "southern baptist convention"
+    assert churchfields.denomination_family(key) == "baptist"
+    assert churchfields.denomination_family(churchfields.denomination_key("The Episcopal Church")) == "anglican"
+    assert churchfields.denomination_family("quaker") == "other"
+    assert churchfields.denomination_key("Error") is None
+    assert churchfields.denomination_family(None) is None
+
+
+def test_derived_fields_sets_and_unsets_size_flag():
+    update = churchfields.derived_fields({"Size": "100-200", "Language": "English", "Denomination": "Lutheran"})
+    assert update["$set"]["languages"] == ["english"]
+    assert update["$set"]["denomination_family"] == "lutheran"
+    assert update["$unset"] == {"size_flag": ""}
+    assert churchfields.derived_fields({"Size": "500+"})["$set"]["size_flag"] == "open_ended"
+
+
+def test_default_match_keeps_substring_denomination():
+    match_stage, collation = build_filter(denomination="baptist")
+    assert match_stage == {"Denomination": {"$regex": "baptist", "$options": "i"}}
+    assert collation is None
+
+
+def test_prefix_match_requires_every_language():
+    match_stage, _ = build_filter(language="Eng, Span", match="prefix")
+    assert match_stage["languages"] == {"$all": [{"$elemMatch": {"$regex": "^eng"}},
+                                                 {"$elemMatch": {"$regex": "^span"}}]}
+    assert build_filter(language="Eng", match="prefix")[0]["languages"] == {"$regex": "^eng"}
+
+
+def test_prefix_filter_runs_against_a_collection():
+    mongomock = pytest.importorskip("mongomock")
+    churches = mongomock.MongoClient()["Sermons"]["Churches"]
+    churches.insert_many([
+        {"_id": 1, "languages": ["english", "spanish"]},
+        {"_id": 2, "languages": ["english"]},
+        {"_id": 3, "languages": ["spanish", "korean"]},
+    ])
+    match_stage, _ = build_filter(language="eng, spa", match="prefix")
+    assert [d["_id"] for d in churches.find(match_stage)] == [1]
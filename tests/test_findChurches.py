@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import contextlib
+import csv
+import types
+
+import pytest
+
+import findChurches
+from ratelimit import AdaptiveRateLimiter
+
+EMPTY = b'<html><body><p class="empty">No results found.</p></body></html>'
+
+
+def listing(page: int) -> bytes:
+    rows = "".join(f'<li><a href="/church/{page}-{k}">Church {page}-{k}</a></li>' for k in range(3))
+    return f"<html><body><ul>{rows}</ul></body></html>".encode()
+
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    # findChurches.main against a fake directory: pages[n] is the body of page
+    # n, or a count of failures to return before it serves a listing
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(findChurches, "base_url", "https://dir.org/search?page=")
+    monkeypatch.setattr(findChurches, "tag_selector", "/church/")
+    monkeypatch.setattr(findChurches, "empty_tag_selector", "p.empty")
+    monkeypatch.setattr(findChurches, "MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(findChurches, "limiter", AdaptiveRateLimiter(1000, max_rate=1000, burst=8))
+    pages: dict = {}
+
+    def fetch(url):
+        n = int(url.rsplit("=", 1)[1])
+        body = pages.get(n, EMPTY)
+        if isinstance(body, int):
+            if body:
+                pages[n] = body - 1
+                return types.SimpleNamespace(status=503, elapsed=0.01)
+            body = listing(n)
+        return types.SimpleNamespace(status=200, content=body, final_url=url, elapsed=0.01)
+    monkeypatch.setattr(findChurches.httpclient, "fetch", fetch)
+    return pages
+
+
+def written(tmp_path) -> list[str]:
+    with open(tmp_path / findChurches.output_file, newline="", encoding="utf-8") as f:
+        return [row[1] for row in list(csv.reader(f))[1:]]
+
+
+def test_a_failing_page_is_skipped_then_retried(directory, tmp_path, capsys):
+    # 7 pages: the search probes 1, 2, 4, 8, 6, 7, so 3 and 5 come from the sweep
+    directory.update({n: listing(n) for n in (1, 2, 4, 6, 7)})
+    directory[3] = 1            # fails once, served on the retry pass
+    directory[5] = 99           # fails every time
+    findChurches.main()
+
+    urls = written(tmp_path)
+    assert {u.split("/")[-1].split("-")[0] for u in urls} == {"1", "2", "3", "4", "6", "7"}
+    assert "Gave up on 1 pages, their churches are missing: [5]" in capsys.readouterr().out
+
+
+def test_empty_directory_does_not_start_the_browser(directory, tmp_path, monkeypatch):
+    monkeypatch.setattr(findChurches, "get_pool", lambda: pytest.fail("browser started"))
+    findChurches.main()
+    assert written(tmp_path) == []
+
+
+def test_listing_missing_from_html_uses_the_browser(directory, tmp_path, monkeypatch):
+    directory[1] = b"<html><body><div id='app'></div></body></html>"
+
+    @contextlib.contextmanager
+    def lease():
+        yield None
+    monkeypatch.setattr(findChurches, "get_pool", lambda: types.SimpleNamespace(lease=lease, size=2))
+    monkeypatch.setattr(findChurches, "render_page",
+                        lambda driver, n: [(f"Church {n}", f"https://dir.org/church/{n}")] if n <= 2 else None)
+    findChurches.main()
+    assert written(tmp_path) == ["https://dir.org/church/1", "https://dir.org/church/2"]
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import gzip
+
+import pytest
+
+import httpclient
+from httpcache import HttpCache
+
+PAGE = b"<html><body>" + b"sermon " * 2000 + b"</body></html>"
+
+
+def _etag_route(etag='"v1"', body=PAGE):
+    # 304 when the client sends the current validator
+    def route(headers):
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"Content-Type": "text/html", "ETag": etag, "Cache-Control": "no-cache"}, body
+    return route
+
+
+def test_fetch_revalidates_with_etag(server, http_cache):
+    server.routes["/page"] = _etag_route()
+    first = httpclient.fetch(server.url("/page"))
+    second = httpclient.fetch(server.url("/page"))
+
+    assert first.content == second.content == PAGE
+    assert "If-None-Match" not in server.requests[0][1]
+    assert server.requests[1][1]["If-None-Match"] == '"v1"'
+    stats = http_cache.stats()
+    assert stats["revalidated"] == 1 and stats["misses"] == 1
+
+
+def test_fetch_changed_body_replaces_entry(server, http_cache):
+    server.routes["/page"] = _etag_route('"v1"', b"old")
+    httpclient.fetch(server.url("/page"))
+    server.routes["/page"] = _etag_route('"v2"', b"new")
+    assert httpclient.fetch(server.url("/page")).content == b"new"
+    assert http_cache.lookup(server.url("/page")).etag == '"v2"'
+
+
+def test_fresh_entry_is_served_without_a_request(server, http_cache):
+    server.routes["/page"] = (200, {"Cache-Control": "max-age=600"}, PAGE)
+    httpclient.fetch(server.url("/page"))
+    assert httpclient.fetch(server.url("/page")).content == PAGE
+    assert len(server.requests) == 1
+    assert http_cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("headers, cacheable", [
+    ({"ETag": '"a"'}, True),
+    ({"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, True),
+    ({"Cache-Control": "max-age=60"}, True),
+    ({"ETag": '"a"', "Cache-Control": "no-store"}, False),
+    ({}, False),                        # nothing to revalidate with, no lifetime
+])
+def test_cacheable(tmp_path, headers, cacheable):
+    cache = HttpCache(str(tmp_path))
+    assert cache.cacheable(200, headers) is cacheable
+    assert cache.cacheable(404, headers) is False
+    cache.close()
+
+
+def test_eviction_keeps_newest(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=1)
+    cache.store("http://a/1", "http://a/1", 200, {"ETag": '"1"'}, [b"x" * 1000])
+    cache.store("http://a/2", "http://a/2", 200, {"ETag": '"2"'}, [b"y" * 1000])
+    assert cache.lookup("http://a/1") is None
+    assert cache.read(cache.lookup("http://a/2")) == b"y" * 1000
+    cache.close()
+
+
+@pytest.mark.parametrize("validators", [True, False])
+def test_open_body_reads_to_eof_either_way(server, http_cache, validators):
+    # the cached (spooled) and uncached (streamed) branches behave the same,
+    # including a read after EOF, which iterparse does
+    headers = {"ETag": '"s"'} if validators else {}
+    server.routes["/s.xml.gz"] = (200, headers, gzip.compress(PAGE))
+    with httpclient.open_body(server.url("/s.xml.gz")) as (status, body):
+        assert status == 200
+        assert gzip.decompress(body.read()) == PAGE
+        assert not body.closed          # urllib3 closes resp.raw itself at EOF
+        assert body.read() == b""
+    assert (http_cache.lookup(server.url("/s.xml.gz")) is not None) is validators
+
+
+def test_open_body_without_cache_decodes_content_encoding(server, no_http_cache):
+    server.routes["/s.xml"] = (200, {"Content-Encoding": "gzip"}, gzip.compress(PAGE))
+    with httpclient.open_body(server.url("/s.xml")) as (status, body):
+        chunks = iter(lambda: body.read(1000), b"")
+        assert b"".join(chunks) == PAGE
+        assert not body.closed
+        assert body.read(1000) == b""
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import csv
+import sys
+import types
+from collections import Counter
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+import loadMongo  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()["Sermons"]
+
+
+def test_unique_url_index_on_clean_collection(db):
+    db.Churches.insert_many([{"URL": "https://d/1"}, {"URL": "https://d/2"}, {"ChurchName": "no url"}])
+    loadMongo.ensure_indexes(db)
+    info = db.Churches.index_information()
+    assert info["url_unique"]["unique"]
+
+
+def test_duplicate_urls_are_reported_not_fatal(db, capsys):
+    db.Churches.insert_many([{"URL": "https://d/1"}, {"URL": "https://d/1"}, {"URL": "https://d/2"}])
+    loadMongo.ensure_indexes(db)          # used to raise DuplicateKeyError
+    info = db.Churches.index_information()
+    assert "url_unique" not in info and "url_unique_pending" in info
+    assert "https://d/1" in capsys.readouterr().out
+
+
+def test_link_ops_resolve_a_batch_at_a_time(tmp_path, monkeypatch):
+    calls = []
+
+    class Cache:
+        def resolve_many(self, urls, probe=True):
+            calls.append(len(urls))
+            return {u: "UC" + u[-22:].rjust(22, "x") for u in urls}
+
+        def close(self):
+            pass
+
+    # link_ops imports channelids lazily; this stands in for its cache (and yt_dlp)
+    monkeypatch.setitem(sys.modules, "channelids", types.SimpleNamespace(ChannelIdCache=Cache))
+    path = tmp_path / "links.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Page", "Links"])
+        for n in range(25):
+            writer.writerow([f"https://church{n}.org/watch", f"https://www.youtube.com/@c{n}"])
+
+    ops = list(loadMongo.link_ops(str(path), Counter(), batch_size=10))
+    assert calls == [10, 10, 5]
+    assert len(ops) == 50                 # a Channels upsert and a Churches update per page
+
+
+def test_transcripts_come_from_store_and_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    import transcriptstore
+
+    store = tmp_path / "transcripts"
+    writer = transcriptstore.TranscriptWriter(str(store), video_index={"v1": ("UCa", None)})
+    writer.add("v1", [{"text": "from the store", "start": 0, "duration": 1}])
+    writer.flush()
+    csv_path = tmp_path / "transcripts.csv"
+    csv_path.write_text("Video ID,Transcript\nold,from the csv\nv1,stale copy\nbad,Error: disabled\n",
+                        encoding="utf-8")
+
+    skipped = Counter()
+    ops = list(loadMongo.transcript_ops(skipped, str(store), str(csv_path)))
+    texts = {op._filter["_id"]: op._doc["$set"]["text"] for op in ops}
+    assert texts == {"v1": "from the store", "old": "from the csv"}
+    assert skipped["invalid"] == 1
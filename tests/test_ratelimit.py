@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import pytest
+
+import ratelimit
+from ratelimit import AdaptiveRateLimiter, backoff_delay
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # time.monotonic / time.sleep as seen by ratelimit; sleeping advances it
+    now = [1000.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(ratelimit.time, "sleep", sleep)
+    return now, slept
+
+
+def test_additive_increase_up_to_max_rate(clock):
+    limiter = AdaptiveRateLimiter(1.0, max_rate=1.2, increase=0.05)
+    for _ in range(3):
+        limiter.on_success(0.1)
+    assert limiter.rate == pytest.approx(1.15)
+    for _ in range(10):
+        limiter.on_success(0.1)
+    assert limiter.rate == 1.2
+
+
+def test_slow_responses_trim_the_rate(clock):
+    limiter = AdaptiveRateLimiter(2.0, target_latency=1.0)
+    limiter.on_success(3.0)
+    assert limiter.rate == pytest.approx(1.8)
+    limiter.on_success(0.5)
+    assert limiter.rate == pytest.approx(1.85)
+
+
+def test_multiplicative_decrease_once_per_cooldown(clock):
+    now, _ = clock
+    limiter = AdaptiveRateLimiter(8.0, decrease=0.5, cooldown=5.0, min_rate=1.5)
+    for _ in range(4):                  # one 429 burst seen by four workers
+        limiter.on_throttle()
+    assert limiter.rate == 4.0 and limiter.throttled == 4
+    now[0] += 5.0
+    limiter.on_throttle()
+    assert limiter.rate == 2.0
+    now[0] += 5.0
+    limiter.on_throttle()
+    assert limiter.rate == 1.5          # floored at min_rate
+
+
+def test_acquire_spends_the_burst_then_paces_at_the_rate(clock):
+    now, slept = clock
+    limiter = AdaptiveRateLimiter(2.0, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+    assert slept == []
+    started = now[0]
+    for _ in range(4):
+        limiter.acquire()
+    assert now[0] - started == pytest.approx(2.0)     # 4 more at 2 req/s
+
+
+def test_throttle_empties_the_bucket(clock):
+    _, slept = clock
+    limiter = AdaptiveRateLimiter(4.0, burst=4)
+    limiter.on_throttle()
+    limiter.acquire()
+    assert sum(slept) == pytest.approx(0.5)           # a token at the halved rate
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    delays = [backoff_delay(10, base=1.0, cap=60.0) for _ in range(200)]
+    assert all(0 <= d <= 60.0 for d in delays)
+    assert len(set(delays)) > 1
+    assert backoff_delay(0, base=0.0) == 0.0
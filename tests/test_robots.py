@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import types
+
+import pytest
+
+import robots
+
+ROBOTS = """
+User-agent: *
+Disallow: /
+
+User-agent: ChurchTopicsBot/1.0
+Disallow: /private/
+Allow: /private/sermons/
+Disallow: /*?replytocom=
+Disallow: /*.pdf$
+Allow: /wp-admin/admin-ajax.php
+Disallow: /wp-admin/
+Crawl-delay: 120
+
+Sitemap: https://church.org/sitemap.xml
+"""
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("/", True),
+    ("/private/notes", False),
+    ("/private/sermons/easter", True),        # longer Allow wins
+    ("/blog/post?replytocom=5", False),
+    ("/bulletin.pdf", False),
+    ("/bulletin.pdf?v=2", True),              # $ anchors the end
+    ("/wp-admin/admin-ajax.php", True),
+    ("/wp-admin/options.php", False),
+    ("/robots.txt", True),
+])
+def test_our_group_is_matched_longest_rule_first(path, allowed):
+    rules = robots.parse(ROBOTS, agent="churchtopicsbot")
+    assert rules.allowed("https://church.org" + path) is allowed
+
+
+def test_group_details():
+    rules = robots.parse(ROBOTS, agent="churchtopicsbot")
+    assert rules.crawl_delay == robots.MAX_CRAWL_DELAY
+    assert rules.sitemaps == ["https://church.org/sitemap.xml"]
+    assert not robots.parse(ROBOTS, agent="otherbot").allowed("https://church.org/")
+    assert robots.parse("User-agent: *\nDisallow:\n").allowed("https://church.org/anything")
+
+
+def test_allow_wins_an_identical_pattern():
+    rules = robots.parse("User-agent: *\nDisallow: /a\nAllow: /a\nDisallow: /b*\nAllow: /b*\n")
+    assert rules.allowed("https://x.org/a") and rules.allowed("https://x.org/bc")
+
+
+@pytest.fixture
+def fetched(tmp_path, monkeypatch):
+    # robots.txt responses by origin; each fetch is counted
+    responses, calls = {}, []
+    monkeypatch.setattr(robots, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(robots, "_memory", {})
+
+    def fetch(url):
+        calls.append(url)
+        result = responses[url]
+        if isinstance(result, Exception):
+            raise result
+        status, text = result
+        return types.SimpleNamespace(status=status, text=text)
+    monkeypatch.setattr(robots.httpclient, "fetch", fetch)
+    return responses, calls
+
+
+def test_4xx_is_cached_as_allow_all(fetched):
+    responses, calls = fetched
+    responses["https://a.org/robots.txt"] = (404, "")
+    assert robots.rules_for("https://a.org/page").allowed("https://a.org/page")
+    robots._memory.clear()
+    assert not robots.rules_for("https://a.org/").unreachable
+    assert len(calls) == 1                                  # second answer came from disk
+
+
+@pytest.mark.parametrize("failure", [(503, "down"), OSError("connection refused")])
+def test_5xx_and_errors_disallow_briefly(fetched, monkeypatch, failure):
+    responses, calls = fetched
+    responses["https://b.org/robots.txt"] = failure
+    rules = robots.rules_for("https://b.org/")
+    assert rules.unreachable and not rules.allowed("https://b.org/sermons")
+    assert robots.rules_for("https://b.org/") is rules     # not refetched within ERROR_TTL
+
+    now = robots.time.time()
+    monkeypatch.setattr(robots.time, "time", lambda: now + robots.ERROR_TTL + 1)
+    responses["https://b.org/robots.txt"] = (200, "User-agent: *\nDisallow: /admin/\n")
+    rules = robots.rules_for("https://b.org/")
+    assert not rules.unreachable and rules.allowed("https://b.org/sermons")
+    assert len(calls) == 2
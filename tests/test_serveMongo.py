@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+import serveMongo  # noqa: E402
+from serveMongo import LatencyStats, QueryHandler, ResultCache  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(serveMongo.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_cache_hit_miss_and_ttl_expiry(clock):
+    cache = ResultCache(size=4, ttl=60)
+    assert cache.get("a") is None
+    cache.put("a", {"count": 1})
+    assert cache.get("a") == {"count": 1}
+    clock[0] += 61
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 0)
+
+
+def test_cache_evicts_least_recently_used(clock):
+    cache = ResultCache(size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")                  # b is now the oldest
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+@pytest.fixture
+def service():
+    churches = mongomock.MongoClient()["Sermons"]["Churches"]
+    churches.insert_many([
+        {"ChurchName": "First Baptist", "Denomination": "Southern Baptist", "Language": "English"},
+        {"ChurchName": "St Mary", "Denomination": "Roman Catholic", "Language": "English, Spanish"},
+    ])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), QueryHandler)
+    server.daemon_threads = True
+    server.collection = churches
+    server.cache = ResultCache(16, 300)
+    server.latency = LatencyStats()
+    server.verbose = False
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    server.base = f"http://127.0.0.1:{server.server_port}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path):
+    with urllib.request.urlopen(server.base + path, timeout=5) as resp:
+        return resp.status, json.loads(resp.read())
+
+
+def test_round_trip_is_cached_until_ingest(service):
+    path = "/churches?denomination=baptist&returns=name,url"
+    status, body = get(service, path)
+    assert status == 200
+    assert body == {"count": 1, "churches": [{"name": "First Baptist", "url": None}], "cached": False}
+
+    service.collection.insert_one({"ChurchName": "Grace Baptist", "Denomination": "Baptist"})
+    body = get(service, path)[1]
+    assert body["cached"] is True and body["count"] == 1     # stale until the loader says otherwise
+
+    assert serveMongo.notify_ingest(service.base) is True
+    body = get(service, path)[1]
+    assert body["cached"] is False and body["count"] == 2
+    assert get(service, "/stats")[1]["cache"]["invalidations"] == 1
+
+
+def test_bad_query_is_a_400(service):
+    with pytest.raises(urllib.error.HTTPError) as err:
+        get(service, "/churches?returns=nope")
+    assert err.value.code == 400
+
+
+def test_notify_ingest_without_a_server_is_a_no_op():
+    assert serveMongo.notify_ingest(None) is False
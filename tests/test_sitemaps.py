@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import gzip
+from datetime import datetime, timezone
+
+import pytest
+
+import sitemaps
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+IMAGE_NS = 'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1"'
+
+
+def urlset(*locs: str) -> bytes:
+    body = "".join(
+        f"<url><loc>{loc}</loc><lastmod>2024-05-01</lastmod>"
+        f"<image:image><image:loc>{loc}/cover.jpg</image:loc></image:image></url>"
+        for loc in locs
+    )
+    return f'<?xml version="1.0"?><urlset {NS} {IMAGE_NS}>{body}</urlset>'.encode()
+
+
+def index(*locs: str) -> bytes:
+    body = "".join(f"<sitemap><loc>{loc}</loc></sitemap>" for loc in locs)
+    return f'<?xml version="1.0"?><sitemapindex {NS}>{body}</sitemapindex>'.encode()
+
+
+@pytest.fixture(params=["cache", "no cache"])
+def http_mode(request):
+    # every sitemap below is served without validators, so with the cache on
+    # it still takes the uncached (streamed) branch of open_body
+    return request.getfixturevalue("http_cache" if request.param == "cache" else "no_http_cache")
+
+
+def test_plain_and_gzipped_sitemaps(server, http_mode):
+    pages = [server.url(f"/sermons/page-{k}") for k in range(300)]
+    server.routes["/plain.xml"] = (200, {"Content-Type": "application/xml"}, urlset(*pages))
+    server.routes["/part.xml.gz"] = (200, {"Content-Type": "application/x-gzip"}, gzip.compress(urlset(*pages)))
+
+    for path in ("/plain.xml", "/part.xml.gz"):
+        entries = list(sitemaps.read_sitemap(server.url(path)))
+        assert [loc for _, loc, _ in entries] == pages
+        assert {kind for kind, _, _ in entries} == {"url"}
+        assert entries[0][2] == "2024-05-01"
+
+
+def test_gzipped_sitemap_read_back_from_cache(server, http_cache):
+    # with a validator the body is spooled to the cache and read back through
+    # the cache's own gzip reader, then revalidated on the second read
+    pages = [server.url(f"/sermons/page-{k}") for k in range(50)]
+    body = gzip.compress(urlset(*pages))
+
+    def route(headers):
+        if headers.get("If-None-Match") == '"s1"':
+            return 304, {"ETag": '"s1"'}, b""
+        return 200, {"Content-Type": "application/x-gzip", "ETag": '"s1"'}, body
+    server.routes["/part.xml.gz"] = route
+
+    for _ in range(2):
+        assert [loc for _, loc, _ in sitemaps.read_sitemap(server.url("/part.xml.gz"))] == pages
+    assert http_cache.stats()["revalidated"] == 1
+
+
+def test_nested_index_is_followed(server, http_mode, capsys):
+    server.routes["/sitemap.xml"] = (200, {}, index(server.url("/posts.xml")))
+    server.routes["/posts.xml"] = (200, {}, index(server.url("/posts-1.xml.gz"), server.url("/posts-2.xml")))
+    server.routes["/posts-1.xml.gz"] = (200, {}, gzip.compress(urlset(server.url("/sermons/a"))))
+    server.routes["/posts-2.xml"] = (200, {}, urlset(server.url("/about/b")))
+
+    pages = list(sitemaps.iter_ranked_pages([server.url("/sitemap.xml")]))
+    assert pages == [server.url("/sermons/a"), server.url("/about/b")]
+    assert "[sitemap] error" not in capsys.readouterr().out
+
+
+def test_image_loc_does_not_replace_page_url(server, no_http_cache):
+    server.routes["/s.xml"] = (200, {}, urlset(server.url("/watch/live")))
+    assert list(sitemaps.read_sitemap(server.url("/s.xml"))) == [
+        ("url", server.url("/watch/live"), "2024-05-01")]
+
+
+def test_missing_sitemap_yields_nothing(server, no_http_cache):
+    assert list(sitemaps.read_sitemap(server.url("/nope.xml"))) == []
+
+
+def test_score_url_ranks_sermons_over_tags():
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert sitemaps.score_url("https://a.org/sermons/easter", now=now) > \
+        sitemaps.score_url("https://a.org/tag/easter", now=now)
+    assert sitemaps.score_url("https://a.org/about", "2024-05-31", now) > \
+        sitemaps.score_url("https://a.org/about", "2019-01-01", now)
+    assert sitemaps.is_asset("https://a.org/bulletin.PDF")
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import csv
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+import topics  # noqa: E402
+
+SMALL = 2 ** 12
+TAXONOMY = {
+    "forgiveness": {"forgive": 2, "forgiveness": 3, "let go": 1},
+    "salvation": {"salvation": 3, "born again": 3},
+    "money": {"tithe": 3},
+}
+
+
+def test_sublinear_counts_and_bigrams_stay_inside_a_document():
+    counts = topics.hashed_counts(["grace grace grace", "peace"], SMALL)
+    assert counts[0].nnz == 2                          # "grace" and "grace grace"
+    unigram = topics._hash_tokens(["grace"])[0] % SMALL
+    assert counts[0, unigram] == pytest.approx(1 + np.log(3))
+    # "grace peace" would only exist if a bigram straddled the two transcripts
+    straddle = (topics._hash_tokens(["grace", "peace"]) * [topics.BIGRAM_MIX, 1]).sum() % SMALL
+    assert counts[1, straddle] == 0
+
+
+def test_scores_rank_the_matching_topic_first():
+    matrix = topics.topic_matrix(TAXONOMY, SMALL)
+    scores = topics.score([
+        "we forgive because we were forgiven, forgiveness lets us let go",
+        "you must be born again, salvation is a gift",
+        "the weather was lovely on saturday",
+    ], matrix)
+    assert scores.shape == (3, 3)
+    assert scores[0].argmax() == 0 and scores[1].argmax() == 1
+    assert scores[2].max() == 0
+    assert np.all(scores <= 1.0 + 1e-6)               # cosine
+
+
+def test_multi_word_terms_match_only_in_order():
+    matrix = topics.topic_matrix({"salvation": {"born again": 1}}, SMALL)
+    hit, miss = topics.score(["he was born again", "again he was born"], matrix)[:, 0]
+    assert hit > 0 and miss == 0
+
+
+def test_empty_transcripts_get_no_row():
+    topics._init_worker(TAXONOMY, SMALL)
+    ids, scores, empty = topics.score_chunk(["a", "b", "c"], ["tithe", " ", ""])
+    assert ids == ["a"] and scores.shape == (1, 3) and empty == ["b", "c"]
+
+
+def test_sink_resumes_and_starts_over_on_a_new_taxonomy(tmp_path):
+    out, idx = str(tmp_path / "scores.csv"), str(tmp_path / "scores.idx")
+    sink = topics.ScoreSink(list(TAXONOMY), "h1", out, idx)
+    sink.add(["a", "b"], np.array([[0.5, 0.1, 0], [0, 0, 0]], dtype=np.float32), empty=["e"])
+    sink.close()
+    with open(out, newline="") as f:
+        assert list(csv.reader(f))[1:] == [["a", "0.50000", "0.10000", "0.00000", "forgiveness"],
+                                           ["b", "0.00000", "0.00000", "0.00000", ""]]
+
+    again = topics.ScoreSink(list(TAXONOMY), "h1", out, idx)
+    assert again.done == {"a", "b", "e"}
+    assert again.add(["a"], np.ones((1, 3), dtype=np.float32)) == 0
+    again.close()
+    assert topics.ScoreSink(list(TAXONOMY), "h2", out, idx).done == set()
+
+
+def test_store_and_csv_are_scored_together_once(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import transcriptstore
+
+    monkeypatch.chdir(tmp_path)
+    writer = transcriptstore.TranscriptWriter(topics.TRANSCRIPT_DIR, video_index={})
+    writer.add("stored", [{"text": "forgive and let go", "start": 0, "duration": 1}])
+    writer.flush()
+    with open(topics.TRANSCRIPTS_CSV, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([["Video ID", "Transcript"], ["old", "pay the tithe"],
+                                 ["stored", "stale copy about money and the tithe"],
+                                 ["broken", "Error: TranscriptsDisabled"]])
+    monkeypatch.setattr(topics, "TAXONOMY", TAXONOMY)
+
+    topics.main(["--source", "parquet", "--workers", "1", "--output", "scores.csv"])
+    with open("scores.csv", newline="") as f:
+        rows = {r[0]: r[-1] for r in list(csv.reader(f))[1:]}
+    assert rows == {"stored": "forgiveness", "old": "money"}
+
+    topics.main(["--source", "parquet", "--workers", "1", "--output", "scores.csv"])
+    with open("scores.csv", newline="") as f:
+        assert len(list(csv.reader(f))) == 3           # header + the same two rows
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+import transcriptstore  # noqa: E402
+
+JAN_2024 = 1704067200 + 86400 * 10
+MAR_2024 = 1709251200 + 86400 * 3
+SEGMENTS = [{"text": "grace and peace", "start": 0, "duration": 2.5}, {"text": "to you", "start": 2.5, "duration": 1}]
+
+
+def write(root, rows, flushes=1):
+    index = {"v1": ("UCa", JAN_2024), "v2": ("UCa", MAR_2024), "v3": ("UCb", JAN_2024)}
+    writer = transcriptstore.TranscriptWriter(str(root), video_index=index)
+    for chunk in range(flushes):
+        for vid in rows[chunk::flushes]:
+            writer.add(vid, SEGMENTS)
+        writer.flush()
+    return writer
+
+
+def partitions(root):
+    return sorted(os.path.relpath(os.path.dirname(p), root) for p in transcriptstore.part_files(str(root)))
+
+
+def test_rows_are_partitioned_by_channel_and_month(tmp_path):
+    write(tmp_path, ["v1", "v2", "v3", "v9"])
+    assert partitions(tmp_path) == [
+        os.path.join("channel=UCa", "month=2024-01"),
+        os.path.join("channel=UCa", "month=2024-03"),
+        os.path.join("channel=UCb", "month=2024-01"),
+        os.path.join("channel=unknown", "month=unknown"),
+    ]
+    table = pq.ParquetFile(transcriptstore.part_files(str(tmp_path))[0]).read()
+    row = table.to_pylist()[0]
+    assert row["video_id"] == "v1"
+    assert row["text"] == "grace and peace to you"
+    assert [s["start"] for s in row["segments"]] == [0.0, 2.5]
+
+
+def test_readers_see_every_row_once(tmp_path):
+    write(tmp_path, ["v1", "v2", "v3"])
+    assert transcriptstore.count_rows(str(tmp_path)) == 3
+    assert transcriptstore.video_ids(str(tmp_path)) == {"v1", "v2", "v3"}
+    batches = transcriptstore.iter_batches(str(tmp_path), columns=["video_id", "channel"])
+    assert sorted((r["video_id"], r["channel"]) for b in batches for r in b.to_pylist()) == [
+        ("v1", "UCa"), ("v2", "UCa"), ("v3", "UCb")]
+
+
+def test_compact_merges_parts_per_partition(tmp_path):
+    write(tmp_path, ["x1", "x2", "x3"], flushes=3)   # three parts in channel=unknown
+    assert len(transcriptstore.part_files(str(tmp_path))) == 3
+    assert transcriptstore.compact(str(tmp_path)) == 3
+    files = transcriptstore.part_files(str(tmp_path))
+    assert len(files) == 1
+    assert sorted(pq.ParquetFile(files[0]).read(columns=["video_id"]).column(0).to_pylist()) == ["x1", "x2", "x3"]
+    assert not any(name.startswith(".") for name in os.listdir(os.path.dirname(files[0])))
+
+
+def _crash_after_merge(root):
+    # what a compact() killed between making the merged file visible and
+    # deleting the parts leaves behind
+    parts = transcriptstore.part_files(str(root))
+    folder = os.path.dirname(parts[0])
+    shutil.copy(parts[0], os.path.join(folder, "part-merged.parquet"))
+    with open(os.path.join(folder, transcriptstore.COMPACT_JOURNAL), "w", encoding="utf-8") as f:
+        json.dump({"merged": "part-merged.parquet", "parts": [os.path.basename(parts[0])]}, f)
+    return parts[0]
+
+
+def test_interrupted_compact_never_duplicates_rows(tmp_path):
+    write(tmp_path, ["v1"])
+    old = _crash_after_merge(tmp_path)
+    assert transcriptstore.count_rows(str(tmp_path)) == 1
+    assert transcriptstore.dataset(str(tmp_path)).count_rows() == 1
+
+    transcriptstore.compact(str(tmp_path))
+    assert not os.path.exists(old)
+    assert not os.path.exists(os.path.join(os.path.dirname(old), transcriptstore.COMPACT_JOURNAL))
+    assert transcriptstore.count_rows(str(tmp_path)) == 1
+
+
+def test_journal_without_merged_file_keeps_parts(tmp_path):
+    # crash before the merged file appeared: the parts are still the data
+    write(tmp_path, ["v1"])
+    part = transcriptstore.part_files(str(tmp_path))[0]
+    with open(os.path.join(os.path.dirname(part), transcriptstore.COMPACT_JOURNAL), "w", encoding="utf-8") as f:
+        json.dump({"merged": "part-never-written.parquet", "parts": [os.path.basename(part)]}, f)
+    assert transcriptstore.part_files(str(tmp_path)) == [part]
+    transcriptstore.compact(str(tmp_path))
+    assert transcriptstore.part_files(str(tmp_path)) == [part]
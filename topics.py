@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+from typing import Iterable, Iterator
+
+import numpy as np
+import scipy.sparse as sp
+
+import metrics
+
+try:
+    import pyarrow.parquet as pq
+    import transcriptstore
+except ImportError:  # pyarrow not installed: transcripts come from the CSV
+    transcriptstore = None
+
+# Topic scores for every stored transcript. Each chunk of transcripts becomes
+# a sparse hashed term matrix (unigrams + bigrams, sublinear TF) and is scored
+# against every topic in one sparse matmul; chunks run in a process pool and
+# scores are appended as they come back, so neither the corpus nor the scores
+# are ever held in memory at once. Changing the taxonomy starts a new score
+# file; otherwise a rerun only scores transcripts not scored yet.
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+TRANSCRIPTS_CSV  = "transcripts.csv"          # transcripter.py --format csv
+TRANSCRIPT_DIR   = "transcripts"              # transcripter.py --format parquet
+TAXONOMY_FILE    = os.getenv("TOPIC_TAXONOMY")   # JSON {topic: {term: weight}}; built-in if unset
+OUTPUT_FILE      = "topic_scores.csv"
+INDEX_FILE       = "topic_scores.idx"         # taxonomy fingerprint, then one handled video ID per line
+N_FEATURES       = 2 ** 20    # hashed feature columns
+CHUNK_SIZE       = 500        # transcripts per task
+WORKERS          = int(os.getenv("TOPIC_WORKERS", str(os.cpu_count() or 2)))
+CHECKPOINT_EVERY = 5000       # rows between fsync'd checkpoints
+# ──────────────────────────────────────────────────────────── #
+
+# topic -> {term: weight}; a term of several words matches as consecutive bigrams
+TAXONOMY = {
+    "forgiveness": {"forgive": 2, "forgiven": 2, "forgiveness": 3, "forgiving": 2, "pardon": 1,
+                    "reconcile": 1, "reconciliation": 2, "mercy": 1, "let go": 1, "bitterness": 1},
+    "hope": {"hope": 3, "hopeful": 2, "future": 1, "promise": 1, "promises": 1, "trust": 1,
+             "anchor": 1, "expectation": 1, "wait on": 1, "new day": 1},
+    "grace": {"grace": 3, "gracious": 2, "unmerited": 2, "undeserved": 2, "gift": 1, "favor": 1},
+    "faith": {"faith": 3, "believe": 2, "belief": 1, "faithful": 1, "doubt": 1, "trust god": 2},
+    "prayer": {"pray": 2, "prayer": 3, "prayers": 2, "praying": 2, "intercede": 1, "fasting": 1},
+    "love": {"love": 2, "loved": 1, "loving": 1, "compassion": 2, "kindness": 1, "neighbor": 1,
+             "love one another": 3},
+    "suffering": {"suffering": 3, "suffer": 2, "pain": 1, "grief": 2, "trial": 1, "trials": 1,
+                  "hardship": 1, "lament": 2, "tears": 1},
+    "salvation": {"saved": 2, "salvation": 3, "savior": 2, "cross": 1, "born again": 3,
+                  "eternal life": 3, "redeemed": 2, "redemption": 2},
+    "repentance": {"repent": 3, "repentance": 3, "confess": 2, "confession": 2, "turn away": 1, "sin": 1},
+    "family": {"marriage": 2, "husband": 1, "wife": 1, "children": 1, "parents": 1, "family": 2,
+               "father": 1, "mother": 1},
+    "stewardship": {"money": 2, "giving": 2, "tithe": 3, "generosity": 2, "generous": 1,
+                    "steward": 2, "stewardship": 3, "wealth": 1, "debt": 1},
+    "worship": {"worship": 3, "praise": 2, "sing": 1, "glorify": 1, "adoration": 1, "hallelujah": 1},
+    "fear": {"fear": 2, "afraid": 2, "anxiety": 3, "anxious": 2, "worry": 2, "peace": 1, "do not fear": 2},
+    "justice": {"justice": 3, "injustice": 2, "oppressed": 2, "poor": 1, "righteousness": 1, "widow": 1,
+                "orphan": 1},
+    "mission": {"gospel": 1, "mission": 2, "disciples": 2, "nations": 1, "evangelism": 3, "witness": 1,
+                "great commission": 3},
+}
+
+TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+BIGRAM_MIX = 1_000_003      # (h(a) * BIGRAM_MIX + h(b)) mod N_FEATURES
+
+
+# ───── vectorising ─────
+def _hash_tokens(tokens: list[str]) -> np.ndarray:
+    # crc32 is stable across processes and runs, unlike hash(). Each distinct
+    # word is hashed once; the per-token lookups stay in C (map + dict.__getitem__).
+    code = {w: zlib.crc32(w.encode()) for w in dict.fromkeys(tokens)}
+    return np.fromiter(map(code.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+
+
+def hashed_counts(texts: list[str], n_features: int = N_FEATURES) -> sp.csr_matrix:
+    # → docs × n_features matrix of sublinear term frequencies, 1 + log(tf)
+    tokenized = [TOKEN.findall(text.lower()) for text in texts]
+    lengths = np.fromiter(map(len, tokenized), dtype=np.int64, count=len(texts))
+    codes = _hash_tokens(list(chain.from_iterable(tokenized)))
+    doc = np.repeat(np.arange(len(texts), dtype=np.int32), lengths)
+
+    # bigrams never straddle two transcripts
+    same_doc = doc[:-1] == doc[1:]
+    bigrams = (codes[:-1][same_doc] * BIGRAM_MIX + codes[1:][same_doc]) % n_features
+    rows = np.concatenate([doc, doc[:-1][same_doc]])
+    cols = np.concatenate([codes % n_features, bigrams]).astype(np.int32)
+
+    # duplicates are summed on conversion, giving the counts
+    counts = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                           shape=(len(texts), n_features))
+    counts.sum_duplicates()
+    np.log(counts.data, out=counts.data)
+    counts.data += 1
+    return counts
+
+
+def topic_matrix(taxonomy: dict[str, dict[str, float]], n_features: int = N_FEATURES) -> sp.csr_matrix:
+    # → n_features × topics, each column L2-normalised, so a score is the cosine
+    # between a transcript and the topic's weighted terms
+    feats, topics, weights = [], [], []
+    for t, terms in enumerate(taxonomy.values()):
+        for term, weight in terms.items():
+            words = TOKEN.findall(term.lower())
+            if not words:
+                continue
+            codes = _hash_tokens(words)
+            if len(words) == 1:
+                term_feats = codes % n_features
+            else:
+                term_feats = (codes[:-1] * BIGRAM_MIX + codes[1:]) % n_features
+            feats += term_feats.tolist()
+            topics += [t] * len(term_feats)
+            weights += [float(weight) / len(term_feats)] * len(term_feats)
+    matrix = sp.csr_matrix((np.array(weights, dtype=np.float32), (feats, topics)),
+                           shape=(n_features, len(taxonomy)))
+    matrix.sum_duplicates()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    return (matrix @ sp.diags(1 / norms)).tocsr()
+
+
+def score(texts: list[str], topics: sp.csr_matrix) -> np.ndarray:
+    # → docs × topics cosine scores, all topics in one sparse matmul
+    counts = hashed_counts(texts, topics.shape[0])
+    norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (counts @ topics).toarray() / norms[:, None]
+
+
+# ───── workers ─────
+_topics: sp.csr_matrix | None = None
+
+
+def _init_worker(taxonomy: dict, n_features: int) -> None:
+    global _topics
+    _topics = topic_matrix(taxonomy, n_features)
+
+
+def score_chunk(ids: list[str], texts: list[str]) -> tuple[list[str], np.ndarray, list[str]]:
+    # → (scored IDs, scores, empty IDs); an empty transcript gets no all-zero row
+    empty = [vid for vid, text in zip(ids, texts) if not text or text.isspace()]
+    if empty:
+        kept = [(vid, text) for vid, text in zip(ids, texts) if text and not text.isspace()]
+        ids, texts = [vid for vid, _ in kept], [text for _, text in kept]
+    if not texts:
+        return ids, np.zeros((0, _topics.shape[1]), dtype=np.float32), empty
+    return ids, score(texts, _topics).astype(np.float32), empty
+
+
+def score_row_group(path: str, row_group: int, rows: list[int]) -> tuple[list[str], np.ndarray, list[str]]:
+    # The worker reads its own slice of the store, keeps the rows still to be
+    # scored, and only scores cross back
+    table = pq.ParquetFile(path, memory_map=True).read_row_group(row_group, columns=["video_id", "text"])
+    if len(rows) < table.num_rows:
+        table = table.take(rows)
+    ids = table.column("video_id").to_pylist()
+    texts = [t or "" for t in table.column("text").to_pylist()]
+    return score_chunk(ids, texts)
+
+
+# ───── sources ─────
+def store_tasks(root: str, done: set[str]) -> Iterator[tuple]:
+    # One task per row group with anything left to score. Only the video_id
+    # column is read here; a row group whose IDs are all done costs no worker.
+    for path in transcriptstore.part_files(root):
+        parquet = pq.ParquetFile(path)
+        for group in range(parquet.num_row_groups):
+            ids = parquet.read_row_group(group, columns=["video_id"]).column("video_id").to_pylist()
+            rows = [i for i, vid in enumerate(ids) if vid not in done]
+            if rows:
+                yield score_row_group, path, group, rows
+
+
+def csv_tasks(path: str, done: set[str], chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))  # a two-hour sermon is a long field
+    ids, texts = [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            # transcripts.csv written before the status file existed holds errors inline
+            if len(row) < 2 or row[0] in done or row[1].startswith("Error: ") or not row[1].strip():
+                continue
+            ids.append(row[0])
+            texts.append(row[1])
+            if len(ids) >= chunk_size:
+                yield score_chunk, ids, texts
+                ids, texts = [], []
+    if ids:
+        yield score_chunk, ids, texts
+
+
+def bounded_results(pool, tasks: Iterable[tuple], window: int) -> Iterator:
+    # Like pool.map, unordered, with at most `window` chunks in flight
+    pending = set()
+    for fn, *args in tasks:
+        pending.add(pool.submit(fn, *args))
+        if len(pending) >= window:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                yield fut.result()
+    while pending:
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in finished:
+            yield fut.result()
+
+
+# ───── output ─────
+def load_taxonomy(path: str | None = TAXONOMY_FILE) -> dict[str, dict[str, float]]:
+    if not path:
+        return TAXONOMY
+    with open(path, encoding="utf-8") as f:
+        taxonomy = json.load(f)
+    # a bare list of terms weighs every term 1
+    return {topic: terms if isinstance(terms, dict) else {t: 1 for t in terms}
+            for topic, terms in taxonomy.items()}
+
+
+def fingerprint(taxonomy: dict, n_features: int = N_FEATURES) -> str:
+    blob = json.dumps([taxonomy, n_features], sort_keys=True).encode()
+    return hashlib.blake2b(blob, digest_size=8).hexdigest()
+
+
+class ScoreSink:
+    # Appends score rows and checkpoints like transcripter.TranscriptSink: the
+    # CSV is fsync'd first, then the IDs go into the index. The index starts
+    # with the taxonomy fingerprint; a different one means every score is
+    # stale, so both files are started over. Empty transcripts are listed in
+    # the index without a score row, so the Parquet source skips them next run.
+    def __init__(self, topics: list[str], taxonomy_hash: str, path=OUTPUT_FILE, index_path=INDEX_FILE,
+                 rescore=False):
+        self.topics = topics
+        self.done: set[str] = set()
+        fresh = rescore or not self._matches(index_path, taxonomy_hash)
+        if fresh and os.path.exists(path):
+            print(f"[topics] Taxonomy changed (or --rescore): starting {path} over")
+
+        self.csvfile = open(path, "w" if fresh else "a", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.csvfile)
+        self.indexfile = open(index_path, "w" if fresh else "a", encoding="utf-8")
+        if fresh:
+            self.writer.writerow(["Video ID", *topics, "Top Topic"])
+            self.indexfile.write(f"# taxonomy {taxonomy_hash}\n")
+        self.pending: list[str] = []
+        self.written = 0
+
+    def _matches(self, index_path: str, taxonomy_hash: str) -> bool:
+        if not os.path.exists(index_path):
+            return False
+        with open(index_path, encoding="utf-8") as f:
+            if f.readline().strip() != f"# taxonomy {taxonomy_hash}":
+                return False
+            self.done.update(line.strip() for line in f if line.strip())
+        return True
+
+    def add(self, ids: list[str], scores: np.ndarray, empty: Iterable[str] = ()) -> int:
+        for vid in empty:
+            if vid not in self.done:
+                self.done.add(vid)
+                self.pending.append(vid)
+        keep = [i for i, vid in enumerate(ids) if vid not in self.done]
+        if not keep:
+            return 0
+        scores = scores[keep]
+        top = scores.argmax(axis=1)
+        for row, i in enumerate(keep):
+            best = self.topics[top[row]] if scores[row, top[row]] > 0 else ""
+            self.writer.writerow([ids[i], *(f"{s:.5f}" for s in scores[row]), best])
+            self.done.add(ids[i])
+            self.pending.append(ids[i])
+        self.written += len(keep)
+        if len(self.pending) >= CHECKPOINT_EVERY:
+            self.checkpoint()
+        return len(keep)
+
+    def checkpoint(self):
+        self.csvfile.flush()
+        os.fsync(self.csvfile.fileno())
+        if self.pending:
+            self.indexfile.write("".join(f"{vid}\n" for vid in self.pending))
+            self.indexfile.flush()
+            os.fsync(self.indexfile.fileno())
+            self.pending = []
+
+    def close(self):
+        self.checkpoint()
+        self.csvfile.close()
+        self.indexfile.close()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Score every stored transcript against the topic taxonomy.")
+    parser.add_argument("--source", choices=["parquet", "csv"],
+                        default="parquet" if transcriptstore and os.path.isdir(TRANSCRIPT_DIR) else "csv",
+                        help="Parquet transcript store (needs pyarrow), plus any transcripts.csv rows "
+                             "it lacks; or transcripts.csv alone")
+    parser.add_argument("--taxonomy", default=TAXONOMY_FILE, help="JSON {topic: {term: weight}}")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Transcripts per task (CSV source)")
+    parser.add_argument("--rescore", action="store_true", help="Score everything again, even with the same taxonomy")
+    args = parser.parse_args(argv)
+    metrics.start()   # exports only when METRICS_DIR is set
+    if args.source == "parquet" and transcriptstore is None:
+        parser.error("--source parquet needs pyarrow (pip install pyarrow)")
+
+    taxonomy = load_taxonomy(args.taxonomy)
+    topics = list(taxonomy)
+    index_path = os.path.splitext(args.output)[0] + ".idx"
+    sink = ScoreSink(topics, fingerprint(taxonomy), args.output, index_path, args.rescore)
+    print(f"[topics] {len(topics)} topics, {len(sink.done)} transcripts already scored")
+
+    if args.source == "parquet":
+        tasks = store_tasks(TRANSCRIPT_DIR, sink.done)
+        if os.path.exists(TRANSCRIPTS_CSV):
+            # transcripts fetched before the store existed are only in the CSV
+            skip = sink.done | transcriptstore.video_ids(TRANSCRIPT_DIR)
+            tasks = chain(tasks, csv_tasks(TRANSCRIPTS_CSV, skip, args.chunk_size))
+    else:
+        tasks = csv_tasks(TRANSCRIPTS_CSV, sink.done, args.chunk_size)
+
+    started = time.monotonic()
+    seen = 0
+    try:
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                                 initargs=(taxonomy, N_FEATURES)) as pool:
+            for ids, scores, empty in bounded_results(pool, tasks, args.workers * 2):
+                seen += len(ids) + len(empty)
+                metrics.inc("topic_documents", sink.add(ids, scores, empty))
+                elapsed = time.monotonic() - started
+                print(f"[topics] {seen} transcripts read, {sink.written} scored ({seen / elapsed:.0f}/s)")
+    finally:
+        sink.close()
+
+    print(f"[topics] Wrote {sink.written} score rows to {args.output} "
+          f"in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
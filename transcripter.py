@@ -1,65 +1,241 @@
 from youtube_transcript_api import YouTubeTranscriptApi as yta
+from youtube_transcript_api import _errors as yta_errors
+import argparse
 import csv
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+import metrics
+from ratelimit import AdaptiveRateLimiter, backoff_delay
+
+try:
+    from transcriptstore import TranscriptWriter, STORE_DIR
+except ImportError:  # pyarrow not installed: transcripts go to the CSV only
+    TranscriptWriter = None
 
 # Read video IDs from the input CSV
 input_file = 'video_ids.csv'  # Name of the input CSV file containing video IDs
 output_file = 'transcripts.csv'  # Name of the output CSV file
-video_ids = []
-
-with open(input_file, 'r', encoding='utf-8') as csvfile:
-    reader = csv.reader(csvfile)
-    for row in reader:
-        if row:  # Check if the row is not empty
-            video_ids.append(row[0])  # Assuming the ID is in the first column
-
-# Check if the output file already exists
-if os.path.exists(output_file):
-    # Open the output CSV in append mode
-    mode = 'a'  # Append mode if file exists
-    file_exists = True
-else:
-    # Create the file if it doesn't exist
-    mode = 'w'  # Write mode if file doesn't exist
-    file_exists = False
-
-# Using a single variable to hold the text for CSV
-csv_content = []
-
-# Iterate over each video ID to get transcripts
-for video_id in video_ids:
+index_file = 'transcripts.idx'  # One completed video ID per line, so reruns can skip them
+status_file = 'transcript_status.csv'  # Failures, kept out of the transcript column
+
+WORKERS = int(os.getenv('TRANSCRIPT_WORKERS', '8'))  # Requests in flight at once
+START_RATE = float(os.getenv('TRANSCRIPT_RATE', '2'))  # Initial requests per second, adapts from here
+MAX_ATTEMPTS = 5  # Tries per video for retryable errors
+CHECKPOINT_EVERY = 200  # Rows between fsync'd checkpoints (CSV output)
+STORE_CHECKPOINT_EVERY = 2000  # Rows per Parquet flush; fewer, larger part files
+
+# Errors that will not go away by asking again
+PERMANENT_ERRORS = tuple(getattr(yta_errors, name) for name in (
+    'TranscriptsDisabled', 'NoTranscriptFound', 'NoTranscriptAvailable', 'VideoUnavailable',
+    'VideoUnplayable', 'InvalidVideoId', 'AgeRestricted', 'NotTranslatable',
+) if hasattr(yta_errors, name))
+
+# Errors that mean "slow down"
+THROTTLE_ERRORS = tuple(getattr(yta_errors, name) for name in (
+    'TooManyRequests', 'RequestBlocked', 'IpBlocked',
+) if hasattr(yta_errors, name))
+
+
+def is_throttle(error):
+    return isinstance(error, THROTTLE_ERRORS) or '429' in str(error) or 'Too Many Requests' in str(error)
+
+
+def read_video_ids(path):
+    # Yields IDs lazily so a huge input list never sits in memory
+    with open(path, 'r', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            if row:  # Check if the row is not empty
+                yield row[0]  # Assuming the ID is in the first column
+
+
+def fetch_transcript(video_id, limiter):
+    # Returns (status, segments, error) where status is "ok", "permanent" or "failed"
+    error = None
+    for attempt in range(MAX_ATTEMPTS):
+        with metrics.timer("transcript_wait_seconds"):
+            limiter.acquire()
+        started = time.monotonic()
+        try:
+            data = yta.get_transcript(video_id)
+        except PERMANENT_ERRORS as e:
+            limiter.on_success(time.monotonic() - started)  # the service answered fine
+            metrics.observe("transcript_request_seconds", time.monotonic() - started, outcome="permanent")
+            metrics.inc("transcripts", status="permanent")
+            return "permanent", None, f"{type(e).__name__}: {e}"
+        except Exception as e:
+            error = e
+            throttled = is_throttle(e)
+            metrics.observe("transcript_request_seconds", time.monotonic() - started,
+                            outcome="throttled" if throttled else "error")
+            metrics.inc("transcript_errors", error=type(e).__name__)
+            if throttled:
+                limiter.on_throttle()
+            if attempt < MAX_ATTEMPTS - 1:  # no point waiting before giving up
+                time.sleep(backoff_delay(attempt))
+        else:
+            limiter.on_success(time.monotonic() - started)
+            metrics.observe("transcript_request_seconds", time.monotonic() - started, outcome="ok")
+            metrics.inc("transcripts", status="ok")
+            return "ok", data, None
+    metrics.inc("transcripts", status="failed")
+    return "failed", None, f"{type(error).__name__}: {error}"
+
+
+def to_text(data):
+    # Concatenate all text into a single string for this video
+    transcript_text = ' '.join(item['text'] for item in data)
+
+    # Remove any line breaks within the transcript to avoid issues in CSV
+    return transcript_text.replace('\n', ' ').replace('\r', ' ')
+
+
+class TranscriptSink:
+    # Appends rows as they arrive and checkpoints every CHECKPOINT_EVERY rows:
+    # the output is made durable first, then the matching IDs go into the
+    # index, so the index never names a row that is not safely on disk.
+    # With a Parquet store, segment timings are kept and the CSV is not used.
+    def __init__(self, path=output_file, index_path=index_file, status_path=status_file, store=None):
+        self.store = store
+        self.every = STORE_CHECKPOINT_EVERY if store else CHECKPOINT_EVERY
+        self.csvfile = self.writer = None
+        if store is None:
+            new_file = not os.path.exists(path)
+            self.csvfile = open(path, 'a', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.csvfile)
+            if new_file:
+                self.writer.writerow(["Video ID", "Transcript"])  # Write headers
+
+        new_status = not os.path.exists(status_path)
+        self.statusfile = open(status_path, 'a', newline='', encoding='utf-8')
+        self.status_writer = csv.writer(self.statusfile)
+        if new_status:
+            self.status_writer.writerow(["Video ID", "Status", "Error", "Time"])
+
+        self.indexfile = open(index_path, 'a', encoding='utf-8')
+        self.pending = []
+        self.written = 0
+
+    def add(self, video_id, segments):
+        if self.store is not None:
+            self.store.add(video_id, segments)
+        else:
+            self.writer.writerow([video_id, to_text(segments)])
+        self.pending.append(video_id)
+        self.written += 1
+        if len(self.pending) >= self.every:
+            self.checkpoint()
+
+    def fail(self, video_id, status, error):
+        self.status_writer.writerow([video_id, status, error, int(time.time())])
+
+    def checkpoint(self):
+        if self.store is not None:
+            self.store.flush()  # part files are renamed into place once complete
+        for f in (self.csvfile, self.statusfile):
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+        if self.pending:
+            self.indexfile.write(''.join(f"{vid}\n" for vid in self.pending))
+            self.indexfile.flush()
+            os.fsync(self.indexfile.fileno())
+            self.pending = []
+
+    def close(self):
+        self.checkpoint()
+        for f in (self.csvfile, self.statusfile, self.indexfile):
+            if f is not None:
+                f.close()
+
+
+def load_done_ids(path=output_file, index_path=index_file, status_path=status_file):
+    done = set()
+    if os.path.exists(index_path):
+        with open(index_path, encoding='utf-8') as f:
+            done.update(line.strip() for line in f if line.strip())
+    elif os.path.exists(path):
+        # One-off: build the index from a transcripts.csv written before it existed.
+        # Old "Error: ..." rows are left out so those videos get retried.
+        with open(path, newline='', encoding='utf-8') as f, \
+                open(index_path, 'w', encoding='utf-8') as idx:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if len(row) > 1 and not row[1].startswith("Error: "):
+                    done.add(row[0])
+                    idx.write(f"{row[0]}\n")
+
+    # Permanent failures are settled too; retryable ones get another go
+    if os.path.exists(status_path):
+        with open(status_path, newline='', encoding='utf-8') as f:
+            done.update(row["Video ID"] for row in csv.DictReader(f) if row["Status"] == "permanent")
+    return done
+
+
+def bounded_map(pool, fn, items, window):
+    # Like pool.map, unordered, with at most `window` items in flight
+    pending = set()
+    for item in items:
+        pending.add(pool.submit(fn, item))
+        if len(pending) >= window:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+    for fut in as_completed(pending):
+        yield fut.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch YouTube transcripts for a list of video IDs.")
+    parser.add_argument("--format", choices=["parquet", "csv"],
+                        default="parquet" if TranscriptWriter else "csv",
+                        help="Parquet store with segment timings (needs pyarrow) or the flat CSV")
+    args = parser.parse_args()
+    metrics.start()   # exports only when METRICS_DIR is set
+    if args.format == "parquet" and TranscriptWriter is None:
+        parser.error("--format parquet needs pyarrow (pip install pyarrow)")
+
+    done = load_done_ids()
+    print(f"Skipping {len(done)} videos already in {index_file} / {status_file}")
+
+    def todo():
+        for vid in read_video_ids(input_file):
+            if vid not in done:
+                done.add(vid)  # also drops duplicate IDs in the input
+                yield vid
+
+    # Rate starts at START_RATE and adapts to 429s and latency; workers share it
+    limiter = AdaptiveRateLimiter(START_RATE, burst=WORKERS, target_latency=5.0)
+    store = TranscriptWriter() if args.format == "parquet" else None
+    sink = TranscriptSink(store=store)
+    failed = 0
+
+    def work(video_id):
+        # per-video timings go to metrics instead of a print per request
+        return video_id, fetch_transcript(video_id, limiter)
+
     try:
-        print(f"Retrieving transcript for video ID: {video_id}")
-        # Get transcript for the video ID
-        data = yta.get_transcript(video_id)
-        
-        # Concatenate all text into a single string for this video
-        transcript_text = ' '.join(item['text'] for item in data)
-        
-        # Remove any line breaks within the transcript to avoid issues in CSV
-        transcript_text = transcript_text.replace('\n', ' ').replace('\r', ' ')
-        
-        # Append the video ID and cleaned transcript as a new row (ID in column 1, transcript in column 2)
-        csv_content.append([video_id, transcript_text]) 
-        
-        # Optional: Add a delay to avoid rate-limiting issues
-        time.sleep(2)  # Sleep for 2 seconds between requests
-        
-    except Exception as e:
-        print(f"Error retrieving transcript for {video_id}: {e}")
-        # Append the error message with video ID
-        csv_content.append([video_id, f"Error: {e} for ID {video_id}"])
-
-# Write to the output CSV
-with open(output_file, mode, newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-    
-    # If the file doesn't exist, write headers (Video ID and Transcript)
-    if not file_exists:
-        writer.writerow(["Video ID", "Transcript"])  # Write headers
-        
-    # Write each video ID and transcript (append mode will start from the first empty row)
-    writer.writerows(csv_content)
-
-print(f"Transcripts have been appended to {output_file}")
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            for video_id, (status, data, error) in bounded_map(pool, work, todo(), WORKERS * 4):
+                if status == "ok":
+                    sink.add(video_id, data)
+                else:
+                    failed += 1
+                    print(f"Error retrieving transcript for {video_id} ({status}): {error}")
+                    sink.fail(video_id, status, error)
+                if (sink.written + failed) % 100 == 0:
+                    print(f"Processed {sink.written + failed} videos ({failed} failed, "
+                          f"rate {limiter.rate:.2f}/s)")
+    finally:
+        sink.close()
+
+    target = STORE_DIR if store is not None else output_file
+    print(f"Wrote {sink.written} transcripts to {target}, {failed} failures in {status_file} "
+          f"(final rate {limiter.rate:.2f}/s, {limiter.throttled} throttled responses)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# ─────────────────────────  CONFIG  ───────────────────────── #
+STORE_DIR      = os.getenv("TRANSCRIPT_STORE", "transcripts")
+DUMPS_DIR      = "dumps"
+COMPRESSION    = "zstd"
+ROW_GROUP_SIZE = 1000
+BATCH_SIZE     = 512              # rows per batch for streaming readers
+COMPACT_JOURNAL = ".compact.json"  # per partition while compact() swaps files
+# ──────────────────────────────────────────────────────────── #
+
+SEGMENT = pa.struct([
+    ("text", pa.string()),
+    ("start", pa.float64()),
+    ("duration", pa.float64()),
+])
+SCHEMA = pa.schema([
+    ("video_id", pa.string()),
+    ("published", pa.timestamp("s", tz="UTC")),
+    ("text", pa.string()),
+    ("segments", pa.list_(SEGMENT)),
+    ("fetched_at", pa.timestamp("s", tz="UTC")),
+])
+
+
+# ───── video → channel/month lookup ─────
+def load_video_index(dumps_dir: str = DUMPS_DIR) -> dict[str, tuple[str, int | None]]:
+    # everylive dumps are named after the channel ID and list the channel's videos
+    index: dict[str, tuple[str, int | None]] = {}
+    for path in glob.glob(os.path.join(dumps_dir, "*.json")):
+        channel = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for e in entries:
+            if e.get("id"):
+                index[e["id"]] = (channel, e.get("timestamp"))
+    return index
+
+
+def _month(ts: int | None) -> str:
+    if not ts:
+        return "unknown"
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m")
+
+
+# ───── writer ─────
+class TranscriptWriter:
+    # Buffers rows and writes one zstd Parquet part per (channel, month) on
+    # flush(), laid out as <root>/channel=<id>/month=<YYYY-MM>/part-*.parquet.
+    def __init__(self, root: str = STORE_DIR, video_index: dict | None = None):
+        self.root = root
+        self.video_index = video_index if video_index is not None else load_video_index()
+        self._rows: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        self.buffered = 0
+        self.written = 0
+
+    def add(self, video_id: str, segments: list[dict]) -> None:
+        channel, ts = self.video_index.get(video_id, ("unknown", None))
+        self._rows[(channel, _month(ts))].append({
+            "video_id": video_id,
+            "published": ts,
+            "text": " ".join(s["text"] for s in segments).replace("\n", " ").replace("\r", " "),
+            "segments": [
+                {"text": s["text"], "start": float(s["start"]), "duration": float(s["duration"])}
+                for s in segments
+            ],
+            "fetched_at": int(time.time()),
+        })
+        self.buffered += 1
+
+    def flush(self) -> None:
+        for (channel, month), rows in self._rows.items():
+            folder = os.path.join(self.root, f"channel={channel}", f"month={month}")
+            os.makedirs(folder, exist_ok=True)
+            name = f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}.parquet"
+            tmp = os.path.join(folder, f".{name}.tmp")
+            table = pa.Table.from_pylist(rows, schema=SCHEMA)
+            pq.write_table(table, tmp, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+            os.replace(tmp, os.path.join(folder, name))
+            self.written += len(rows)
+        self._rows.clear()
+        self.buffered = 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+# ───── readers ─────
+def _superseded(root: str) -> set[str]:
+    # Parts a crashed compact() already merged: its journal names them, and
+    # once the merged file is in place they are duplicates
+    paths = set()
+    for journal in glob.glob(os.path.join(root, "channel=*", "month=*", COMPACT_JOURNAL)):
+        folder = os.path.dirname(journal)
+        try:
+            with open(journal, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if os.path.exists(os.path.join(folder, entry["merged"])):
+            paths.update(os.path.join(folder, name) for name in entry["parts"])
+    return paths
+
+
+def part_files(root: str = STORE_DIR) -> list[str]:
+    paths = sorted(glob.glob(os.path.join(root, "channel=*", "month=*", "part-*.parquet")))
+    superseded = _superseded(root)
+    return [p for p in paths if p not in superseded] if superseded else paths
+
+
+def metadata(root: str = STORE_DIR) -> dict:
+    # Footers only: no column data is read
+    rows = size = raw = 0
+    channels, months = set(), set()
+    files = part_files(root)
+    for path in files:
+        meta = pq.read_metadata(path)
+        rows += meta.num_rows
+        size += os.path.getsize(path)
+        raw += sum(meta.row_group(i).total_byte_size for i in range(meta.num_row_groups))
+        parts = path.split(os.sep)
+        channels.add(parts[-3].split("=", 1)[1])
+        months.add(parts[-2].split("=", 1)[1])
+    return {
+        "rows": rows,
+        "files": len(files),
+        "channels": len(channels),
+        "months": len(months),
+        "disk_bytes": size,
+        "uncompressed_bytes": raw,
+    }
+
+
+def count_rows(root: str = STORE_DIR) -> int:
+    return metadata(root)["rows"]
+
+
+def dataset(root: str = STORE_DIR) -> ds.Dataset:
+    # From part_files(), not a directory scan, so half-compacted parts are skipped
+    return ds.dataset(part_files(root), format="parquet", partitioning="hive", partition_base_dir=root)
+
+
+def video_ids(root: str = STORE_DIR) -> set[str]:
+    # Every ID in the store; readers take from transcripts.csv only the rest
+    ids: set[str] = set()
+    for path in part_files(root):
+        ids.update(pq.ParquetFile(path).read(columns=["video_id"]).column("video_id").to_pylist())
+    return ids
+
+
+def iter_batches(
+    root: str = STORE_DIR,
+    *,
+    columns: list[str] | None = None,
+    filter: ds.Expression | None = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[pa.RecordBatch]:
+    # Streams record batches with only the requested columns decoded, e.g.
+    # iter_batches(columns=["video_id", "text"], filter=ds.field("channel") == "UC…")
+    yield from dataset(root).to_batches(columns=columns, filter=filter, batch_size=batch_size)
+
+
+def read_file(path: str, columns: list[str] | None = None) -> pa.Table:
+    # Memory-mapped: pages are faulted in on access instead of copied up front
+    return pq.ParquetFile(path, memory_map=True).read(columns=columns)
+
+
+# ───── maintenance ─────
+def _finish_compactions(root: str) -> None:
+    # Completes (or rolls back) a compact() that stopped between its steps
+    superseded = _superseded(root)
+    for path in superseded:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    for journal in glob.glob(os.path.join(root, "channel=*", "month=*", COMPACT_JOURNAL)):
+        os.remove(journal)
+
+
+def compact(root: str = STORE_DIR) -> int:
+    # Merge the small per-checkpoint parts in each partition into one file.
+    # A journal naming the merged file and its parts is written before the
+    # merged file appears, so after a crash readers skip the old parts and the
+    # next compact() deletes them: rows are never read twice.
+    _finish_compactions(root)
+    merged = 0
+    by_folder: dict[str, list[str]] = defaultdict(list)
+    for path in part_files(root):
+        by_folder[os.path.dirname(path)].append(path)
+    for folder, paths in by_folder.items():
+        if len(paths) < 2:
+            continue
+        # ParquetFile reads just the file; read_table would add the hive columns
+        table = pa.concat_tables(pq.ParquetFile(p).read() for p in paths)
+        name = f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp = os.path.join(folder, f".{name}.tmp")
+        pq.write_table(table, tmp, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+        journal = os.path.join(folder, COMPACT_JOURNAL)
+        with open(journal + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"merged": name, "parts": [os.path.basename(p) for p in paths]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal + ".tmp", journal)
+        os.replace(tmp, os.path.join(folder, name))
+        for p in paths:
+            os.remove(p)
+        os.remove(journal)
+        merged += len(paths)
+    return merged
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Inspect or compact the Parquet transcript store.")
+    parser.add_argument("command", choices=["count", "info", "compact"])
+    parser.add_argument("--root", default=STORE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "count":
+        print(count_rows(args.root))
+    elif args.command == "info":
+        for k, v in metadata(args.root).items():
+            print(f"{k:<20}{v}")
+    else:
+        print(f"Merged {compact(args.root)} part files")
+
+
+if __name__ == "__main__":
+    main()
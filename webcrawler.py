@@ -1,29 +1,56 @@
 from __future__ import annotations
 
 import os
+import argparse
+import json
 import time
 import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable
 from urllib.parse import urlparse, urljoin
 
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup, FeatureNotFound
 
 from selenium import webdriver
-from selenium.webdriver.edge.service import Service
-from selenium.webdriver.edge.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+import httpclient
+import metrics
+import robots
+from crawlstate import CrawlState
+from sitemaps import iter_ranked_pages
+from driverpool import DriverPool
+
 
 # ─────────────────────────  CONFIG  ───────────────────────── #
 CSV_PATH       = "detailed_churches.csv"              
+OUTPUT_CSV     = "youtube_links_output.csv"
+STATE_PATH     = "crawl_state.sqlite"
 EDGE_DRIVER    = os.getenv("EDGE_DRIVER_PATH")          
 HEADLESS       = True                                    
+POOL_SIZE      = int(os.getenv("DRIVER_POOL_SIZE", "2"))   # shared Edge instances
+SITE_WORKERS   = int(os.getenv("SITE_WORKERS", "16"))      # sites crawled at once
 REQUEST_DELAY  = 1.0                                    
+ESCALATE_ON_MISS = False      # render every static miss in Edge, not just JS shells
 # ──────────────────────────────────────────────────────────── #
 
+# Shared Edge browsers, only started once a page actually needs rendering;
+# most sites resolve on the static fast path and never touch one
+pool: DriverPool | None = None  # created by get_pool(); pipeline.py passes its own
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> DriverPool:
+    global pool
+    with _pool_lock:
+        if pool is None:
+            pool = DriverPool(POOL_SIZE, EDGE_DRIVER, headless=HEADLESS)
+        return pool
+
 
 # ───────────── CSV loader ─────────────
 def get_base_urls(path: str) -> list[str]:
@@ -42,152 +69,231 @@ def get_base_urls(path: str) -> list[str]:
     raise ValueError("CSV must contain a 'Website' or 'URL' column")
 
 
-# ───── robots.txt ─────
-def parse_robots_txt(base_url: str) -> tuple[list[str], list[str]]:
-    robots_url = urljoin(base_url.rstrip("/") + "/", "robots.txt")
-    try:
-        resp = requests.get(robots_url, timeout=10)
-        if resp.status_code != 200:
-            print(f"[robots] none @ {robots_url} ({resp.status_code})")
-            return [], []
-
-        disallowed, sitemaps = [], []
-        for raw in resp.text.splitlines():
-            line = raw.strip()
-            if not line or line.startswith("#"):
-                continue
-            if line.lower().startswith("disallow:"):
-                path = line.split(":", 1)[1].strip()
-                if path:                       # ← ignore blank Disallow
-                    disallowed.append(path)
-            elif line.lower().startswith("sitemap:"):
-                sitemaps.append(line.split(":", 1)[1].strip())
-        return disallowed, sitemaps
-
-    except Exception as e:
-        print(f"[robots] error {robots_url} – {e}")
-        return [], []
-
-
+# ───── sitemap discovery ─────
 def find_common_sitemaps(base_url: str) -> list[str]:
     urls = []
     for route in ("/sitemap.xml", "/wp-sitemap.xml"):
         url = urljoin(base_url.rstrip("/") + "/", route.lstrip("/"))
         try:
-            r = requests.head(url, timeout=10, allow_redirects=True)
-            if r.status_code == 200:
+            r = httpclient.fetch(url, method="HEAD")
+            if r.status == 200:
                 urls.append(url)
         except Exception:
             pass
     return urls
 
 
-# ───── sitemap crawl ─────
-def crawl_sitemap(url: str) -> list[str]:
+# ───── static fast path ─────
+YT_HOSTS      = ("youtube.com", "youtu.be", "youtube-nocookie.com")
+OG_VIDEO_KEYS = ("og:video", "og:video:url", "og:video:secure_url", "twitter:player")
+JS_SHELL_IDS  = ("root", "app", "__next", "__nuxt", "___gatsby")
+
+
+def _html_soup(markup: bytes | str) -> BeautifulSoup:
     try:
-        r = requests.get(url, timeout=10)
-        if r.status_code != 200:
-            print(f"[sitemap] {url} – HTTP {r.status_code}")
-            return []
+        return BeautifulSoup(markup, "lxml")
+    except FeatureNotFound:
+        return BeautifulSoup(markup, "html.parser")
+
+
+def is_youtube_url(url: str) -> bool:
+    host = (urlparse(url).hostname or "").lower()
+    return any(host == h or host.endswith("." + h) for h in YT_HOSTS)
+
+
+def _json_strings(obj) -> list[str]:
+    if isinstance(obj, str):
+        return [obj]
+    if isinstance(obj, dict):
+        return [s for v in obj.values() for s in _json_strings(v)]
+    if isinstance(obj, list):
+        return [s for v in obj for s in _json_strings(v)]
+    return []
+
+
+def looks_js_rendered(soup: BeautifulSoup) -> bool:
+    body = soup.body
+    if body is None:
+        return True
+    text_len = len(body.get_text(" ", strip=True))
+    if text_len < 200 and (
+        soup.find("noscript") or any(soup.find(id=i) for i in JS_SHELL_IDS)
+    ):
+        return True
+    # app shells: a pile of scripts and next to no navigable links
+    return len(soup.find_all("a", href=True)) < 3 and len(soup.find_all("script")) > 5
+
+
+def extract_youtube_links(markup: bytes | str, page_url: str) -> tuple[list[str], bool]:
+    soup = _html_soup(markup)
+    candidates: list[str] = []
+
+    candidates += [a["href"] for a in soup.find_all("a", href=True)]
+    for tag in soup.find_all(["iframe", "embed"]):
+        candidates += [tag.get(k) for k in ("src", "data-src") if tag.get(k)]
+    for meta in soup.find_all("meta", content=True):
+        if (meta.get("property") or meta.get("name") or "").lower() in OG_VIDEO_KEYS:
+            candidates.append(meta["content"])
+    for script in soup.find_all("script", type="application/ld+json"):
         try:
-            soup = BeautifulSoup(r.content, "xml")
-        except FeatureNotFound:
-            soup = BeautifulSoup(r.content, "html.parser")
-        return [loc.text.strip() for loc in soup.find_all("loc")]
-    except Exception as e:
-        print(f"[sitemap] error {url} – {e}")
-        return []
+            candidates += _json_strings(json.loads(script.string or ""))
+        except ValueError:
+            continue
 
+    links: list[str] = []
+    for raw in candidates:
+        url = urljoin(page_url, raw.strip())
+        if is_youtube_url(url) and url not in links:
+            links.append(url)
+    return links, looks_js_rendered(soup)
 
-# ───── helpers ─────
-def path_is_disallowed(full_url: str, paths: list[str]) -> bool:
-    p = urlparse(full_url).path or "/"
-    return any(p.startswith(d) for d in paths)
 
-
-def fast_head_ok(url: str) -> bool:
+def static_youtube_links(url: str) -> tuple[list[str], bool]:
+    # → (links, needs_browser)
     try:
-        return requests.head(url, timeout=5, allow_redirects=True).status_code < 400
-    except Exception:
-        return False
+        r = httpclient.fetch(url)
+    except Exception as e:
+        print(f"[static] error {url} – {e}")
+        return [], False
+    if not r.ok:
+        return [], False
+    if r.content_type and "html" not in r.content_type:
+        return [], False
+    links, js_rendered = extract_youtube_links(r.content, r.final_url)
+    return links, not links and (js_rendered or ESCALATE_ON_MISS)
+
+
+# ───── browser fallback ─────
+def rendered_youtube_links(driver: webdriver.Edge, url: str) -> list[str]:
+    driver.get(url)
+    WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.TAG_NAME, "a"))
+    )
+    hrefs = driver.execute_script(
+        "return Array.from(document.querySelectorAll('a[href], iframe[src]'),"
+        " e => e.href || e.src);"
+    )
+    return [h for h in dict.fromkeys(hrefs or []) if h and is_youtube_url(h)]
 
 
 # ───── core YouTube scraper ─────
 def collect_youtube_links(
-    urls: list[str],
-    disallowed: list[str],
-    driver_path: str,
+    urls: Iterable[str],
+    rules: robots.RobotsRules,
+    pool: DriverPool | None = None,
     *,
-    headless: bool = True,
+    stats: dict[str, int] | None = None,
 ) -> dict[str, list[str]]:
-    opts = Options()
-    if headless:
-        opts.add_argument("--headless=new")
-    opts.add_argument("--disable-gpu")
-    opts.add_argument("--window-size=1920,1080")
-
-    service = Service(driver_path)
     found: dict[str, list[str]] = {}
-
-    with webdriver.Edge(service=service, options=opts) as driver:
-        for url in urls:
-            if path_is_disallowed(url, disallowed):
-                continue
-            if not fast_head_ok(url):
-                continue
-
-            print(f"[visit] {url}")
+    stats = stats if stats is not None else {}
+    delay = rules.crawl_delay or 0.0
+    last_fetch = 0.0
+
+    for url in urls:
+        if not rules.allowed(url):
+            continue
+
+        # honour the host's Crawl-delay between our requests to it
+        wait = last_fetch + delay - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        last_fetch = time.monotonic()
+
+        stats["pages"] = stats.get("pages", 0) + 1
+        host = metrics.host_of(url)
+        metrics.inc("crawl_pages", host=host)
+        links, needs_browser = static_youtube_links(url)
+
+        if not links and needs_browser:
+            stats["escalated"] = stats.get("escalated", 0) + 1
+            metrics.inc("crawl_escalations", host=host)
             try:
-                driver.get(url)
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "a"))
-                )
-                links = [
-                    a.get_attribute("href")
-                    for a in driver.find_elements(By.TAG_NAME, "a")
-                    if (href := a.get_attribute("href")) and "youtube.com" in href
-                ]
-                if links:
-                    found[url] = links
-                    break  # ← first hit: stop crawling this domain
+                with (pool or get_pool()).lease() as driver, metrics.timer("browser_render_seconds", host=host):
+                    links = rendered_youtube_links(driver, url)
             except Exception as e:
                 print(f"[error] {url} – {e}")
 
-    return found
-
-
-# ───── main ─────
-def main():
-    if not EDGE_DRIVER or not os.path.exists(EDGE_DRIVER):
-        raise RuntimeError("EDGE_DRIVER_PATH env var not set or invalid")
+        if links:
+            found[url] = links
+            break  # ← first hit: stop crawling this domain
 
-    base_urls = get_base_urls(CSV_PATH)
-    all_hits: dict[str, list[str]] = {}
+    return found
 
-    for base in base_urls:
-        disallowed, sitemaps = parse_robots_txt(base)
-        if not sitemaps:
-            sitemaps.extend(find_common_sitemaps(base))
 
-        pages: list[str] = []
-        if sitemaps:
-            for sm in sitemaps:
-                pages.extend(crawl_sitemap(sm))
-        else:
-            pages.append(base.rstrip("/"))
+def crawl_site(base: str, pool: DriverPool | None = None) -> tuple[dict[str, list[str]], dict[str, int]]:
+    rules = robots.rules_for(base)
+    if rules.unreachable:
+        # recorded as an error, not a finished site, so a rerun tries it again
+        raise RuntimeError("robots.txt unreachable, site skipped for now")
+    sitemaps = list(rules.sitemaps)
+    if not sitemaps:
+        sitemaps.extend(find_common_sitemaps(base))
 
-        yt = collect_youtube_links(pages, disallowed, EDGE_DRIVER, headless=HEADLESS)
-        all_hits.update(yt)
+    # ranked lazily: sermon/media/watch pages first, so the first-hit break in
+    # collect_youtube_links usually fires within a few visits
+    if sitemaps:
+        pages: Iterable[str] = iter_ranked_pages(sitemaps)
+    else:
+        pages = [base.rstrip("/")]
 
-        # incremental save
-        pd.DataFrame(
-            [{"Website": k, "YouTube Links": ", ".join(v)} for k, v in all_hits.items()]
-        ).to_csv("youtube_links_output.csv", index=False)
+    stats: dict[str, int] = {}
+    hits = collect_youtube_links(pages, rules, pool, stats=stats)
+    time.sleep(REQUEST_DELAY)
+    return hits, stats
 
-        time.sleep(REQUEST_DELAY)
 
-    print("✓ Done – results in youtube_links_output.csv")
+# ───── main ─────
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Find YouTube links on church websites.")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"skip sites already completed in {STATE_PATH}")
+    args = parser.parse_args(argv)
+    metrics.start()   # exports only when METRICS_DIR is set
+
+    state = CrawlState(STATE_PATH)
+    if args.resume:
+        done = state.completed()
+        print(f"[resume] {len(done)} sites already completed")
+    else:
+        state.reset()
+        done = set()
+
+    base_urls = [b for b in dict.fromkeys(get_base_urls(CSV_PATH)) if b not in done]
+    stats: dict[str, int] = {}
+
+    # Sites are independent, so SITE_WORKERS of them crawl at once; renders
+    # queue for the POOL_SIZE shared browsers (started on the first escalation)
+    # instead of each starting Edge.
+    try:
+        with ThreadPoolExecutor(max_workers=SITE_WORKERS) as executor:
+            futures = {executor.submit(crawl_site, base): base for base in base_urls}
+            for fut in as_completed(futures):
+                base = futures[fut]
+                try:
+                    yt, site_stats = fut.result()
+                except Exception as e:
+                    print(f"[error] {base} – {e}")
+                    state.record(base, {}, error=str(e))
+                    continue
+                state.record(base, yt, pages_tried=site_stats.get("pages", 0))
+                for k, v in site_stats.items():
+                    stats[k] = stats.get(k, 0) + v
+    finally:
+        state.flush()
+        if pool is not None:
+            pool.close()
+        httpclient.close()
+
+    rows = state.export_csv(OUTPUT_CSV)
+    print(f"[state] {state.summary()}")
+    state.close()
+
+    pages, escalated = stats.get("pages", 0), stats.get("escalated", 0)
+    if pages:
+        print(f"[static] {pages} pages, {escalated} rendered in Edge "
+              f"({escalated / pages:.1%} escalation)")
+    print(f"✓ Done – {rows} results in {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()